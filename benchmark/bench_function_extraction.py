@@ -0,0 +1,99 @@
+# 函数提取微基准：旧的递归遍历 vs 基于 TreeCursor 的迭代提取 + 有序归并
+# 用法: python benchmark/bench_function_extraction.py [--functions 2000] [--repeat 3]
+import argparse
+import asyncio
+import bisect
+import os
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+import tree_sitter_cpp  # noqa: E402
+import tree_sitter_java  # noqa: E402
+import tree_sitter_python  # noqa: E402
+from tree_sitter import Language, Parser  # noqa: E402
+import function_extractor  # noqa: E402
+
+
+def make_cpp(count):
+    return "".join(f"int func_{i}(int a, int b) {{\n  int c = a + b;\n  if (c > {i}) {{\n    return c;\n  }}\n  return [&]() {{ return a * b; }}();\n}}\n\n"
+                   for i in range(count))
+
+
+def make_python(count):
+    return "".join(f"def func_{i}(a, b):\n    c = a + b\n    if c > {i}:\n        return c\n    def inner():\n        return a * b\n    return inner()\n\n"
+                   for i in range(count))
+
+
+def make_java(count):
+    methods = "".join(f"  public int func{i}(int a, int b) {{\n    int c = a + b;\n    if (c > {i}) {{\n      return c;\n    }}\n    return a * b;\n  }}\n\n"
+                      for i in range(count))
+    return f"public class Generated {{\n{methods}}}\n"
+
+
+# 旧实现：逐节点递归 await，命中函数时重建行号列表
+async def legacy_walk(node, lines, node_type, found):
+    new_lines = lines
+    if node.type == node_type:
+        start_line = node.start_point[0] + 1
+        end_line = node.end_point[0] + 1
+        left = bisect.bisect_left(new_lines, start_line)
+        right = bisect.bisect_right(new_lines, end_line)
+        if new_lines[left:right]:
+            found.append((start_line, new_lines[left]))
+        new_lines = lines[:left] + lines[right:]
+    for child in node.children:
+        await legacy_walk(child, new_lines, node_type, found)
+
+
+def new_extract(root_node, lines, node_type):
+    functions = function_extractor.extract_functions(root_node, node_type)
+    return [(function.start_line, changed[0])
+            for function, changed in function_extractor.map_changed_lines(functions, lines)]
+
+
+def best_of(repeat, func):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--functions", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--diff-step", type=int, default=5, help="every N-th line is treated as changed")
+    args = parser.parse_args()
+
+    cases = [
+        ("C++", tree_sitter_cpp.language(), "function_definition", make_cpp(args.functions)),
+        ("Python", tree_sitter_python.language(), "function_definition", make_python(args.functions)),
+        ("Java", tree_sitter_java.language(), "method_declaration", make_java(args.functions)),
+    ]
+    print(f"{'language':>8} {'lines':>8} {'legacy(ms)':>11} {'cursor(ms)':>10} {'speedup':>8} {'match':>6}")
+    for name, language_ptr, node_type, code in cases:
+        language = Language(language_ptr)
+        root_node = Parser(language).parse(code.encode("utf-8")).root_node
+        line_count = code.count("\n")
+        lines = list(range(1, line_count + 1, args.diff_step))
+
+        def run_legacy():
+            found = []
+            asyncio.run(legacy_walk(root_node, lines, node_type, found))
+            return found
+
+        legacy_time, legacy_result = best_of(args.repeat, run_legacy)
+        new_time, new_result = best_of(args.repeat, lambda: new_extract(root_node, lines, node_type))
+        print(f"{name:>8} {line_count:>8} {legacy_time * 1000:>11.1f} {new_time * 1000:>10.1f} "
+              f"{legacy_time / new_time:>8.1f} {str(legacy_result == new_result):>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# 50 个文件的模拟 PR 在不同并发度下的评审耗时
+# 用法: python benchmark/bench_llm_concurrency.py [--files 50] [--latency 0.5]
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+os.chdir(SRC_DIR)  # prompt_level_configure.json 按相对路径读取
+
+from fake_servers import FakeLLMHandler, start_server  # noqa: E402
+
+
+def make_pr(directory, file_count):
+    from github_assistant import DiffFileStruct
+    diff_files = []
+    for i in range(file_count):
+        path = os.path.join(directory, f"module_{i}.py")
+        with open(path, "w") as f:
+            f.write(f"def func_{i}(a, b):\n    return a + b + {i}\n")
+        diff_files.append(DiffFileStruct(f"module_{i}.py", path, [2]))
+    return diff_files
+
+
+async def run_once(diff_files, concurrency):
+    from ai_code_reviewer import CppCodeAnalyzer
+    analyzer = CppCodeAnalyzer(1)
+    # 固定并发度，关闭自适应调整
+    analyzer.scheduler.concurrency = concurrency
+    analyzer.ai_module.limiter.min_limit = analyzer.ai_module.limiter.max_limit = concurrency
+    analyzer.ai_module.limiter.limit = concurrency
+    # 评论只计数，不访问 GitHub
+    posted = []
+    analyzer.github_assistant.add_comment = lambda *args: posted.append(args)
+    try:
+        start = time.perf_counter()
+        await analyzer.analyze_code(diff_files)
+        return time.perf_counter() - start, len(posted)
+    finally:
+        await analyzer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 5, 10, 25, 50])
+    args = parser.parse_args()
+
+    server, base_url = start_server(FakeLLMHandler, latency=args.latency)
+    os.environ.update({
+        "LLM_API_KEY": "fake-key",
+        "LLM_API_URL": base_url,
+        "GITHUB_TOKEN": "fake-token",
+        "REPOSITORY_NAME": "repo",
+        "REPOSITORY_OWNER": "owner",
+        "PROMPT_LEVEL": "0",
+        "REVIEW_CACHE_DIR": "",  # 关闭磁盘缓存，保证每轮都真实调用
+        "REVIEW_MAX_CALLS": str(args.files),  # 每个文件都评审
+        "LLM_POOL_SIZE": str(max(args.concurrency)),
+    })
+
+    with tempfile.TemporaryDirectory() as directory:
+        diff_files = make_pr(directory, args.files)
+        print(f"{'concurrency':>12} {'wall(s)':>10} {'speedup':>8} {'calls':>6}")
+        baseline = None
+        for concurrency in args.concurrency:
+            wall, calls = asyncio.run(run_once(diff_files, concurrency))
+            baseline = baseline or wall
+            print(f"{concurrency:>12} {wall:>10.2f} {baseline / wall:>8.1f} {calls:>6}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# 进程池解析的扩展性基准：同一批大文件分别在当前进程串行解析、以及 1..N 个子进程中解析
+# 输出总耗时、相对串行的加速比和并行效率（加速比 / 进程数）；子进程与评审时一样由 parse_worker.get_pool 创建
+# 加速比取决于主机的 CPU 核数，单核主机上进程池只会因进程间通信而更慢
+# 用法: python benchmark/bench_parse_scaling.py --files 200 --functions 1000 --processes 1 2 4 8
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+sys.path.insert(0, BENCH_DIR)
+
+import parse_worker  # noqa: E402
+from synthetic_pr import generate_pr  # noqa: E402
+
+LANGUAGE_BY_EXTENSION = {".cpp": "cpp", ".py": "python", ".java": "java"}
+
+
+# 生成文件并随机挑选变更行，返回 [(路径, 语言, 变更行)]
+def make_jobs(directory, args):
+    files = generate_pr(directory, args.files, tuple(args.languages), 0.0, args.functions, args.seed)
+    rng = random.Random(args.seed)
+    jobs = []
+    for item in files:
+        path = os.path.join(directory, item["filename"])
+        with open(path) as f:
+            line_count = sum(1 for _ in f)
+        changed = sorted(line for line in range(1, line_count + 1) if rng.random() < args.density)
+        jobs.append((path, LANGUAGE_BY_EXTENSION[os.path.splitext(path)[1]], changed))
+    return jobs
+
+
+def run_serial(jobs):
+    parse_worker.warm_up()
+    start = time.perf_counter()
+    functions = sum(len(parse_worker.extract_changed_functions(*job)) for job in jobs)
+    return time.perf_counter() - start, functions
+
+
+def run_pool(jobs, processes):
+    pool = parse_worker.get_pool(processes)
+    # 先让所有子进程启动并完成预热，计时只包含解析本身
+    list(pool.map(parse_worker.warm_up, [()] * processes))
+    start = time.perf_counter()
+    paths, languages, changed = zip(*jobs)
+    functions = sum(len(snippets) for snippets in
+                    pool.map(parse_worker.extract_changed_functions, paths, languages, changed, chunksize=1))
+    return time.perf_counter() - start, functions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--functions", type=int, default=1000, help="functions per file")
+    parser.add_argument("--density", type=float, default=0.05, help="fraction of lines changed")
+    parser.add_argument("--languages", nargs="+", default=["cpp", "python", "java"],
+                        choices=["cpp", "python", "java"])
+    parser.add_argument("--processes", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        jobs = make_jobs(directory, args)
+        serial_seconds, expected = run_serial(jobs)
+        print(f"cpu count: {os.cpu_count()}, files: {len(jobs)}, changed functions: {expected}")
+        print(f"{'mode':>10} {'seconds':>8} {'speedup':>8} {'efficiency':>10}")
+        print(f"{'serial':>10} {serial_seconds:>8.3f} {1.0:>8.2f} {1.0:>10.2f}")
+        for processes in args.processes:
+            seconds, functions = run_pool(jobs, processes)
+            if functions != expected:
+                raise RuntimeError(f"Process pool extracted {functions} functions, expected {expected}")
+            speedup = serial_seconds / seconds
+            print(f"{f'{processes} proc':>10} {seconds:>8.3f} {speedup:>8.2f} {speedup / processes:>10.2f}")
+        parse_worker.shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# 端到端基准：本地模拟 GitHub 和 LLM 服务，对合成 PR 运行完整的评审流程
+# 输出 PR 总耗时、单次 LLM 调用 p50/p95、峰值内存、调用次数、prompt 前缀缓存命中率和对冲请求数/胜出数
+# 用法: python benchmark/bench_pipeline.py --files 10 100 1000 --density 0.1 --llm-latency 0.2
+# 长尾对冲: python benchmark/bench_pipeline.py --files 20 --llm-providers 2 --llm-tail-rate 0.05 --llm-tail-latency 10
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, "..", "src")
+RESULT_PREFIX = "BENCH_RESULT "
+
+
+# 子进程：在干净的进程中运行一次完整评审，峰值内存只包含评审流程本身
+def run_child():
+    sys.path.insert(0, SRC_DIR)
+    os.chdir(SRC_DIR)  # prompt_level_configure.json 按相对路径读取
+    import ai_code_reviewer
+    from run_metrics import metrics
+
+    asyncio.run(ai_code_reviewer.async_main(1))
+    summary = metrics.summary()
+    summary["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(RESULT_PREFIX + json.dumps(summary), flush=True)
+
+
+def run_scenario(args, file_count):
+    from fake_servers import FakeGithubHandler, FakeLLMHandler, RequestStats, start_server
+    from synthetic_pr import generate_pr
+
+    stats = RequestStats()
+    with tempfile.TemporaryDirectory() as directory:
+        repo_path = os.path.join(directory, "repo")
+        files = generate_pr(repo_path, file_count, tuple(args.languages), args.density,
+                            args.functions, args.seed)
+        # 多个服务商各自启动一个模拟服务，共用请求计数
+        llm_servers = [start_server(
+            FakeLLMHandler, latency=args.llm_latency, error_rate=args.llm_error_rate,
+            throttle_rate=args.llm_throttle_rate, retry_after=args.retry_after, stats=stats,
+            tail_rate=args.llm_tail_rate, tail_latency=args.llm_tail_latency)
+            for _ in range(args.llm_providers)]
+        llm_url = llm_servers[0][1]
+        github_server, github_url = start_server(
+            FakeGithubHandler, files=files, latency=args.github_latency,
+            error_rate=args.github_error_rate, throttle_rate=args.github_throttle_rate,
+            retry_after=args.retry_after, stats=stats)
+
+        env = dict(os.environ)
+        env.update({
+            "LLM_API_KEY": "fake-key",
+            "LLM_API_URL": llm_url,
+            "GITHUB_TOKEN": "fake-token",
+            "GITHUB_API_URL": github_url,
+            "REPOSITORY_NAME": "repo",
+            "REPOSITORY_OWNER": "owner",
+            "REPOSITORY_PATH": repo_path,
+            "PROMPT_LEVEL": "0",
+            "REVIEW_CACHE_DIR": "",  # 关闭磁盘缓存，保证每次都真实调用
+            "GITHUB_HTTP_CACHE_DIR": "",
+            "REVIEW_STATE_DIR": "",
+            "RUN_REPORT_DIR": directory,
+            "REVIEW_MAX_CALLS": str(args.max_calls),
+            "REVIEW_MAX_TOKENS": str(10 ** 9),
+        })
+        if args.llm_providers > 1:
+            env["LLM_PROVIDERS"] = json.dumps([{"name": f"p{index + 1}", "url": url}
+                                               for index, (_, url) in enumerate(llm_servers)])
+        try:
+            process = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"],
+                                     env=env, capture_output=True, text=True, timeout=args.timeout)
+        finally:
+            for llm_server, _ in llm_servers:
+                llm_server.shutdown()
+            github_server.shutdown()
+
+    for line in process.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            summary = json.loads(line[len(RESULT_PREFIX):])
+            summary["server_requests"] = stats.snapshot()
+            return summary
+    raise RuntimeError(f"Benchmark run failed:\n{process.stderr[-4000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--files", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--languages", nargs="+", default=["cpp", "python", "java"],
+                        choices=["cpp", "python", "java"])
+    parser.add_argument("--functions", type=int, default=20, help="functions per file")
+    parser.add_argument("--density", type=float, default=0.05, help="fraction of lines changed")
+    parser.add_argument("--max-calls", type=int, default=300, help="REVIEW_MAX_CALLS for the run")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--llm-providers", type=int, default=1, help="fake LLM providers (hedging needs 2+)")
+    parser.add_argument("--llm-tail-rate", type=float, default=0.0, help="fraction of LLM calls with extra latency")
+    parser.add_argument("--llm-tail-latency", type=float, default=0.0)
+    parser.add_argument("--github-latency", type=float, default=0.02)
+    parser.add_argument("--github-error-rate", type=float, default=0.0)
+    parser.add_argument("--github-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=1800)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--max-wall-seconds", type=float, help="fail when any scenario is slower")
+    args = parser.parse_args()
+
+    if args.child:
+        run_child()
+        return
+
+    sys.path.insert(0, BENCH_DIR)
+    results = {}
+    print(f"{'files':>6} {'wall(s)':>8} {'llm p50':>8} {'llm p95':>8} {'rss(MB)':>8} "
+          f"{'reviews':>8} {'llm req':>8} {'gh req':>7} {'comments':>9} {'prefix hit':>10} {'ttft p50':>8} "
+          f"{'hedge/win':>9}")
+    for file_count in args.files:
+        summary = run_scenario(args, file_count)
+        results[file_count] = summary
+        # 开启批量评审时，延迟取批量请求的统计，评审函数数包含批量中的函数
+        stages = summary["stages"]
+        llm = stages.get("call_ai_model_batch") or stages.get("call_ai_model", {})
+        requests = summary["server_requests"]
+        counters = summary["counters"]
+        ttft = stages.get("llm_time_to_first_token", {})
+        reviews = stages.get("call_ai_model", {}).get("count", 0) + counters.get("llm_batch_functions", 0)
+        hit_tokens = counters.get("llm_prompt_cache_hit_tokens", 0)
+        prompt_tokens = hit_tokens + counters.get("llm_prompt_cache_miss_tokens", 0)
+        print(f"{file_count:>6} {summary['wall_seconds']:>8.2f} {llm.get('p50_seconds', 0):>8.3f} "
+              f"{llm.get('p95_seconds', 0):>8.3f} {summary['peak_rss_mb']:>8.1f} {reviews:>8} "
+              f"{requests.get('llm', 0):>8} {requests.get('github', 0) + requests.get('github_post', 0):>7} "
+              f"{requests.get('github_comments', 0):>9} {hit_tokens / max(prompt_tokens, 1):>10.1%} "
+              f"{ttft.get('p50_seconds', 0):>8.3f} "
+              f"{counters.get('llm_hedged_requests', 0):>5}/{counters.get('llm_hedge_wins', 0):<3}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.max_wall_seconds is not None:
+        slow = [count for count, summary in results.items() if summary["wall_seconds"] > args.max_wall_seconds]
+        if slow:
+            print(f"Wall time regression: {slow} files exceeded {args.max_wall_seconds}s")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
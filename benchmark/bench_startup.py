@@ -0,0 +1,116 @@
+# 冷启动基准：测量 import ai_code_reviewer 的耗时，以及从启动进程到第一个 GitHub 请求到达的耗时
+# 模拟的 PR 只改动了 Markdown 文件，评审流程拉取文件列表后即结束
+# 中位数超过 --max-ms 时返回非零退出码，可在 CI 中防止启动耗时回退
+# 默认阈值按单核 x86_64 主机、Python 3.11、按 requirements.txt 安装依赖的环境校准：
+# 解释器启动约 35 ms，导入 ai_code_reviewer 约 80 ms，到第一个 GitHub 请求约 175 ms；
+# 环境中装有 trio 时 httpcore 在创建第一个客户端时导入它，再增加约 50 ms（约 225 ms），默认 250 ms 为此留出余量
+# 更快的主机可以用 --max-ms 收紧阈值
+# 用法: python benchmark/bench_startup.py --repeat 10 --max-ms 250
+import argparse
+import importlib.util
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(BENCH_DIR, "..", "src"))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_servers import FakeGithubHandler, FakeLLMHandler, RequestStats, start_server  # noqa: E402
+
+IMPORT_TIME_RE = re.compile(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|\s+ai_code_reviewer$")
+
+
+# 用 -X importtime 测量导入 ai_code_reviewer 的累计耗时（毫秒）
+def measure_import(env):
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", "import ai_code_reviewer"],
+                             cwd=SRC_DIR, env=env, capture_output=True, text=True, check=True)
+    for line in process.stderr.splitlines():
+        match = IMPORT_TIME_RE.search(line)
+        if match:
+            return int(match.group(1)) / 1000
+    raise RuntimeError("ai_code_reviewer import time not found")
+
+
+# 空解释器的启动耗时（毫秒），作为参照：慢机器上解释器本身就可能占去大部分预算
+def measure_interpreter(env):
+    start = time.monotonic()
+    subprocess.run([sys.executable, "-c", "pass"], env=env, check=True)
+    return (time.monotonic() - start) * 1000
+
+
+# 从启动进程到模拟 GitHub 服务收到第一个请求的耗时（毫秒）
+def measure_first_request(env, github_server):
+    stats = RequestStats()
+    github_server.RequestHandlerClass.stats = stats
+    start = time.monotonic()
+    process = subprocess.run([sys.executable, "ai_code_reviewer.py", "1", "--dry-run"],
+                             cwd=SRC_DIR, env=env, capture_output=True, text=True)
+    if process.returncode != 0 or "github" not in stats.first_seen:
+        raise RuntimeError(f"Startup run failed:\n{process.stdout[-2000:]}\n{process.stderr[-2000:]}")
+    return (stats.first_seen["github"] - start) * 1000
+
+
+def describe(values):
+    return f"median {statistics.median(values):7.1f} ms, min {min(values):7.1f} ms, max {max(values):7.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=250, help="fail when median time to first GitHub request is slower")
+    parser.add_argument("--max-import-ms", type=float, help="fail when median import time is slower")
+    args = parser.parse_args()
+
+    files = [{"filename": "README.md", "patch": "@@ -1,0 +1,1 @@\n+hello"}]
+    llm_server, llm_url = start_server(FakeLLMHandler, latency=0)
+    github_server, github_url = start_server(FakeGithubHandler, files=files, latency=0)
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ)
+        env.update({
+            "LLM_API_KEY": "fake-key",
+            "LLM_API_URL": llm_url,
+            "GITHUB_TOKEN": "fake-token",
+            "GITHUB_API_URL": github_url,
+            "REPOSITORY_NAME": "repo",
+            "REPOSITORY_OWNER": "owner",
+            "REPOSITORY_PATH": directory,
+            "PROMPT_LEVEL": "0",
+            "REVIEW_CACHE_DIR": "",
+            "REVIEW_STATE_DIR": "",
+            "RUN_REPORT_DIR": directory,
+        })
+        try:
+            # 预热一次，避免首次运行时的 .pyc 编译和磁盘缓存影响结果
+            measure_first_request(env, github_server)
+            interpreter = [measure_interpreter(env) for _ in range(args.repeat)]
+            imports = [measure_import(env) for _ in range(args.repeat)]
+            first_requests = [measure_first_request(env, github_server) for _ in range(args.repeat)]
+        finally:
+            llm_server.shutdown()
+            github_server.shutdown()
+
+    # trio 不在 requirements.txt 中，但装有时会被 httpcore 导入，明显影响启动耗时
+    print(f"trio installed:                {'yes' if importlib.util.find_spec('trio') else 'no'}")
+    print(f"interpreter startup:           {describe(interpreter)}")
+    print(f"import ai_code_reviewer:       {describe(imports)}")
+    print(f"start to first GitHub request: {describe(first_requests)}")
+
+    failed = False
+    if statistics.median(first_requests) > args.max_ms:
+        print(f"Startup regression: first GitHub request after {statistics.median(first_requests):.1f} ms, "
+              f"target {args.max_ms} ms")
+        failed = True
+    if args.max_import_ms is not None and statistics.median(imports) > args.max_import_ms:
+        print(f"Import regression: {statistics.median(imports):.1f} ms, target {args.max_import_ms} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# 本地模拟服务，用于在不访问真实 LLM 和 GitHub 的情况下压测评审流程
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# 线程安全的请求计数
+class RequestStats:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.first_seen = {}  # 每类请求首次到达的 time.monotonic()
+
+    def increment(self, name):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            self.first_seen.setdefault(name, time.monotonic())
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counts)
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    latency = 0.0  # 每次应答的固定延迟（秒）
+    error_rate = 0.0  # 返回 500 的概率
+    throttle_rate = 0.0  # 返回 429 的概率
+    retry_after = 1  # 429 应答携带的 Retry-After（秒）
+    stats = None
+
+    def send_json(self, obj, status=200, headers=None):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    # 按配置注入 429 / 500，返回 True 表示已经应答
+    def inject_failure(self, name):
+        if self.stats is not None:
+            self.stats.increment(name)
+        if random.random() < self.throttle_rate:
+            if self.stats is not None:
+                self.stats.increment(f"{name}_429")
+            self.send_json({"message": "rate limited"}, 429, {"Retry-After": str(self.retry_after)})
+            return True
+        if random.random() < self.error_rate:
+            if self.stats is not None:
+                self.stats.increment(f"{name}_500")
+            self.send_json({"message": "internal error"}, 500)
+            return True
+        if self.latency:
+            time.sleep(self.latency)
+        return False
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length)
+
+    # 屏蔽默认的访问日志输出
+    def log_message(self, format, *args):
+        pass
+
+
+# 模拟 OpenAI 兼容的 chat completions 接口
+# 以 system 消息近似模拟服务端前缀缓存：见过的 system 消息按命中计入 prompt_cache_hit_tokens
+BATCH_FUNCTION_PATTERN = re.compile(r"### 函数 (f\d+)，变更行：(\d+)")
+
+
+class FakeLLMHandler(FakeHandler):
+    latency = 0.5  # 首个 token 之前的延迟
+    token_interval = 0.0  # 流式应答中相邻分片的间隔（秒）
+    tail_rate = 0.0  # 额外延迟 tail_latency 的请求比例，模拟长尾
+    tail_latency = 0.0
+    reply = "建议检查参数的边界条件，避免越界访问。"
+    seen_prefixes = set()
+    prefix_lock = threading.Lock()
+
+    def do_POST(self):
+        request = self.read_body()
+        if self.inject_failure("llm"):
+            return
+        if random.random() < self.tail_rate:
+            if self.stats is not None:
+                self.stats.increment("llm_tail")
+            time.sleep(self.tail_latency)
+        prompt_tokens = len(request) // 3
+        payload = json.loads(request or b"{}")
+        messages = payload.get("messages", [])
+        prefix = messages[0]["content"] if len(messages) > 1 and messages[0]["role"] == "system" else ""
+        with self.prefix_lock:
+            hit_tokens = len(prefix.encode("utf-8")) // 3 if prefix in self.seen_prefixes else 0
+            self.seen_prefixes.add(prefix)
+        content = self.reply
+        if payload.get("response_format", {}).get("type") == "json_object":
+            # 批量评审：对每个函数的第一处变更行给出意见
+            content = json.dumps({"reviews": [
+                {"id": function_id, "line": int(line), "comment": self.reply}
+                for function_id, line in BATCH_FUNCTION_PATTERN.findall(messages[-1]["content"])]})
+        if payload.get("stream"):
+            self.send_stream(content, prompt_tokens, hit_tokens)
+            return
+        self.send_json({
+            "id": "fake",
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 1, "total_tokens": prompt_tokens + 1,
+                      "prompt_cache_hit_tokens": hit_tokens, "prompt_cache_miss_tokens": prompt_tokens - hit_tokens},
+        })
+
+
+    # 以 SSE 分片返回应答，每个分片 8 个字符，最后一个分片携带 token 用量
+    def send_stream(self, content, prompt_tokens, hit_tokens):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        chunks = [{"choices": [{"index": 0, "delta": {"content": content[i:i + 8]}, "finish_reason": None}]}
+                  for i in range(0, len(content), 8)]
+        chunks.append({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                       "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": max(len(content) // 4, 1),
+                                 "total_tokens": prompt_tokens + max(len(content) // 4, 1),
+                                 "prompt_cache_hit_tokens": hit_tokens,
+                                 "prompt_cache_miss_tokens": prompt_tokens - hit_tokens}})
+        try:
+            for index, chunk in enumerate(chunks):
+                if index and self.token_interval:
+                    time.sleep(self.token_interval)
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 客户端提前截断
+
+
+# 模拟 GitHub 的 PR、PR 文件列表（分页）和 review 接口
+class FakeGithubHandler(FakeHandler):
+    files = []  # [{"filename": ..., "patch": ...}]
+    head_sha = "0" * 40
+    per_page_max = 100
+
+    pull_re = re.compile(r"^/repos/[^/]+/[^/]+/pulls/\d+$")
+
+    def do_GET(self):
+        if self.inject_failure("github"):
+            return
+        parsed = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(parsed.query)
+        if parsed.path.endswith("/files"):
+            per_page = min(int(query.get("per_page", ["30"])[0]), self.per_page_max)
+            page = int(query.get("page", ["1"])[0])
+            start = (page - 1) * per_page
+            headers = {}
+            if start + per_page < len(self.files):
+                next_url = f"http://{self.headers['Host']}{parsed.path}?per_page={per_page}&page={page + 1}"
+                headers["Link"] = f'<{next_url}>; rel="next"'
+            self.send_cacheable(self.files[start:start + per_page], headers)
+        elif parsed.path.endswith("/reviews"):
+            self.send_cacheable([])
+        elif self.pull_re.match(parsed.path):
+            self.send_cacheable({"head": {"sha": self.head_sha}})
+        else:
+            self.send_json({"message": "Not Found"}, 404)
+
+    # 带 ETag 应答，If-None-Match 一致时返回 304
+    def send_cacheable(self, obj, headers=None):
+        etag = f'"{hashlib.sha1(json.dumps(obj).encode("utf-8")).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            if self.stats is not None:
+                self.stats.increment("github_304")
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_json(obj, headers=dict(headers or {}, ETag=etag))
+
+    def do_POST(self):
+        payload = json.loads(self.read_body() or b"{}")
+        if self.inject_failure("github_post"):
+            return
+        if self.stats is not None:
+            for _ in payload.get("comments", [payload]):
+                self.stats.increment("github_comments")
+        self.send_json({"id": 1}, 201 if self.path.endswith("/comments") else 200)
+
+
+# 默认 backlog 只有 5，高并发压测时会出现连接排队
+class FakeHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+# 在后台线程启动服务，返回 (server, base_url)
+def start_server(handler_cls, **attrs):
+    handler = type(handler_cls.__name__, (handler_cls,), attrs)
+    server = FakeHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
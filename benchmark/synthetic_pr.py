@@ -0,0 +1,65 @@
+# 生成合成 PR：在临时目录写出 C++/Python/Java 源文件，并按变更密度生成对应的 patch
+import os
+import random
+
+FUNCTIONS_PER_FILE = 20
+
+
+def cpp_function(i, tag):
+    return [f"int func_{i}(int a, int b) {{", "  int c = a + b;", f"  if (c > {tag + i}) {{",
+            "    return c;", "  }", "  return a * b;", "}", ""]
+
+
+def python_function(i, tag):
+    return [f"def func_{i}(a, b):", "    c = a + b", f"    if c > {tag + i}:",
+            "        return c", "    return a * b", ""]
+
+
+def java_method(i, tag):
+    return [f"  public int func{i}(int a, int b) {{", "    int c = a + b;", f"    if (c > {tag + i}) {{",
+            "      return c;", "    }", "    return a * b;", "  }", ""]
+
+
+# tag 让不同文件的函数体互不相同，避免被评审缓存去重
+def make_source(language, functions, tag):
+    if language == "cpp":
+        return [line for i in range(functions) for line in cpp_function(i, tag)]
+    if language == "python":
+        return [line for i in range(functions) for line in python_function(i, tag)]
+    body = [line for i in range(functions) for line in java_method(i, tag)]
+    return ["public class Generated {"] + body + ["}"]
+
+
+# 以新增行的形式为随机选中的行生成 patch，每段连续的新增行对应一个 hunk
+def make_patch(line_count, density, rng):
+    added = [line for line in range(1, line_count + 1) if rng.random() < density]
+    hunks = []
+    index = 0
+    while index < len(added):
+        start = index
+        while index + 1 < len(added) and added[index + 1] == added[index] + 1:
+            index += 1
+        count = index - start + 1
+        old_start = added[start] - 1 - start
+        hunks.append(f"@@ -{old_start},0 +{added[start]},{count} @@")
+        hunks.extend("+" for _ in range(count))
+        index += 1
+    return "\n".join(hunks)
+
+
+# 返回 GitHub files 接口格式的文件列表
+def generate_pr(directory, file_count, languages=("cpp", "python", "java"), density=0.1,
+                functions=FUNCTIONS_PER_FILE, seed=0):
+    rng = random.Random(seed)
+    extensions = {"cpp": "cpp", "python": "py", "java": "java"}
+    files = []
+    for i in range(file_count):
+        language = languages[i % len(languages)]
+        filename = f"src/module_{i}.{extensions[language]}"
+        lines = make_source(language, functions, i * functions)
+        path = os.path.join(directory, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        files.append({"filename": filename, "patch": make_patch(len(lines), density, rng)})
+    return files
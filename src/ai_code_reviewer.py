@@ -1,19 +1,24 @@
 # 导入所需的模块
-import tree_sitter_cpp  # C++ 语法树解析模块
-import tree_sitter_python  # Python 语法树解析模块
-import tree_sitter_java  # Java 语法树解析模块
+# 语法模块（见 language_registry）在首次使用时才导入，只改动了不支持的文件类型的 PR 不需要加载它们
 import argparse  # 用于解析命令行参数
 import os  # 操作系统相关功能
 import asyncio  # 异步编程模块
-import bisect  # 用于二分查找
-import aiofiles  # 异步文件操作模块
-import re  # 正则表达式模块
 import common_function  # 自定义通用功能模块
-import threading  # 多线程模块
-from tree_sitter import Language, Parser  # 语法树解析器相关类
+import file_filter  # 文件预过滤模块
+import function_extractor  # 函数提取模块
+import function_trimmer  # 超长函数裁剪模块
+import language_registry  # 语言注册表模块
+import parse_worker  # 进程池解析模块
+import symbol_index  # 仓库符号索引模块
+import json  # JSON 序列化模块
 from ai_code_reviewer_logger import logger  # 日志记录模块
 from ai_module import DeepSeek  # AI 模型模块
 from github_assistant import GithubAssistant  # GitHub 辅助工具模块
+from local_git_diff import LocalGitDiff  # 本地 git diff 模块
+from review_scheduler import ReviewCandidate, ReviewScheduler  # 全局评审调度模块
+from review_pipeline import ReviewPipeline  # 分阶段评审流水线模块
+from dataclasses import dataclass  # 数据类模块
+from run_metrics import metrics  # 运行指标模块
 from typing import Optional  # 类型提示模块
 
 # 定义 C++ 代码分析器类
@@ -28,22 +33,13 @@ class CppCodeAnalyzer:
         "PROMPT_LEVEL"  # 提示级别
     )
     
-    # 定义文件扩展名的正则表达式
-    cpp_extensions = re.compile(r".*\.(cpp|hpp|h|tpp|cxx)$")  # C++ 文件扩展名
-    python_extensions = re.compile(r".*\.py$")  # Python 文件扩展名
-    java_extensions = re.compile(r".*\.java$")  # Java 文件扩展名
-    
-    # 定义线程锁
-    lock = threading.Lock()
-    
-    # 定义信号量，用于控制并发数量
-    semaphore = asyncio.Semaphore(os.cpu_count())
-    
-    # 构造函数，初始化分析器
-    def __init__(self, pull_request_id: int):
+    # 构造函数，初始化分析器；常驻服务中仓库信息随 PR 变化，可以直接传入而不读取环境变量
+    def __init__(self, pull_request_id: int, repository_owner: Optional[str] = None,
+                 repository_name: Optional[str] = None, repo_path: Optional[str] = None):
         # 批量校验环境变量是否已设置
+        provided = {"REPOSITORY_OWNER": repository_owner, "REPOSITORY_NAME": repository_name}
         missing_vars = [var for var in self.require_env_vars 
-                       if not os.environ.get(var)]
+                       if not (provided.get(var) or os.environ.get(var))]
         if missing_vars:
             raise RuntimeError(f"Missing environment variables: {', '.join(missing_vars)}")
         
@@ -54,8 +50,8 @@ class CppCodeAnalyzer:
         llm_api_key = os.environ.get("LLM_API_KEY")
         llm_api_url = os.environ.get("LLM_API_URL")
         github_token = os.environ.get("GITHUB_TOKEN")
-        repository_name = os.environ.get("REPOSITORY_NAME")
-        repository_owner = os.environ.get("REPOSITORY_OWNER")
+        repository_name = repository_name or os.environ.get("REPOSITORY_NAME")
+        repository_owner = repository_owner or os.environ.get("REPOSITORY_OWNER")
         
         try:
             # 初始化 AI 模型（目前只支持 DeepSeek）
@@ -64,190 +60,289 @@ class CppCodeAnalyzer:
             # 初始化 GitHub 辅助工具
             self.github_assistant = GithubAssistant(github_token, 
                                                     repository_owner, 
-                                                    repository_name, pull_request_id)
+                                                    repository_name, pull_request_id,
+                                                    repo_path)
         except Exception as e:
             # 记录异常日志
             logger.exception(f"Init ai_code_reviewer failed: {e}")
             raise
         
-        # 初始化语法树解析器
-        self._cpp_parser = None
-        self._py_parser = None
-        self._java_parser = None
+        # PR 级别的 LLM 调用调度器
+        self.scheduler = ReviewScheduler.from_env()
+        
+        # 函数体超过 token 上限时只保留变更行前后的上下文，仍然超限则拆分评审
+        self.function_max_tokens = common_function.get_env_int("REVIEW_FUNCTION_MAX_TOKENS", 2000)
+        self.context_lines = common_function.get_env_int("REVIEW_CONTEXT_LINES", 10)
+        
+        # 生成代码、第三方代码、二进制和超大文件在读取前过滤
+        self.file_filter = file_filter.FileFilter.from_env()
+        
+        # 评审时附上被调用函数和相关类型的签名，token 上限为 0 时关闭
+        self.symbol_context_tokens = common_function.get_env_int("REVIEW_SYMBOL_CONTEXT_TOKENS", 0)
+        self.symbol_index_dir = os.environ.get("REVIEW_SYMBOL_INDEX_DIR", "~/.cache/llm_mr_reviewer/symbols")
+        self.symbol_index = None
+        self._symbol_index_task = None
+        
+        # 本次运行中读取、解析或评审失败的次数
+        self.review_failures = 0
+        
         logger.info("Init ai_code_reviewer success")
 
-    # C++ 语法树解析器的属性
-    @property
-    def cpp_parser(self) -> Parser:
+    # 异步关闭资源
+    async def close(self):
+        # 等待未完成的索引更新，避免线程在事件循环关闭后仍在写索引文件
+        if self._symbol_index_task is not None:
+            await asyncio.gather(self._symbol_index_task, return_exceptions=True)
+        # 释放 AI 模型和 GitHub 辅助工具的资源
+        await asyncio.gather(self.ai_module.close(), self.github_assistant.close())
+    
+    # 分析函数的方法：一次性提取函数并与变更行归并，返回有变更的候选函数
+    def analyze_functions(self, root_node, lines, file_name, language) -> list:
+        # 根据语言确定函数节点类型
+        function_node_types = language_registry.get(language).function_node_types
+        functions = function_extractor.extract_functions(root_node, function_node_types)
+        # 此处就提取函数体，候选只保留文本，语法树可以尽早释放
+        candidates = []
+        for function, changed_lines in function_extractor.map_changed_lines(functions, lines):
+            body = self.timed_extract_function_body(function.node)
+            units = function_trimmer.split_function(
+                body, function.node.text.decode("utf-8", errors="replace"), function.start_line, changed_lines,
+                self.function_max_tokens, self.context_lines)
+            self.record_trim(len(units), function_trimmer.tokens_saved(body, units))
+            name = symbol_index.declaration_name(function.node) or ""
+            candidates.extend(ReviewCandidate(
+                                  file_name,
+                                  language,
+                                  unit.changed_lines,
+                                  unit.body,
+                                  function.end_line - function.start_line + 1,
+                                  function_name=name)
+                              for unit in units)
+        return candidates
+    
+    # 统计超长函数的裁剪和拆分，节省的 token 数写入运行报告
+    def record_trim(self, unit_count, saved_tokens):
+        if unit_count > 1:
+            metrics.increment("function_chunks", unit_count)
+        if saved_tokens:
+            metrics.increment("trimmed_functions")
+            metrics.increment("trim_tokens_saved", saved_tokens)
+    
+    # 在工作线程中增量更新仓库的符号索引，与拉取和解析变更文件并行执行
+    def start_symbol_index(self, repo_path):
+        if self.symbol_context_tokens <= 0 or not repo_path:
+            return
+        self.symbol_index = symbol_index.SymbolIndex(repo_path, self.symbol_index_dir, self.file_filter)
+        self._symbol_index_task = asyncio.create_task(asyncio.to_thread(self.symbol_index.update))
+    
+    # 为候选函数附上相关声明的签名；索引构建失败（如不是 git 仓库）时记录日志后不再附加，不影响评审
+    # 冷缓存时每批候选都要等待整个索引构建完成
+    async def attach_symbol_context(self, candidates):
+        if self._symbol_index_task is None:
+            return
         try:
-            with self.lock:  # 确保多线程安全
-                if self._cpp_parser is None:
-                    self._cpp_parser = Parser(Language(tree_sitter_cpp.language()))
+            await self._symbol_index_task
         except Exception as e:
-            raise RuntimeError(f"Failed to initialize C++ parser:{e}") from e
-        return self._cpp_parser
+            logger.warning(f"Symbol index unavailable, review without context:{e}")
+            self._symbol_index_task = None
+            return
+        with metrics.stage("symbol_context"):
+            for candidate in candidates:
+                candidate.context = self.symbol_index.context_for(
+                    candidate.function_body, candidate.file_name, candidate.function_name,
+                    self.symbol_context_tokens)
     
-    # Python 语法树解析器的属性
-    @property
-    def py_parser(self) -> Parser:
+    # 评审单个候选函数，返回 AI 的评审意见，应答异常时返回空字符串
+    async def review_candidate(self, candidate):
         try:
-            with self.lock:
-                if self._py_parser is None:
-                    self._py_parser = Parser(Language(tree_sitter_python.language()))
+            # 调用 AI 模型处理函数体
+            with metrics.stage("call_ai_model"):
+                response = await self.ai_module.call_ai_model(candidate.function_body, candidate.file_name,
+                                                              candidate.language, candidate.context)
         except Exception as e:
-            raise RuntimeError(f"Failed to initialize Python parser:{e}") from e
-        return self._py_parser
+            # 记录异常日志
+            logger.exception(f"AI processing failed:{e}")
+            raise
+        if response == self.ai_module.RESPONSE_ERROR:
+            # 应答异常的函数本次没有得到评审，不记录已评审的 head；错误提示不作为评论发布
+            self.review_failures += 1
+            return ""
+        return response
     
-    # Java 语法树解析器的属性
-    @property
-    def java_parser(self) -> Parser:
+    # 评审同一文件的一批候选函数，返回 (候选, 意见, 评论行号) 列表，没有建议的函数不返回
+    # 批量应答无法解析时，退回逐个函数评审
+    async def review_batch(self, candidates) -> list:
+        if len(candidates) == 1:
+            candidate = candidates[0]
+            response = await self.review_candidate(candidate)
+            return [(candidate, response, candidate.changed_lines[0])] if response.strip() else []
+        
+        first = candidates[0]
         try:
-            with self.lock:
-                if self._java_parser is None:
-                    self._java_parser = Parser(Language(tree_sitter_java.language()))
+            with metrics.stage("call_ai_model_batch"):
+                results = await self.ai_module.call_ai_model_batch(
+                    [(candidate.function_body, candidate.changed_lines, candidate.context)
+                     for candidate in candidates],
+                    first.file_name, first.language)
         except Exception as e:
-            raise RuntimeError(f"Failed to initialize JAVA parser:{e}") from e
-        return self._java_parser
+            logger.exception(f"AI batch processing failed:{e}")
+            raise
+        
+        reviews = []
+        fallback = []
+        for candidate, result in zip(candidates, results):
+            if result is None:
+                fallback.append(candidate)
+            elif result[1].strip():
+                line, comment = result
+                reviews.append((candidate, comment, line))
+        for candidate, response in zip(fallback, await asyncio.gather(
+                *[self.review_candidate(candidate) for candidate in fallback])):
+            if response.strip():
+                reviews.append((candidate, response, candidate.changed_lines[0]))
+        return reviews
     
-    # 异步关闭资源
-    async def close(self):
-        # 释放 AI 模型和 GitHub 辅助工具的资源
-        await asyncio.gather(self.ai_module.close(), self.github_assistant.close())
+    # 将评论添加到指定行，默认为函数变更的第一行
+    def publish_comment(self, candidate, response, line: Optional[int] = None):
+        with metrics.stage("add_comment"):
+            self.github_assistant.add_comment(candidate.file_name, line or candidate.changed_lines[0], response)
     
-    max_ai_calls = 3  # 最大调用次数
-    # 分析函数的异步方法
-    async def analyze_functions(self, node, lines, file_name, ai_call_count):
-        new_lines = lines  # 复制行号列表
-        
-        # 根据文件类型确定函数节点名称
-        function_node_name = "function_definition"
-        if file_name.endswith(".java"):
-            function_node_name = "method_declaration"
-
-        # 检查当前节点是否为函数定义
-        if node.type == function_node_name:
-            # 获取函数的开始和结束行
-            func_start_line = node.start_point[0] + 1  # start_point 是 (行, 列)，索引从 0 开始
-            func_end_line = node.end_point[0] + 1
-
-            # 使用二分查找快速定位范围
-            left = bisect.bisect_left(new_lines, func_start_line)
-            right = bisect.bisect_right(new_lines, func_end_line)
-            lines_to_process = new_lines[left:right]
-            
-            if lines_to_process  and ai_call_count < self.max_ai_calls:
-                try:
-                    # 提取函数体
-                    function_body = self.extract_function_body(node)
-                    # 调用 AI 模型处理函数体
-                    response = await self.ai_module.call_ai_model(function_body)
-                    # 将评论添加到函数变更的第一行
-                    self.github_assistant.add_comment(file_name, next(iter(lines_to_process), None), response)
-                    ai_call_count += 1  # 增加调用次数
-                except Exception as e:
-                    # 记录异常日志
-                    logger.exception(f"AI processing failed:{e}")
-                    raise
+    def timed_extract_function_body(self, node):
+        with metrics.stage("extract_function_body"):
+            return self.extract_function_body(node)
 
-            # 批量移除已处理行（维护有序性）
-            new_lines = lines[:left] + lines[right:]
-                
-        # 递归地遍历子节点
-        for child in node.children:
-            ai_call_count = await self.analyze_functions(child, new_lines, file_name, ai_call_count)
-            # await self.analyze_functions(child, new_lines, file_name)
-        return ai_call_count
-    
     # 提取函数体的方法
     def extract_function_body(self, node):
-        function_body = []  # 初始化函数体列表
-        # 递归遍历子节点，提取函数体的语法内容
-        for child in node.children:
-            text = getattr(child, "text", None)
-            if text is None:
-                continue  # 跳过无 text 属性的子节点
-            try:
-                # 统一处理字节类型或字符串类型
-                decoded = text.decode("utf-8", errors="replace") if isinstance(text, bytes) else str(text)
-                function_body.append(decoded)
-            except Exception as e:
-                # 跳过解码失败的项
-                continue  # FIXME: 简单的跳过可能导致函数提取不完整
-        
-        return "\n".join(function_body)  # 返回函数体字符串
+        return function_extractor.function_body(node)
 
-    # 分析单个文件的异步方法
-    async def analyze(self, diff_file_struct):
-        async with self.semaphore:  # 控制并发数量
-            try:
-                # 进行文件过滤
-                file_name = diff_file_struct.file_name
-                if self.cpp_extensions.match(file_name):
-                    parser = self.cpp_parser
-                elif self.python_extensions.match(file_name):
-                    parser = self.py_parser
-                elif self.java_extensions.match(file_name):
-                    parser = self.java_parser
-                else:
-                    return  # 如果文件类型不支持，则直接返回
-                
-                # 统一处理逻辑
-                try:
-                    logger.info(f"Start review file:{file_name}")
-                    
-                    # 异步读取文件
-                    async with aiofiles.open(diff_file_struct.file_path, 'r') as f:
-                        code = await f.read()
-                    
-                    # 语法树解析
-                    tree = parser.parse(bytes(code, 'utf-8'))
-                    root_node = tree.root_node
-                    
-                    # AST 遍历
-                    lines = diff_file_struct.diff_position
-                    lines.sort()
-                    # 初始化 AI 调用次数
-                    ai_call_count = 0
-                    # 分析函数并限制调用次数
-                    ai_call_count = await self.analyze_functions(
-                        root_node, 
-                        lines,
-                        file_name,
-                        ai_call_count
-                    )
-                    
-                except IOError as e:
-                    # 记录文件读取异常
-                    logger.exception(f"File read error:{file_name}, error: {e}")
-                except ValueError as e:
-                    # 记录解析异常
-                    logger.exception(f"Parsing error{file_name}, error: {e}")                    
-            except Exception as e:
-                # 记录未知异常
-                logger.exception(f"Unknown error: error: {file_name}, error: {e}")
+    # 根据扩展名识别语言，不支持的文件类型返回 None
+    def detect_language(self, file_name):
+        spec = language_registry.find_by_file(file_name)
+        return spec.name if spec is not None else None
+    
+    # 根据扩展名选择当前线程的解析器，不支持的文件类型返回 (None, None)
+    def select_parser(self, file_name):
+        language = self.detect_language(file_name)
+        if language is None:
+            return None, None
+        return language_registry.get_parser(language), language
     
-    # 分析代码的异步方法
-    async def analyze_code(self, diff_file_struct_list):
-        # 并发执行文件分析
-        await asyncio.gather(*[self.analyze(f) for f in diff_file_struct_list], return_exceptions=True)
+    # 只根据扩展名判断，不创建解析器
+    def is_supported(self, file_name) -> bool:
+        return self.detect_language(file_name) is not None
+    
+    # 在工作线程中读取文件的字节内容，大文件为内存映射，解析完成后由调用方释放
+    async def read_file(self, diff_file_struct):
+        with metrics.stage("read_file"):
+            return await asyncio.to_thread(self.file_filter.load_source, diff_file_struct.file_path)
+    
+    # 解析文件并提取有变更的函数，CPU 密集，由流水线放到工作线程中执行
+    def parse_and_extract(self, diff_file_struct, code) -> list:
+        file_name = diff_file_struct.file_name
+        parser, language = self.select_parser(file_name)
+        if parser is None:
+            return []
+        
+        # 语法树解析，直接使用读取到的字节，不经过 str 解码和重新编码
+        with metrics.stage("parse"):
+            tree = parser.parse(code)
+        
+        # 提取函数并与变更行匹配
+        lines = sorted(diff_file_struct.diff_position)
+        return self.analyze_functions(tree.root_node, lines, file_name, language)
+    
+    # 将进程池返回的函数记录转换为候选函数
+    def snippets_to_candidates(self, diff_file_struct, language, snippets) -> list:
+        # 同一函数拆分出的多个单元起始字节相同
+        unit_counts = {}
+        for snippet in snippets:
+            unit_counts[snippet.start_byte] = unit_counts.get(snippet.start_byte, 0) + 1
+        for snippet in snippets:
+            if snippet.saved_tokens or unit_counts.get(snippet.start_byte, 0) > 1:
+                self.record_trim(unit_counts.pop(snippet.start_byte, 0), snippet.saved_tokens)
+        return [ReviewCandidate(
+                    diff_file_struct.file_name,
+                    language,
+                    snippet.changed_lines,
+                    snippet.body,
+                    snippet.end_line - snippet.start_line + 1,
+                    function_name=snippet.name)
+                for snippet in snippets]
+    
+    # 分析代码的异步方法，支持列表或异步生成器形式的输入
+    async def analyze_code(self, diff_file_structs) -> int:
+        # 拉取、读取、解析、AI 评审、发布评论分阶段并行执行
+        pipeline = ReviewPipeline.from_env(self)
+        try:
+            return await pipeline.run(diff_file_structs)
+        finally:
+            self.review_failures += pipeline.failures
+
+# 单次评审的运行选项
+@dataclass
+class ReviewOptions:
+    incremental: bool = False  # 只评审上次评审之后的改动
+    diff_source: str = "github"  # 变更行来源：github 接口或本地 git diff
+    repo_path: Optional[str] = None  # 本地仓库路径，默认为工作流检出的位置
+    base: Optional[str] = None  # 本地 diff 的基准版本
+    head: str = "HEAD"  # 本地 diff 的目标版本，需与工作区检出的版本一致
+    dry_run: bool = False  # 只输出评论，不提交到 GitHub
+
+
+# 根据选项选择变更文件的来源
+def get_diff_source(analyzer, options: ReviewOptions):
+    github_assistant = analyzer.github_assistant
+    if options.diff_source == "local":
+        if options.incremental:
+            logger.warning("Incremental review is not supported by local diff source, review full diff")
+        base = options.base
+        if base is None and os.environ.get("GITHUB_BASE_REF"):
+            base = f"origin/{os.environ['GITHUB_BASE_REF']}"
+        if base is None:
+            raise ValueError("Local diff source requires --base or GITHUB_BASE_REF")
+        repo_path = options.repo_path or github_assistant.repo_path
+        analyzer.start_symbol_index(repo_path)
+        return LocalGitDiff(repo_path, base, options.head).iter_diff_file_structs()
+    analyzer.start_symbol_index(github_assistant.repo_path)
+    if options.incremental:
+        return github_assistant.iter_incremental_diff_file_structs()
+    return github_assistant.iter_diff_file_structs()
+
 
 # 异步主函数
-async def async_main(pull_request_id: int):
+async def async_main(pull_request_id: int, options: Optional[ReviewOptions] = None):
+    options = options or ReviewOptions()
     analyzer = CppCodeAnalyzer(pull_request_id)  # 初始化代码分析器
     try:
-        # 获取差异文件结构
-        diff_files = analyzer.github_assistant.get_diff_file_structs()
-        if not diff_files:
-            logger.warning(f"No files available for review")
-            return
-        # 分析代码
-        await analyzer.analyze_code(diff_files)
+        await review_pull_request(analyzer, options)
     except Exception as e:
         logger.exception(f"Unknown error:{e}")
         raise
     finally:
-        # 释放资源
+        # 释放资源；命令行只评审一个 PR，进程池随之关闭，常驻服务在退出时关闭
         await analyzer.close()
+        await asyncio.to_thread(parse_worker.shutdown_pool)
+        # 输出本次运行的阶段耗时和计数
+        metrics.write_report(os.environ.get("RUN_REPORT_DIR", "."))
+
+# 评审一个 PR 并提交评论，命令行和常驻服务共用
+async def review_pull_request(analyzer, options: ReviewOptions):
+    # 边获取差异文件边分析，增量模式下只评审上次评审之后的改动
+    diff_files = get_diff_source(analyzer, options)
+    file_count = await analyzer.analyze_code(diff_files)
+    if not file_count:
+        logger.warning(f"No files available for review")
+    
+    if options.dry_run:
+        # 离线模式下只输出评论
+        print(json.dumps(analyzer.github_assistant.pending_comments, ensure_ascii=False, indent=2))
+        return
+    # 将本次收集的评论作为一个 review 提交，没有评论时也会记录已评审的 head
+    # 有评审失败时只提交已有的评论，不记录 head，下次增量评审重新覆盖失败的改动
+    if analyzer.review_failures:
+        logger.warning(f"{analyzer.review_failures} reviews failed, keep the last reviewed head")
+    with metrics.stage("submit_review"):
+        await analyzer.github_assistant.submit_review(complete=not analyzer.review_failures)
 
 # 参数验证函数
 def validate_args(args) -> int:
@@ -264,6 +359,12 @@ def main():
     parser = argparse.ArgumentParser()  # 创建命令行参数解析器
     parser.add_argument("pull_request_id", type=int, help="pull request id")  # 添加 pull_request_id 参数
     parser.add_argument("--debug", type=bool, help="debug mode", required=False)  # 添加 debug 参数（可选）
+    parser.add_argument("--incremental", action="store_true", help="only review changes pushed since the last reviewed head")  # 增量评审（可选）
+    parser.add_argument("--diff-source", choices=("github", "local"), default="github", help="where to read changed lines from")  # 变更行来源（可选）
+    parser.add_argument("--repo-path", help="local repository path for --diff-source local")  # 本地仓库路径（可选）
+    parser.add_argument("--base", help="base revision for --diff-source local")  # 本地 diff 基准版本（可选）
+    parser.add_argument("--head", default="HEAD", help="head revision for --diff-source local")  # 本地 diff 目标版本（可选）
+    parser.add_argument("--dry-run", action="store_true", help="print comments instead of submitting them")  # 只输出评论（可选）
     
     try:
         args = parser.parse_args()  # 解析命令行参数
@@ -272,11 +373,19 @@ def main():
             
         logger.info(f"Start review pull request {pr_id}'s code")  # 记录日志
         
+        options = ReviewOptions(
+            incremental=args.incremental,
+            diff_source=args.diff_source,
+            repo_path=args.repo_path,
+            base=args.base,
+            head=args.head,
+            dry_run=args.dry_run)
+        
         # 根据 debug 参数决定是否启用调试模式
         if hasattr(args, 'debug') and args.debug:
-            asyncio.run(async_main(pr_id), debug=True)
+            asyncio.run(async_main(pr_id, options), debug=True)
         else:
-            asyncio.run(async_main(pr_id))
+            asyncio.run(async_main(pr_id, options))
         
     except (ValueError, argparse.ArgumentError) as e:
         logger.exception(f"parameter error:{e}")  # 记录参数错误
@@ -1,8 +1,33 @@
 # logger.py
+# 日志先写入内存队列，由后台线程格式化并写文件和终端，事件循环线程不做同步磁盘写入
+# 请求/应答内容只按 1/N 采样记录截断后的片段和哈希；完整内容写入可选的、按大小轮转并压缩的调试日志
+import atexit
+import collections
+import hashlib
+import itertools
+import json
+import os
+import queue
 import sys
 import logging
+import logging.handlers
 import structlog
 
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+# 不在调用线程中格式化日志记录，格式化和写入都在后台线程完成
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+
+    def prepare(self, record):
+        return record
+
+
 # 配置文件日志 Handler（记录 DEBUG 及以上）
 file_handler = logging.FileHandler("app.log", mode="w")
 file_handler.setLevel(logging.DEBUG)  # 记录所有日志
@@ -17,10 +42,36 @@ console_handler.setFormatter(logging.Formatter(
     "%(asctime)s - %(filename)s:%(lineno)d - %(levelname)s - %(message)s"
 ))
 
+# 两个 Handler 都挂在后台线程上，进程退出时写完队列中剩余的日志
+_queue_handler = _DeferredQueueHandler(queue.SimpleQueue())
+_listener = None
+
+
+def _start_listener():
+    global _listener
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, file_handler, console_handler,
+                                               respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    _listener.stop()
+
+
+# fork 出的子进程（如解析进程池）没有后台线程，换用新的队列并重新启动
+def _restart_listener_in_child():
+    _queue_handler.queue = queue.SimpleQueue()
+    _start_listener()
+
+
+_start_listener()
+atexit.register(_stop_listener)
+os.register_at_fork(after_in_child=_restart_listener_in_child)
+
 # 配置 logging 适配 structlog
 logging.basicConfig(
     level=logging.DEBUG,  # 全局最低日志级别
-    handlers=[file_handler, console_handler],  # 添加两个 Handler
+    handlers=[_queue_handler],
 )
 
 # 让 structlog 适配 logging
@@ -29,7 +80,8 @@ structlog.configure(
         structlog.processors.TimeStamper(fmt="iso"),
         structlog.processors.CallsiteParameterAdder(
             [structlog.processors.CallsiteParameter.FILENAME,
-             structlog.processors.CallsiteParameter.LINENO]
+             structlog.processors.CallsiteParameter.LINENO],
+            additional_ignores=[__name__],  # log_payload 记录调用方的位置
         ),
         structlog.processors.JSONRenderer(ensure_ascii=False),
     ],
@@ -38,4 +90,64 @@ structlog.configure(
 )
 
 # 创建全局 logger ---
-logger = structlog.get_logger("global_logger")
\ No newline at end of file
+logger = structlog.get_logger("global_logger")
+
+
+# 完整内容调试日志：每行一个 JSON，序列化在后台线程中进行
+class _PayloadFormatter(logging.Formatter):
+
+    def format(self, record):
+        return json.dumps({"time": self.formatTime(record), "kind": record.payload_kind, "payload": record.msg},
+                          ensure_ascii=False, default=str)
+
+
+# 轮转出的旧文件用 gzip 压缩
+def _gzip_rotator(source: str, dest: str):
+    import gzip
+    import shutil
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def _init_payload_logger():
+    payload_file = os.environ.get("LOG_PAYLOAD_FILE")
+    if not payload_file:
+        return None
+    handler = logging.handlers.RotatingFileHandler(
+        payload_file,
+        maxBytes=_env_int("LOG_PAYLOAD_MAX_BYTES", 50 * 1024 * 1024),
+        backupCount=_env_int("LOG_PAYLOAD_BACKUPS", 5),
+        encoding="utf-8")
+    handler.setFormatter(_PayloadFormatter())
+    handler.namer = lambda name: f"{name}.gz"
+    handler.rotator = _gzip_rotator
+    payload_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(payload_queue, handler)
+    listener.start()
+    atexit.register(listener.stop)
+    payload_logger = logging.getLogger("payload")
+    payload_logger.propagate = False
+    payload_logger.setLevel(logging.DEBUG)
+    payload_logger.addHandler(_DeferredQueueHandler(payload_queue))
+    return payload_logger
+
+
+_payload_logger = _init_payload_logger()
+_payload_max_chars = _env_int("LOG_PAYLOAD_MAX_CHARS", 1000)
+_payload_sample_rate = _env_int("LOG_PAYLOAD_SAMPLE_RATE", 10)
+# 每种内容单独计数，请求和应答交替出现时也能各自按 1/N 采样
+_payload_counters = collections.defaultdict(itertools.count)
+
+
+# 记录请求或应答内容：完整内容只进入调试日志；常规日志每 N 次记录一次，只保留长度、哈希和截断后的片段
+# 调用方不能在记录之后修改 payload，调试日志在后台线程中序列化
+def log_payload(kind: str, payload):
+    if _payload_logger is not None:
+        _payload_logger.debug(payload, extra={"payload_kind": kind})
+    if _payload_sample_rate <= 0 or next(_payload_counters[kind]) % _payload_sample_rate:
+        return
+    text = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False, default=str)
+    digest = hashlib.sha256(text.encode("utf-8", errors="replace")).hexdigest()[:16]
+    preview = text if len(text) <= _payload_max_chars else f"{text[:_payload_max_chars]}...(truncated)"
+    logger.debug(f"{kind} payload, chars:{len(text)}, sha256:{digest}, content:{preview}")
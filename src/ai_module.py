@@ -1,11 +1,25 @@
+import asyncio
+import functools
 import httpx
 import json
 import os
-import aiohttp
+import re
+import time
 import common_function
-from ai_code_reviewer_logger import logger
-from httpx import AsyncClient
-from openai import OpenAI
+import http_client_pool
+import llm_provider
+import review_cache
+from ai_code_reviewer_logger import logger, log_payload
+from function_trimmer import estimate_tokens
+from run_metrics import metrics
+
+# “没有问题”类的回答：整段应答或应答的第一行只有这一句时不发布评论
+NO_ISSUE_PATTERN = re.compile(
+    r"^\W*(lgtm|no issues?( found)?|looks good( to me)?|无|没有(发现)?(明显|严重)?的?问题|暂无(优化)?建议|无需修改)\W*$",
+    re.IGNORECASE)
+
+# 应答不完整的结束原因：接口的 max_tokens 截断，以及流式读取时的长度和截止时间截断
+TRUNCATED_FINISH_REASONS = ("length", "deadline")
 
 def read_json_file(file_path : str) -> dict: 
     try:
@@ -28,13 +42,72 @@ def read_json_file(file_path : str) -> dict:
         raise
 
 
+# 解析 usage 中的前缀缓存命中情况，返回 (命中 token 数, 未命中 token 数)
+# DeepSeek 返回 prompt_cache_hit_tokens / prompt_cache_miss_tokens，OpenAI 返回 prompt_tokens_details.cached_tokens
+def parse_prompt_cache_usage(usage: dict) -> tuple:
+    if "prompt_cache_hit_tokens" in usage:
+        hit = usage.get("prompt_cache_hit_tokens") or 0
+        return hit, usage.get("prompt_cache_miss_tokens", usage.get("prompt_tokens", 0) - hit) or 0
+    hit = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    return hit, max(usage.get("prompt_tokens", 0) - hit, 0)
+
+
+# 解析批量评审的 JSON 应答，返回 函数编号 -> [(行号, 意见)]；格式错误时返回 None
+# 模型有时会用 ``` 代码块包裹 JSON，先去掉再解析
+def parse_batch_response(content: str, function_ids) -> dict | None:
+    text = content.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    reviews = data.get("reviews") if isinstance(data, dict) else data
+    if not isinstance(reviews, list):
+        return None
+
+    result = {}
+    for item in reviews:
+        if not isinstance(item, dict) or str(item.get("id")) not in function_ids:
+            continue
+        comment = item.get("comment")
+        if not isinstance(comment, str) or not comment.strip():
+            continue
+        try:
+            line = int(item.get("line"))
+        except (TypeError, ValueError):
+            line = None
+        result.setdefault(str(item["id"]), []).append((line, comment.strip()))
+    return result
+
+
+# 提示词配置在进程内只读取一次，常驻服务中评审多个 PR 时复用
+@functools.lru_cache(maxsize=None)
+def load_prompt_config(file_path: str) -> dict:
+    return read_json_file(file_path)
+
+
 class DeepSeek:
     
+    # 同一进程内所有 DeepSeek 实例共享的连接池名称
+    HTTP_POOL_NAME = "llm"
+    
     # 默认提示词为lever_0
     DEFAULT_PROMPT = """你是一名经验丰富的计算机工程师，请从专业的角度，对以下代码进行review，对于不完善的地方，请提出针对性的优化建议，建议不超过3个。
                                   在给出意见时请保持语言的简洁，只需对可能导致程序严重错误的地方提出修改建议，无需给出示例代码。
                                   review 时不需要吹毛求疵，如果没有更好的优化建议，建议的内容可以为空"""
     
+    # LLM 应答异常时作为评审意见返回的内容，调用方据此统计评审失败
+    RESPONSE_ERROR = "AI model response error: Unexpected response"
+    
+    # 批量评审的输出格式要求，追加在评审要求之后，内容固定以保持 system 消息可被前缀缓存复用
+    BATCH_INSTRUCTION = """
+
+本次会给出同一文件中的多个函数，每个函数以“### 函数 <编号>，变更行：<行号列表>”开头。
+请只输出一个 JSON 对象，格式为 {"reviews": [{"id": "<函数编号>", "line": <行号>, "comment": "<评审意见>"}]}。
+line 必须是对应函数的变更行之一；没有建议的函数不要输出。"""
+    
     def __init__(self, url:str, key:str):
         # 参数校验
         common_function.parameter_check(url, "url")
@@ -47,14 +120,39 @@ class DeepSeek:
         # 私有变量保护敏感数据
         self._api_key = key.strip()
         
-        # 这个超时时间给的比较长是因为LLM的应答速度可能较慢
-        try: 
-            self.client = AsyncClient(trust_env=False, proxy=None, timeout=1000)
-        except Exception as e:
-            logger.exception(f"Init async client error:{e}")
-            raise RuntimeError("Init async client error") from e
+        # 本次运行的前缀缓存命中统计
+        self.prompt_cache_hit_tokens = 0
+        self.prompt_cache_miss_tokens = 0
+        
+        # 连接池在第一次调用 LLM 时才创建，没有可评审函数的 PR 不需要它
+        # 连接池大小与单次请求超时可通过环境变量配置
+        self.pool_size = common_function.get_env_int("LLM_POOL_SIZE", 32)
+        self._client = None
+        
+        # 流式接收应答：超过最大长度或截止时间的生成直接截断，不长时间占用并发名额
+        self.stream = common_function.get_env_int("LLM_STREAM", 1) != 0
+        self.stream_max_chars = common_function.get_env_int("LLM_STREAM_MAX_CHARS", 8000)
+        self.stream_deadline = common_function.get_env_float("LLM_STREAM_DEADLINE", 300)
+        # 本次运行流式生成的 token 数和耗时（首个 token 之后），用于计算平均生成速度
+        self.stream_completion_tokens = 0
+        self.stream_generation_seconds = 0.0
         
-        self.prompt = read_json_file("./prompt_level_configure.json")
+        self.prompt = load_prompt_config("./prompt_level_configure.json")
+        
+        # 一个或多个 OpenAI 兼容的服务商，各自的自适应并发限制与重试策略在所有 DeepSeek 实例间共享
+        self.router = llm_provider.ProviderRouter.from_env(
+            self.api_url, os.environ.get("LLM_MODEL", "deepseek-chat"), self.pool_size)
+        # 第一个服务商的限流器
+        self.limiter = self.router.providers[0].limiter
+        
+        # 所有服务商的模型名称同时作为评审缓存 key 的一部分，只有一个服务商时即为 LLM_MODEL
+        self.model = ",".join(provider.model for provider in self.router.providers)
+        
+        # 评审结果缓存，目录可在 CI 中跨运行持久化
+        self.review_cache = review_cache.ReviewCache(
+            os.environ.get("REVIEW_CACHE_DIR", "~/.cache/llm_mr_reviewer/reviews"),
+            common_function.get_env_int("REVIEW_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+            common_function.get_env_float("REVIEW_CACHE_MAX_AGE_DAYS", 30) * 24 * 3600)
         
 
         logger.info("Init ai model deepseek success")
@@ -68,11 +166,32 @@ class DeepSeek:
             return f"****{self._api_key[-4:]}" if self._api_key else None
         return None
     
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            # 读超时默认给的比较长是因为LLM的应答速度可能较慢
+            request_timeout = common_function.get_env_float("LLM_REQUEST_TIMEOUT", 600)
+            connect_timeout = common_function.get_env_float("LLM_CONNECT_TIMEOUT", 10)
+            self._client = http_client_pool.acquire_client(
+                self.HTTP_POOL_NAME,
+                self.pool_size,
+                httpx.Timeout(request_timeout, connect=connect_timeout),
+                trust_env=False)
+        return self._client
+    
     async def close(self):
         # 释放api key，防止其在内存中驻留
         self._api_key = None  # 主动清除敏感数据
-        await self.client.aclose() # 主动释放链接
-        self.client = None
+        self.report_prompt_cache()
+        self.report_stream()
+        self.review_cache.report()
+        self.router.report()
+        for provider in self.router.providers:
+            provider.limiter.report()
+        await asyncio.to_thread(self.review_cache.prune)
+        if self._client is not None:
+            await http_client_pool.release_client(self.HTTP_POOL_NAME) # 最后一个使用者负责释放连接池
+        self._client = None
         
 
     
@@ -114,48 +233,320 @@ class DeepSeek:
         finally:
             if response:
                 await response.aclose()
-    # 修改的地方：将 call_deepseek_async 方法改为使用 OpenAI 客户端
-    async def call_deepseek_async(self, prompt: str) -> any:
-        # 初始化 OpenAI 客户端
-        openai_client = OpenAI(api_key=self._api_key, base_url=self.api_url)
+    # 请求服务商使用的密钥：配置了环境变量名时从环境变量读取，否则为构造时传入的密钥
+    def provider_api_key(self, provider: llm_provider.LLMProvider) -> str | None:
+        if provider.api_key_env:
+            return os.environ.get(provider.api_key_env)
+        return self._api_key
 
+
+    # 通过共享连接池异步调用 OpenAI 兼容接口，不阻塞事件循环；prompt 可以是字符串或完整的 messages
+    # json_mode 为 True 时要求模型输出 JSON 对象（response_format）
+    # 由路由器选择服务商，超过对冲时机时向另一个服务商发送对冲请求
+    async def call_deepseek_async(self, prompt: str | list, timeout: float | None = None,
+                                  json_mode: bool = False) -> any:
         # 构造请求负载
-        payload = {
-            "model": "deepseek-chat",  # 修改模型名称以匹配官方示例
-            "messages": [
+        if isinstance(prompt, str):
+            messages = [
                 {"role": "system", "content": "You are a helpful assistant"},  # 添加系统角色的消息
                 {"role": "user", "content": prompt}  # 用户的消息
-            ],
-            "stream": False  # 添加 stream 参数
+            ]
+        else:
+            messages = prompt
+        payload = {
+            "messages": messages,
+            "stream": self.stream
         }
+        if self.stream:
+            # 让 OpenAI 兼容接口在最后一个分片中返回 token 用量
+            payload["stream_options"] = {"include_usage": True}
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
 
+        # 未指定时沿用连接池的默认超时
+        request_kwargs = {"timeout": timeout} if timeout is not None else {}
+        prompt_tokens = sum(estimate_tokens(message["content"]) for message in messages)
         try:
-            # 使用 OpenAI 客户端发送请求
-            response = openai_client.chat.completions.create(**payload)
-            # 返回响应内容
-            return response.choices[0].message.content
+            start = time.perf_counter()
+            response_json = await self.router.request(
+                prompt_tokens, lambda provider, attempt: self.call_provider(provider, payload, json_mode, request_kwargs, attempt))
+            # 记录 token 用量
+            usage = response_json.get("usage") or {}
+            metrics.increment("llm_prompt_tokens", usage.get("prompt_tokens", 0))
+            metrics.increment("llm_completion_tokens", usage.get("completion_tokens", 0))
+            self.record_prompt_cache(usage, time.perf_counter() - start)
+            return response_json
 
-        except Exception as e:
-            # 捕获并记录异常
-            logger.exception(f"Error calling DeepSeek API: {e}")
+        except httpx.HTTPStatusError as e:
+            logger.exception(f"DeepSeek API HTTP error:{e}")
             raise
+        except httpx.RequestError as e:
+            logger.exception(f"DeepSeek API network error:{e}")
+            raise
+        except json.JSONDecodeError as e:
+            logger.exception(f"DeepSeek API invalid JSON response:{e}")
+            raise
+
+
+    # 向一个服务商发送请求并返回应答 JSON，对冲请求被取消时随之中断
+    # 每次真正发出请求时记录到 attempt 中，服务商的延迟统计不包含排队和重试等待的时间
+    async def call_provider(self, provider: llm_provider.LLMProvider, payload: dict, json_mode: bool,
+                            request_kwargs: dict, attempt: llm_provider.Attempt | None = None) -> dict:
+        headers = {
+            "Authorization": f"Bearer {self.provider_api_key(provider)}",
+            "Content-Type": "application/json"
+        }
+        payload = dict(payload, model=provider.model)
+        if self.stream:
+            streamed = {}
+
+            # 在并发名额内读完整个流，限流或 5xx 时由限流器整体重试
+            # 截止时间从真正发出请求时开始计算，不包含在限流器中排队和 Retry-After 等待的时间
+            async def send():
+                start = time.perf_counter()
+                if attempt is not None:
+                    attempt.mark_sent()
+                request = self.client.build_request("POST", provider.chat_url, json=payload, headers=headers,
+                                                    **request_kwargs)
+                response = await self.client.send(request, stream=True)
+                if response.status_code != 200:
+                    await response.aread()
+                    return response
+                try:
+                    streamed["json"] = await self.read_stream(response, start, not json_mode)
+                finally:
+                    await response.aclose()
+                return response
+
+            response = await provider.limiter.request(send)
+            response.raise_for_status()
+            return streamed["json"]
+        async def post():
+            if attempt is not None:
+                attempt.mark_sent()
+            return await self.client.post(provider.chat_url, json=payload, headers=headers, **request_kwargs)
+
+        response = await provider.limiter.request(post)
+        response.raise_for_status()
+        return response.json()
+
+
+    # 增量拼接流式应答，返回与非流式接口相同结构的应答
+    # 超过最大长度或截止时间时截断，截断前没有收到任何内容时 content 为 None（按应答异常处理，不写入缓存）
+    # plain_text 为 True 时识别“没有问题”类的回答并返回空内容
+    async def read_stream(self, response: httpx.Response, start: float, plain_text: bool) -> dict:
+        parts = []
+        length = 0
+        usage = {}
+        finish_reason = None
+        first_token_time = None
+        first_line_checked = not plain_text
+        no_issue = False
+        cutoff = None
+        try:
+            async with asyncio.timeout(max(self.stream_deadline - (time.perf_counter() - start), 0)):
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    usage = chunk.get("usage") or usage
+                    for choice in chunk.get("choices") or []:
+                        finish_reason = choice.get("finish_reason") or finish_reason
+                        content = (choice.get("delta") or {}).get("content")
+                        if not content:
+                            continue
+                        if first_token_time is None:
+                            first_token_time = time.perf_counter()
+                            metrics.observe("llm_time_to_first_token", first_token_time - start)
+                        parts.append(content)
+                        length += len(content)
+                        # 第一行已经是“没有问题”时不再等待后续内容
+                        if not first_line_checked and "\n" in content:
+                            received = "".join(parts).strip()
+                            if "\n" in received:
+                                first_line_checked = True
+                                no_issue = bool(NO_ISSUE_PATTERN.match(received.split("\n", 1)[0]))
+                    if no_issue:
+                        cutoff = "no_issue"
+                        break
+                    if length >= self.stream_max_chars:
+                        cutoff = "length"
+                        break
+        except TimeoutError:
+            cutoff = "deadline"
+
+        text = "".join(parts)[:self.stream_max_chars]
+        if plain_text and not no_issue:
+            # 被截断的空应答不是“没有问题”，只有正常结束的空应答才是
+            no_issue = (not text.strip() and cutoff is None) or bool(NO_ISSUE_PATTERN.match(text.strip()))
+        if no_issue:
+            metrics.increment("llm_no_issue_responses")
+            text = ""
+        elif cutoff is not None:
+            metrics.increment(f"llm_stream_cutoff_{cutoff}")
+            logger.warning(f"LLM stream cut off by {cutoff}, received chars:{length}")
+            if not text.strip():
+                text = None
+            elif plain_text:
+                text += "\n\n（应答过长，已截断）" if cutoff == "length" else "\n\n（应答超时，已截断）"
+
+        # 记录生成速度：首个 token 之后每个输出 token 的平均耗时
+        if first_token_time is not None:
+            completion_tokens = usage.get("completion_tokens") or estimate_tokens(text or "")
+            generation_seconds = time.perf_counter() - first_token_time
+            self.stream_completion_tokens += completion_tokens
+            self.stream_generation_seconds += generation_seconds
+            metrics.observe("llm_time_per_output_token", generation_seconds / max(completion_tokens, 1))
+            logger.debug(f"LLM stream finished, ttft:{first_token_time - start:.3f}s, "
+                         f"tokens/s:{completion_tokens / max(generation_seconds, 1e-6):.1f}")
+        return {
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                         "finish_reason": cutoff or finish_reason}],
+            "usage": usage,
+        }
+
+
+    def report_stream(self):
+        if self.stream_generation_seconds:
+            logger.info(f"LLM stream stats, completion tokens:{self.stream_completion_tokens}, "
+                        f"tokens/s:{self.stream_completion_tokens / self.stream_generation_seconds:.1f}")
+
+
+    def record_prompt_cache(self, usage: dict, duration: float):
+        hit, miss = parse_prompt_cache_usage(usage)
+        self.prompt_cache_hit_tokens += hit
+        self.prompt_cache_miss_tokens += miss
+        metrics.increment("llm_prompt_cache_hit_tokens", hit)
+        metrics.increment("llm_prompt_cache_miss_tokens", miss)
+        # 分别统计命中与未命中前缀缓存的请求耗时，对比缓存带来的延迟收益
+        metrics.observe("llm_request_prefix_cached" if hit else "llm_request_prefix_uncached", duration)
 
 
-    async def call_ai_model(self, code_content):
+    def report_prompt_cache(self):
+        total = self.prompt_cache_hit_tokens + self.prompt_cache_miss_tokens
+        ratio = self.prompt_cache_hit_tokens / total if total else 0.0
+        logger.info(f"Prompt cache stats, hit tokens:{self.prompt_cache_hit_tokens}, "
+                    f"miss tokens:{self.prompt_cache_miss_tokens}, hit ratio:{ratio:.2%}")
+
+
+    # 组装消息：评审要求作为 system 消息，文件信息放在 user 消息开头，函数体放在最后
+    # 同一提示级别下评审要求逐字节不变，同一文件的函数还共享文件信息，构成可被服务端前缀缓存复用的公共前缀
+    # symbols 为相关声明的签名，放在文件信息之后、函数体之前
+    @staticmethod
+    def build_messages(prompt_text: str, code_content: str, file_name: str | None = None,
+                       language: str | None = None, symbols: str = "") -> list:
+        context = ""
+        if file_name:
+            context = f"文件：{file_name}\n"
+        if language:
+            context += f"语言：{language}\n"
+        if symbols:
+            context += f"相关声明：\n{symbols}\n"
+        return [
+            {"role": "system", "content": prompt_text},
+            {"role": "user", "content": f"{context}\n{code_content}" if context else code_content},
+        ]
+
+
+    # 当前提示级别对应的评审要求
+    def prompt_text(self) -> str:
+        prompt_level = os.environ.get("PROMPT_LEVEL")
+        if isinstance(prompt_level, str) and prompt_level in self.prompt:
+            return self.prompt[prompt_level]
+        return self.DEFAULT_PROMPT
+
+
+    async def call_ai_model(self, code_content, file_name: str | None = None, language: str | None = None,
+                            symbols: str = ""):
         logger.info("Start call ai model")
         
         #主函数，调用 DeepSeek 并输出结果
-        prompt_level = os.environ.get("PROMPT_LEVEL")
-        if isinstance(prompt_level, str) and prompt_level in self.prompt:
-            full_prompt = f"{self.prompt[prompt_level]}\n{code_content}"
-        else:
-            full_prompt = f"{self.DEFAULT_PROMPT}\n{code_content}"
+        prompt_text = self.prompt_text()
+        messages = self.build_messages(prompt_text, code_content, file_name, language, symbols)
         
-        logger.debug(f"Request content:{full_prompt}")
+        # 相同模型、提示词和函数体（及相关声明）的评审结果直接复用
+        cache_key = self.cache_key(prompt_text, code_content, symbols)
+        response_str = await self.review_cache.get_or_call(cache_key, lambda: self.request_review(messages))
+        if response_str is None:
+            return self.RESPONSE_ERROR
+        return response_str
+
+
+    # 相关声明变化时评审结果可能不同，作为缓存 key 的一部分；没有相关声明时与原有 key 一致
+    def cache_key(self, prompt_text: str, code_content: str, symbols: str = "") -> str:
+        if symbols:
+            code_content = f"{code_content}\0{symbols}"
+        return review_cache.make_cache_key(self.model, prompt_text, code_content)
+
+
+    # 组装批量评审消息：functions 为 (编号, 函数体, 变更行, 相关声明) 列表，同一文件的函数共享 system 消息和文件信息
+    @classmethod
+    def build_batch_messages(cls, prompt_text: str, functions: list, file_name: str | None = None,
+                             language: str | None = None) -> list:
+        sections = [f"### 函数 {function_id}，变更行：{', '.join(str(line) for line in changed_lines)}\n"
+                    + (f"相关声明：\n{symbols}\n" if symbols else "") + body
+                    for function_id, body, changed_lines, symbols in functions]
+        return cls.build_messages(prompt_text + cls.BATCH_INSTRUCTION, "\n\n".join(sections), file_name, language)
+
+
+    # 在一次请求中评审同一文件的多个函数，functions 为 (函数体, 变更行, 相关声明) 列表
+    # 返回与 functions 一一对应的结果：(行号, 意见)，意见为空表示没有建议；None 表示需要退回单函数评审
+    # 每个函数的结果单独写入缓存，与单函数评审共用缓存 key
+    async def call_ai_model_batch(self, functions: list, file_name: str | None = None,
+                                  language: str | None = None) -> list:
+        logger.info(f"Start call ai model batch, functions:{len(functions)}")
+        prompt_text = self.prompt_text()
+        keys = [self.cache_key(prompt_text, body, symbols) for body, _, symbols in functions]
+        results = [None] * len(functions)
+        pending = []
+        for index, (key, (body, changed_lines, _)) in enumerate(zip(keys, functions)):
+            cached = await self.review_cache.lookup(key)
+            if cached is not None:
+                results[index] = (changed_lines[0], cached)
+            else:
+                pending.append(index)
+        if not pending:
+            return results
+
+        function_ids = {f"f{index + 1}": index for index in pending}
+        messages = self.build_batch_messages(
+            prompt_text, [(function_id, *functions[index]) for function_id, index in function_ids.items()],
+            file_name, language)
+        content = await self.request_review(messages, json_mode=True)
+        cacheable = not isinstance(content, review_cache.Uncacheable)
+        if not cacheable:
+            content = content.value
+        parsed = parse_batch_response(content, function_ids) if content is not None else None
+        if parsed is None:
+            logger.warning(f"Batch review response is not valid JSON, fall back to single review:{file_name}")
+            metrics.increment("llm_batch_fallbacks")
+            return results
+
+        metrics.increment("llm_batch_requests")
+        metrics.increment("llm_batch_functions", len(pending))
+        for function_id, index in function_ids.items():
+            changed_lines = functions[index][1]
+            entries = parsed.get(function_id, [])
+            # 行号不在变更行中时挂到函数的第一处变更，同一函数的多条意见合并为一条评论
+            line = next((line for line, _ in entries if line in changed_lines), changed_lines[0])
+            comment = "\n\n".join(comment for _, comment in entries)
+            results[index] = (line, comment)
+            if cacheable:
+                await self.review_cache.store(keys[index], comment)
+        return results
+
+
+    # 请求 LLM 并解析出评审内容，应答异常时返回 None（不写入缓存）
+    # 因长度或截止时间截断的应答包装为 Uncacheable，只用于本次评论
+    async def request_review(self, messages: list, json_mode: bool = False) -> str | review_cache.Uncacheable | None:
+        log_payload("llm_request", messages)
         
         try:
-            response = await self.call_deepseek_async(full_prompt)
-            logger.debug(f"DeepSeek Response:{response}")
+            response = await self.call_deepseek_async(messages, json_mode=json_mode)
+            log_payload("llm_response", response)
         except httpx.HTTPError as e:
             logger.exception(f"Call ai model error:{e}")
             raise
@@ -165,16 +556,19 @@ class DeepSeek:
         
         
         if isinstance(response, dict) and ("choices" in response and response["choices"]):
-            if len(response["choices"]) > 0:
-                response_str = response["choices"][0]["message"]["content"]
-                return response_str
-            else:
-                return "AI model response error1: No choices found in response"
+            choice = response["choices"][0]
+            content = choice["message"]["content"]
+            if content is not None and choice.get("finish_reason") in TRUNCATED_FINISH_REASONS:
+                return review_cache.Uncacheable(content)
+            return content
+        elif isinstance(response, dict):
+            logger.error(f"AI model response error1: No choices found in response:{response}")
         elif isinstance(response, str):
             # 如果响应是字符串，直接返回
             return response
         else:
-            return "AI model response error2: Unexpected response type"
+            logger.error(f"AI model response error2: Unexpected response type:{type(response)}")
+        return None
         
 # import asyncio
 
@@ -1,3 +1,4 @@
+import os
 from ai_code_reviewer_logger import logger
 
 # 参数校验
@@ -8,4 +9,36 @@ def parameter_check(item : any, item_name : str):
 # 校验日志模块是否正常启动
 def log_init_check():
     if not hasattr(logger, 'info'):
-        raise RuntimeError(f":log init error")
\ No newline at end of file
+        raise RuntimeError(f":log init error")
+
+# 从环境变量读取整数配置，未设置时使用默认值
+def get_env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return int(value)
+    except ValueError as e:
+        raise ValueError(f"{name} must be an integer, got:{value}") from e
+
+
+# 从环境变量读取浮点数配置，未设置时使用默认值
+def get_env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return float(value)
+    except ValueError as e:
+        raise ValueError(f"{name} must be a number, got:{value}") from e
+
+
+
+# 将普通可迭代对象与异步可迭代对象统一为异步迭代
+async def as_async_iter(items):
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
@@ -0,0 +1,185 @@
+# 读取前的文件预过滤：生成代码、第三方代码、二进制和超大文件在读取和解析之前跳过，不消耗 LLM 预算
+# 先只根据路径（.gitattributes 的 linguist-generated / linguist-vendored 和排除规则）和文件大小判断，不读取内容；
+# 剩下的文件只读取一次字节内容（大文件用内存映射），检查文件头中的二进制和生成代码标记后直接交给解析器
+import fnmatch
+import mmap
+import os
+import re
+import common_function
+from ai_code_reviewer_logger import logger
+from run_metrics import metrics
+
+# 默认排除的路径：protobuf 等生成代码、压缩后的脚本和常见的第三方代码目录
+DEFAULT_EXCLUDE_GLOBS = (
+    "*.pb.h", "*.pb.cc", "*.pb.go", "*_pb2.py", "*_pb2_grpc.py", "*.min.js", "*.generated.*",
+    "third_party/*", "*/third_party/*", "vendor/*", "*/vendor/*", "node_modules/*", "*/node_modules/*",
+)
+
+# 生成代码的标准文件头：@generated、Go 的 "Code generated ... DO NOT EDIT." 和 protoc 的文件头
+# 只在文件开头的注释行中查找，避免普通注释或字符串中的 "auto-generated" 等字样被误判
+GENERATED_MARKER_RE = re.compile(
+    rb"@generated\b|\bCode generated .* DO NOT EDIT\.|Generated by the protocol buffer compiler\.")
+
+# 单行注释和块注释的开头，C/C++ 的预处理指令不算注释
+COMMENT_LINE_RE = re.compile(
+    rb"\s*(//|#(?!\s*(include|import|define|undef|if|ifdef|ifndef|elif|else|endif|pragma|error)\b)|/\*|\*|--|;|<!--)")
+
+
+# 在读取阶段或解析子进程中发现文件不需要评审
+class SkipFile(Exception):
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+# 返回文件开头注释中的生成代码标记所在行，没有时返回 None；遇到第一行代码即停止查找
+def generated_marker(head: bytes) -> bytes | None:
+    in_block = False
+    for line in head.splitlines():
+        if not line.strip():
+            continue
+        if not in_block and not COMMENT_LINE_RE.match(line):
+            return None
+        if GENERATED_MARKER_RE.search(line):
+            return line.strip()
+        # 块注释中间的行可能没有 * 前缀
+        if in_block:
+            in_block = b"*/" not in line and b"-->" not in line
+        else:
+            in_block = ((b"/*" in line and b"*/" not in line.split(b"/*", 1)[1])
+                        or (b"<!--" in line and b"-->" not in line))
+    return None
+
+
+# 解析 .gitattributes 中的 linguist-generated / linguist-vendored 规则，返回 [(模式, 属性, 是否设置)]
+def parse_gitattributes(text: str) -> list:
+    rules = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        pattern, *attributes = line.split()
+        for attribute in attributes:
+            name, _, value = attribute.lstrip("-!").partition("=")
+            if name in ("linguist-generated", "linguist-vendored"):
+                enabled = not attribute.startswith(("-", "!")) and value.lower() not in ("false", "0")
+                rules.append((pattern, name, enabled))
+    return rules
+
+
+# gitattributes 的模式：不含斜杠（或以 **/ 开头）时匹配任意一级的文件或目录名，否则从仓库根目录匹配
+# 匹配到目录时其下所有文件都算匹配
+def match_gitattributes(pattern: str, file_name: str) -> bool:
+    pattern = pattern.rstrip("/")
+    if pattern.startswith("**/"):
+        pattern = pattern[3:]
+    if "/" not in pattern:
+        return any(fnmatch.fnmatch(part, pattern) for part in file_name.split("/"))
+    pattern = pattern.lstrip("/")
+    return fnmatch.fnmatch(file_name, pattern) or fnmatch.fnmatch(file_name, f"{pattern}/*")
+
+
+class FileFilter:
+
+    def __init__(self, exclude_globs, max_file_bytes: int, mmap_threshold: int, sniff_bytes: int):
+        self.exclude_globs = tuple(exclude_globs)
+        self.max_file_bytes = max_file_bytes  # 0 表示不限制
+        self.mmap_threshold = mmap_threshold
+        self.sniff_bytes = sniff_bytes
+        # 仓库根目录 -> .gitattributes 规则，常驻服务中不同仓库分别缓存
+        self._attributes = {}
+
+
+    @classmethod
+    def from_env(cls):
+        globs = os.environ.get("REVIEW_EXCLUDE_GLOBS")
+        return cls(
+            DEFAULT_EXCLUDE_GLOBS if globs is None else [glob.strip() for glob in globs.split(",") if glob.strip()],
+            common_function.get_env_int("REVIEW_MAX_FILE_BYTES", 1024 * 1024),
+            common_function.get_env_int("REVIEW_MMAP_THRESHOLD", 256 * 1024),
+            common_function.get_env_int("REVIEW_SNIFF_BYTES", 4096))
+
+
+    # 文件路径去掉仓库内的相对路径即为仓库根目录
+    @staticmethod
+    def repo_root(file_name: str, file_path: str) -> str:
+        if file_path.endswith(file_name):
+            return file_path[:len(file_path) - len(file_name)] or "."
+        return os.path.dirname(file_path)
+
+
+    def gitattributes(self, root: str) -> list:
+        rules = self._attributes.get(root)
+        if rules is None:
+            try:
+                with open(os.path.join(root, ".gitattributes"), "r", encoding="utf-8", errors="replace") as f:
+                    rules = parse_gitattributes(f.read())
+            except OSError:
+                rules = []
+            self._attributes[root] = rules
+        return rules
+
+
+    # 只根据路径和文件大小判断，返回跳过原因，需要评审时返回 None
+    def check(self, diff_file_struct) -> str | None:
+        return self.check_path(diff_file_struct.file_name, diff_file_struct.file_path)
+
+
+    # file_name 为仓库内的相对路径，file_path 为本地路径
+    def check_path(self, file_name: str, file_path: str) -> str | None:
+        if any(fnmatch.fnmatch(file_name, glob) for glob in self.exclude_globs):
+            return "excluded"
+
+        # 后面的规则覆盖前面的规则
+        attributes = {}
+        for pattern, name, enabled in self.gitattributes(self.repo_root(file_name, file_path)):
+            if match_gitattributes(pattern, file_name):
+                attributes[name] = enabled
+        if attributes.get("linguist-generated"):
+            return "generated"
+        if attributes.get("linguist-vendored"):
+            return "vendored"
+
+        if self.max_file_bytes:
+            try:
+                size = os.stat(file_path).st_size
+            except OSError:
+                return None  # 由读取阶段报告错误
+            if size > self.max_file_bytes:
+                return "oversized"
+        return None
+
+
+    # 读取文件的字节内容，大文件使用只读内存映射，不做解码和重新编码；用完后调用 release_source
+    # 文件头含有 NUL 字节或生成代码标记时抛出 SkipFile
+    def load_source(self, file_path: str):
+        with open(file_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size >= self.mmap_threshold > 0:
+                source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                source = f.read()
+        head = source[:self.sniff_bytes]
+        reason = None
+        if b"\0" in head:
+            reason = "binary"
+        elif (marker := generated_marker(head)) is not None:
+            reason = "generated"
+            # 按内容判断可能误判，记录匹配到的文件头便于排查
+            logger.warning(f"Skip generated file:{file_path}, marker:{marker[:200].decode('utf-8', errors='replace')}")
+        if reason is not None:
+            release_source(source)
+            raise SkipFile(reason)
+        return source
+
+
+# 关闭内存映射；语法树节点的 text 直接引用映射的内存，必须在提取完函数体之后调用
+def release_source(source):
+    if isinstance(source, mmap.mmap):
+        source.close()
+
+
+def record_skip(file_name: str, reason: str):
+    metrics.increment(f"files_skipped_{reason}")
+    logger.info(f"Skip file:{file_name}, reason:{reason}")
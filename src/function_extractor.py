@@ -0,0 +1,67 @@
+# 函数提取：用 TreeCursor 迭代遍历一次语法树得到所有函数的位置，再与变更行做一次有序归并
+from dataclasses import dataclass, field
+from tree_sitter import Node
+
+
+@dataclass
+class FunctionRecord:
+    start_line: int  # 起始行，从 1 开始
+    end_line: int  # 结束行（包含）
+    start_byte: int
+    end_byte: int
+    node: Node = field(default=None, repr=False, compare=False)  # 对应的语法树节点
+
+
+# 提取最外层的函数，嵌套在其他函数内部的函数（如 lambda、内部函数）归属外层函数
+# 命中函数节点后不再进入其子树，函数体内的节点完全不会被访问；迭代实现不受递归深度限制
+def extract_functions(root_node: Node, function_node_types) -> list:
+    if isinstance(function_node_types, str):
+        function_node_types = (function_node_types,)
+
+    functions = []
+    cursor = root_node.walk()
+    while True:
+        node = cursor.node
+        if node.type in function_node_types:
+            functions.append(FunctionRecord(node.start_point[0] + 1, node.end_point[0] + 1,
+                                            node.start_byte, node.end_byte, node))
+        elif cursor.goto_first_child():
+            continue
+        # 没有子节点（或跳过函数子树）时，回溯到下一个兄弟节点
+        while not cursor.goto_next_sibling():
+            if not cursor.goto_parent():
+                return functions
+
+
+# 将有序的变更行归并到有序且互不重叠的函数区间，返回 [(函数, 该函数内的变更行)]
+def map_changed_lines(functions: list, changed_lines: list) -> list:
+    result = []
+    line_index = 0
+    line_count = len(changed_lines)
+    for function in functions:
+        while line_index < line_count and changed_lines[line_index] < function.start_line:
+            line_index += 1
+        first = line_index
+        while line_index < line_count and changed_lines[line_index] <= function.end_line:
+            line_index += 1
+        if line_index > first:
+            result.append((function, changed_lines[first:line_index]))
+        if line_index >= line_count:
+            break
+    return result
+
+
+# 拼接函数节点各个子节点的文本作为函数体，线程和进程池中的解析共用同一实现
+def function_body(node: Node) -> str:
+    function_body = []
+    for child in node.children:
+        text = getattr(child, "text", None)
+        if text is None:
+            continue  # 跳过无 text 属性的子节点
+        try:
+            # 统一处理字节类型或字符串类型
+            decoded = text.decode("utf-8", errors="replace") if isinstance(text, bytes) else str(text)
+            function_body.append(decoded)
+        except Exception:
+            continue  # FIXME: 简单的跳过可能导致函数提取不完整
+    return "\n".join(function_body)
@@ -0,0 +1,126 @@
+# 超长函数的裁剪与分块：函数体超过 token 上限时，只保留变更行及其上下文，省略未改动的代码块
+# 裁剪后仍然超限的函数按变更区域拆分为多个评审单元，每个单元单独评审
+# 线程解析和进程池解析共用同一实现，只处理文本，不依赖语法树节点
+import re
+from dataclasses import dataclass
+
+# 标识符和数字按 4 个字符一个 token 估算，标点符号和中文字符各算一个 token
+_TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_]{1,4}|[^\sA-Za-z0-9_]")
+
+
+# 本地快速估算文本的 token 数，不依赖模型的分词器
+def estimate_tokens(text: str) -> int:
+    return len(_TOKEN_PATTERN.findall(text)) + 1
+
+
+@dataclass
+class ReviewUnit:
+    changed_lines: list  # 单元内的变更行
+    body: str
+
+
+def _elision(first_line: int, last_line: int) -> str:
+    return f"... 省略第 {first_line}-{last_line} 行，共 {last_line - first_line + 1} 行未改动 ..."
+
+
+# 按行号区间渲染保留的代码，区间之间用省略说明连接；ranges 为按顺序排列的 (起始下标, 结束下标)
+def _render(lines: list, start_line: int, ranges: list) -> str:
+    parts = []
+    previous_end = -1
+    for first, last in ranges:
+        if first > previous_end + 1:
+            parts.append(_elision(start_line + previous_end + 1, start_line + first - 1))
+        parts.extend(lines[first:last + 1])
+        previous_end = last
+    if previous_end < len(lines) - 1:
+        parts.append(_elision(start_line + previous_end + 1, start_line + len(lines) - 1))
+    return "\n".join(parts)
+
+
+# 每处变更行向前后扩展 context_lines 行，合并重叠或相邻的区间，返回 [[起始下标, 结束下标, 变更行]]
+def _changed_regions(line_count: int, start_line: int, changed_lines: list, context_lines: int) -> list:
+    regions = []
+    for line in changed_lines:
+        index = line - start_line
+        first = max(index - context_lines, 0)
+        last = min(index + context_lines, line_count - 1)
+        if regions and first <= regions[-1][1] + 1:
+            regions[-1][1] = max(regions[-1][1], last)
+            regions[-1][2].append(line)
+        else:
+            regions.append([first, last, [line]])
+    return regions
+
+
+# 单个变更区域本身超限时按行切分，变更行归属所在的分段
+def _split_region(lines: list, start_line: int, region: list, max_tokens: int) -> list:
+    first, last, changed = region
+    pieces = []
+    piece_start = first
+    piece_tokens = 0
+    for index in range(first, last + 1):
+        tokens = estimate_tokens(lines[index])
+        if index > piece_start and piece_tokens + tokens > max_tokens:
+            pieces.append([piece_start, index - 1])
+            piece_start = index
+            piece_tokens = 0
+        piece_tokens += tokens
+    pieces.append([piece_start, last])
+    return [[piece_first, piece_last,
+             [line for line in changed if piece_first <= line - start_line <= piece_last]]
+            for piece_first, piece_last in pieces]
+
+
+# 将超长函数裁剪或拆分为评审单元；未超限时原样返回一个单元
+# source 为函数的原始文本，start_line 为其在文件中的起始行，首行（函数签名）始终保留
+def split_function(body: str, source: str, start_line: int, changed_lines: list,
+                   max_tokens: int, context_lines: int) -> list:
+    if max_tokens <= 0 or estimate_tokens(body) <= max_tokens:
+        return [ReviewUnit(changed_lines, body)]
+
+    lines = source.splitlines()
+    changed_lines = [line for line in changed_lines if 0 <= line - start_line < len(lines)]
+    if not lines or not changed_lines:
+        return [ReviewUnit(changed_lines, body)]
+
+    regions = _changed_regions(len(lines), start_line, changed_lines, context_lines)
+    trimmed = _render(lines, start_line, [(0, 0)] + [(first, last) for first, last, _ in regions])
+    if estimate_tokens(trimmed) <= max_tokens:
+        return [ReviewUnit(changed_lines, trimmed)]
+
+    # 裁剪后仍然超限：按变更区域贪心分组，每组连同函数签名和省略说明不超过上限
+    # 每个区域前最多一条省略说明，末尾再预留一条
+    elision_tokens = estimate_tokens(_elision(start_line, start_line + len(lines)))
+    budget = max(max_tokens - estimate_tokens(lines[0]) - elision_tokens, 1)
+    groups = []
+    group_tokens = 0
+    for region in regions:
+        region_tokens = estimate_tokens("\n".join(lines[region[0]:region[1] + 1])) + elision_tokens
+        if region_tokens > budget:
+            groups.extend([piece] for piece in _split_region(lines, start_line, region, budget - elision_tokens))
+            group_tokens = budget  # 切分后的区域独占分组
+            continue
+        if groups and group_tokens + region_tokens <= budget:
+            groups[-1].append(region)
+            group_tokens += region_tokens
+        else:
+            groups.append([region])
+            group_tokens = region_tokens
+
+    units = []
+    for group in groups:
+        group_changed = [line for region in group for line in region[2]]
+        if not group_changed:
+            continue
+        ranges = [(first, last) for first, last, _ in group]
+        if ranges[0][0] > 0:
+            ranges.insert(0, (0, 0))
+        units.append(ReviewUnit(group_changed, _render(lines, start_line, ranges)))
+    return units
+
+
+# 裁剪和拆分节省的 token 数；拆分后各单元共用函数签名，节省量可能小于省略的代码量
+def tokens_saved(body: str, units: list) -> int:
+    if len(units) == 1 and units[0].body is body:
+        return 0
+    return max(estimate_tokens(body) - sum(estimate_tokens(unit.body) for unit in units), 0)
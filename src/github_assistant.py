@@ -1,9 +1,15 @@
-import requests
+import asyncio
+import httpx
 import json
+import os
 import re
 import urllib.parse
 import common_function
-from ai_code_reviewer_logger import logger
+import http_cache
+import http_client_pool
+import rate_limiter
+from ai_code_reviewer_logger import logger, log_payload
+from run_metrics import metrics
 from dataclasses import dataclass
 from enum import Enum
 
@@ -16,14 +22,26 @@ class DiffFileStruct:
 
 class GithubAssistant:
     
+    # 同一进程内所有 GithubAssistant 实例共享的连接池名称
+    HTTP_POOL_NAME = "github"
+    # 单个 review 携带的最大行内评论数，超出时拆分为多个 review
+    max_review_comments = 100
+    
     hunk_header_re = re.compile(r'^@@ -(\d+)(?:,\d+)? \+(\d+)(?:,\d+)? @@')
     
+    # 写入 review 正文的隐藏标记，记录本次评审到的 head SHA，供增量评审使用
+    review_marker = "<!-- llm_mr_reviewer:head={sha} -->"
+    review_marker_re = re.compile(r"<!-- llm_mr_reviewer:head=([0-9a-f]{7,40}) -->")
+    # compare 接口最多返回 300 个文件，达到上限时无法保证增量结果完整
+    max_compare_files = 300
+    
     def __init__(
         self,
         github_token: str,
         repository_owner: str,
         repository_name: str,
-        pull_request_id: int
+        pull_request_id: int,
+        repo_path: str | None = None
     ):
         common_function.parameter_check(github_token, "github token")
         common_function.parameter_check(repository_owner, "repository owner")
@@ -45,17 +63,51 @@ class GithubAssistant:
         "X-GitHub-Api-Version":"2022-11-28"
         }
         
-        self.pr_base_url = f"https://api.github.com/repos/{self.owner}/{self.repo}/pulls/{self.pull_request_id}"
+        # 兼容 GitHub Enterprise，Actions 中会自动设置 GITHUB_API_URL
+        self.api_base_url = os.environ.get("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+        self.pr_base_url = f"{self.api_base_url}/repos/{self.owner}/{self.repo}/pulls/{self.pull_request_id}"
+        
+        # 被评审仓库在本地的检出位置，默认为工作流中 code/<repo> 相对于 src 的路径
+        self.repo_path = repo_path or os.environ.get("REPOSITORY_PATH", f"../../{self.repo}")
+        
+        # 所有 GitHub 请求复用同一个连接池
+        pool_size = common_function.get_env_int("GITHUB_POOL_SIZE", 16)
+        request_timeout = common_function.get_env_float("GITHUB_REQUEST_TIMEOUT", 10)
+        self.client = http_client_pool.acquire_client(
+            self.HTTP_POOL_NAME,
+            pool_size,
+            httpx.Timeout(request_timeout))
+        self.limiter = rate_limiter.get_limiter(self.HTTP_POOL_NAME, "GITHUB", pool_size, 5, 120)
+        
+        # GET 应答的条件请求缓存，PR 信息和文件列表未变化时只消耗一次 304
+        self.http_cache = http_cache.HttpCache(
+            os.environ.get("GITHUB_HTTP_CACHE_DIR", "~/.cache/llm_mr_reviewer/github"),
+            common_function.get_env_int("GITHUB_HTTP_CACHE_MAX_BYTES", 32 * 1024 * 1024),
+            common_function.get_env_float("GITHUB_HTTP_CACHE_MAX_AGE_DAYS", 7) * 24 * 3600)
         
         # 获取 commit SHA
         
         self._commit_sha = None
+        
+        # 本次运行收集到的行内评论，结束时统一以 review 的形式提交
+        self.pending_comments = []
+        
+        # 本地记录已评审 head SHA 的状态文件，与评审缓存放在同一目录便于在 CI 中持久化
+        state_dir = os.environ.get("REVIEW_STATE_DIR", "~/.cache/llm_mr_reviewer/state")
+        self.state_file = os.path.join(os.path.expanduser(state_dir),
+                                       f"{self.owner}_{self.repo}_{self.pull_request_id}.json") if state_dir else None
     
         logger.info("Init github assistant success")
     
     
     async def close(self):
         self._github_token = None  # 主动清除敏感数据    
+        self.limiter.report()
+        self.http_cache.report()
+        await asyncio.to_thread(self.http_cache.prune)
+        if self.client is not None:
+            await http_client_pool.release_client(self.HTTP_POOL_NAME)
+        self.client = None
     
     
     # 对token进行保护
@@ -67,10 +119,9 @@ class GithubAssistant:
 
 
     # 懒加载，需要时再获取
-    @property
-    def commit_sha(self) -> str | None:
+    async def get_commit_sha(self) -> str | None:
         if self._commit_sha is None:
-            response_json =  self.call_github_api("GET", self.pr_base_url)
+            response_json = await self.call_github_api("GET", self.pr_base_url)
             if "head" not in response_json or "sha" not in response_json["head"]:
                 raise KeyError("Missing commit SHA in PR data")
             self._commit_sha = response_json["head"]["sha"]
@@ -78,28 +129,68 @@ class GithubAssistant:
         return self._commit_sha
 
 
-    def call_github_api(self, request_method:str, url:str, payload:dict = None) -> any:
+    # GET 请求带上缓存的 ETag / Last-Modified，304 时用缓存内容构造应答
+    async def get_with_cache(self, url: str) -> httpx.Response:
+        key = self.http_cache.make_key(url, self.headers)
+        entry = await self.http_cache.load(key)
+        headers = dict(self.headers, **self.http_cache.conditional_headers(entry)) if entry else self.headers
+        response = await self.limiter.request(lambda: self.client.get(url, headers=headers))
+        if response.status_code == 304 and entry is not None:
+            return self.http_cache.from_entry(entry, response)
+        await self.http_cache.update(key, response)
+        return response
+
+
+    async def call_github_api(self, request_method:str, url:str, payload:dict = None) -> any:
         try:
-            with requests.request(request_method, url, headers=self.headers, timeout=10, json=payload) as response:
-                response.raise_for_status()  # 自动触发HTTPError
-                response_json = response.json()
-                logger.info(f"API success response, url:{url}, request_method:{request_method}")
-                logger.debug(f"response json:{response_json}")
-                return response_json
-        except requests.exceptions.RequestException as e:
+            if request_method == "GET" and payload is None:
+                response = await self.get_with_cache(url)
+            else:
+                # 写操作只在确定未被处理时重试，避免重复提交评论
+                response = await self.limiter.request(
+                    lambda: self.client.request(request_method, url, headers=self.headers, json=payload),
+                    idempotent=request_method in ("GET", "HEAD"))
+            response.raise_for_status()  # 自动触发HTTPError
+            response_json = response.json()
+            logger.info(f"API success response, url:{url}, request_method:{request_method}")
+            log_payload("github_response", response_json)
+            return response_json
+        except httpx.HTTPStatusError as e:
+            logger.exception(f"API request failed:{e}, response:{e.response.text}")
+            raise
+        except httpx.RequestError as e:
             logger.exception(f"API request failed:{e}")
             raise
-        except requests.exceptions.JSONDecodeError:
+        except json.JSONDecodeError:
             logger.exception("Failed to parse response JSON")
         except Exception as e:
-            logger.exception("Unknown error:{e}")
+            logger.exception(f"Unknown error:{e}")
             raise
         
     
-    # FIXME: 暂时不考虑分页
-    def get_pr_change_files(self):
-        url = f"https://api.github.com/repos/{self.owner}/{self.repo}/pulls/{self.pull_request_id}/files?per_page=100" # 目前最大支持单次100个文件的修改
-        return self.call_github_api("GET", url)
+    # 按 Link 头逐页获取，每拿到一页就交给调用方处理
+    async def iter_github_pages(self, url: str):
+        while url:
+            try:
+                response = await self.get_with_cache(url)
+                response.raise_for_status()
+                page = response.json()
+            except httpx.HTTPStatusError as e:
+                logger.exception(f"API request failed:{e}, response:{e.response.text}")
+                raise
+            except httpx.RequestError as e:
+                logger.exception(f"API request failed:{e}")
+                raise
+            logger.info(f"API success response, url:{url}, request_method:GET")
+            yield page
+            url = response.links.get("next", {}).get("url")
+
+
+    # GitHub 该接口最多返回 3000 个文件
+    async def get_pr_change_files(self):
+        url = f"{self.pr_base_url}/files?per_page=100" # 单页最大100个文件
+        async for page in self.iter_github_pages(url):
+            yield page
 
     
     # FIXME:这个函数需要进一步测试其准确性
@@ -135,34 +226,186 @@ class GithubAssistant:
         return positions
     
 
-    # 发送评论
+    # 收集评论，由 submit_review 统一提交
     def add_comment(self, filename, position, comment_text):
-        comment_url = f"{self.pr_base_url}/comments"
-        
-        payload = {
+        self.pending_comments.append({
             "body": comment_text,
-            "commit_id": self.commit_sha,  # PR 的最新 commit SHA (需提前获取)
             "path": filename,
             "side":"RIGHT", # 暂时只关注新增行
             "line": position 
+        })
+
+
+    # 将收集到的评论作为一个 PR review 一次性提交，减少请求次数和二级限流
+    # complete 为 False（本次有文件或函数评审失败）时不记录已评审的 head，review 中也不带 head 标记
+    # head 标记随 review 正文提交；没有评论或整批被拒绝时单独提交只有正文的 review，没有本地状态的 CI 也能增量评审
+    async def submit_review(self, complete: bool = True):
+        commit_sha = await self.get_commit_sha()
+        comments, self.pending_comments = self.pending_comments, []
+        if not comments:
+            logger.info("No comments to submit")
+        
+        review_url = f"{self.pr_base_url}/reviews"
+        marker_posted = False
+        for start in range(0, len(comments), self.max_review_comments):
+            batch = comments[start:start + self.max_review_comments]
+            payload = {
+                "commit_id": commit_sha,  # PR 的最新 commit SHA
+                "event": "COMMENT",
+                "body": f"AI code review\n{self.review_marker.format(sha=commit_sha)}" if complete else "AI code review",
+                "comments": batch
+            }
+            try:
+                await self.call_github_api("POST", review_url, payload)
+                logger.info(f"Submit review success, comment count:{len(batch)}")
+                marker_posted = complete
+            except httpx.HTTPStatusError as e:
+                # 422 通常是个别评论行号不在 diff 中，整批被拒绝时退化为逐条提交
+                if e.response.status_code != 422:
+                    raise
+                logger.warning(f"Review rejected, fall back to single comments:{len(batch)}")
+                await self.submit_single_comments(commit_sha, batch)
+        
+        if not complete:
+            return
+        if not marker_posted:
+            await self.submit_marker_review(commit_sha, "AI code review" if comments else "AI code review: no comments")
+        # 即使没有评论也记录已评审的 head，下次增量评审从这里开始
+        self.save_reviewed_sha(commit_sha)
+
+
+    # 提交只有正文的 review，正文中带有已评审 head 的标记；失败时只记录日志，本地状态文件仍然有效
+    async def submit_marker_review(self, commit_sha, body):
+        payload = {
+            "commit_id": commit_sha,
+            "event": "COMMENT",
+            "body": f"{body}\n{self.review_marker.format(sha=commit_sha)}"
         }
-        self.call_github_api("POST", comment_url, payload)
+        try:
+            await self.call_github_api("POST", f"{self.pr_base_url}/reviews", payload)
+        except httpx.HTTPError as e:
+            logger.warning(f"Submit reviewed head marker failed:{e}")
+
+
+    # 逐条提交评论，单条失败不影响其他评论
+    async def submit_single_comments(self, commit_sha, comments):
+        comment_url = f"{self.pr_base_url}/comments"
+        for comment in comments:
+            payload = dict(comment, commit_id=commit_sha)
+            try:
+                await self.call_github_api("POST", comment_url, payload)
+            except httpx.HTTPError as e:
+                logger.error(f"Add comment failed:{e}, path:{comment['path']}, line:{comment['line']}")
 
     
-    def get_diff_file_structs(self):
+    # 每页到达后立即产出 DiffFileStruct，分析可以与后续页的下载并行进行
+    async def iter_diff_file_structs(self):
         
         logger.info("Start get pull request's change files")
-        # 遍历所有文件并添加评论
-        files = self.get_pr_change_files()
-        diff_file_struct_list = []
+        file_count = 0
+        pages = self.get_pr_change_files()
+        while True:
+            # 只统计等待下一页的时间，不包括调用方处理已产出文件的时间
+            with metrics.stage("get_diff_file_structs"):
+                files = await anext(pages, None)
+            if files is None:
+                break
+            for file in files:
+                if "filename" in file:
+                    filename = file.get("filename")
+                    filepath = os.path.join(self.repo_path, filename)
+                    patch = file.get("patch", "")
+                    positions = self.get_comment_positions(patch)
+                    file_count += 1
+                    yield DiffFileStruct(filename, filepath, positions)
+        
+        logger.info(f"Get pull request's change files finished, file count:{file_count}")
+
+
+    async def get_diff_file_structs(self):
+        return [diff_file async for diff_file in self.iter_diff_file_structs()]
+
+
+    # 本地状态文件中记录的已评审 head SHA
+    def load_reviewed_sha(self) -> str | None:
+        if not self.state_file:
+            return None
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f).get("head_sha")
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Read review state failed:{self.state_file}, error:{e}")
+            return None
+
+
+    def save_reviewed_sha(self, commit_sha: str):
+        if not self.state_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+            with open(self.state_file, "w", encoding="utf-8") as f:
+                json.dump({"head_sha": commit_sha}, f)
+        except OSError as e:
+            logger.warning(f"Write review state failed:{self.state_file}, error:{e}")
+
+
+    # 优先读取本地状态文件，否则从 PR 已有 review 的隐藏标记中查找最近一次评审的 head
+    async def get_last_reviewed_sha(self) -> str | None:
+        if (last_sha := self.load_reviewed_sha()) is not None:
+            return last_sha
         
-        for file in files:
-            if "filename" in file:
-                filename = file.get("filename")
-                filepath = f"../../{self.repo}/{filename}"
-                patch = file.get("patch", "")
-                positions = self.get_comment_positions(patch)
-                diff_file_struct_list.append(DiffFileStruct(filename, filepath, positions)) 
+        async for reviews in self.iter_github_pages(f"{self.pr_base_url}/reviews?per_page=100"):
+            for review in reviews:
+                if match := self.review_marker_re.search(review.get("body") or ""):
+                    last_sha = match.group(1)
+        return last_sha
 
-        return diff_file_struct_list
 
+    # 两个 commit 之间每个文件新增/修改的行号（新文件中的行号）
+    async def get_changed_lines_between(self, base_sha: str, head_sha: str) -> dict | None:
+        url = f"{self.api_base_url}/repos/{self.owner}/{self.repo}/compare/{base_sha}...{head_sha}"
+        compare = await self.call_github_api("GET", url)
+        files = compare.get("files", [])
+        if len(files) >= self.max_compare_files:
+            logger.warning(f"Compare result truncated, file count:{len(files)}")
+            return None
+        return {file["filename"]: set(self.get_comment_positions(file.get("patch", "")))
+                for file in files if "filename" in file}
+
+
+    # 只产出上次评审之后新修改的行，无法确定上次评审位置时退化为完整评审
+    async def iter_incremental_diff_file_structs(self):
+        last_sha = await self.get_last_reviewed_sha()
+        head_sha = await self.get_commit_sha()
+        if last_sha is None:
+            logger.info("No reviewed head found, fall back to full review")
+            async for diff_file in self.iter_diff_file_structs():
+                yield diff_file
+            return
+        if head_sha.startswith(last_sha) or last_sha.startswith(head_sha):
+            logger.info(f"Head {head_sha} already reviewed")
+            return
+        
+        try:
+            changed_lines = await self.get_changed_lines_between(last_sha, head_sha)
+        except httpx.HTTPStatusError as e:
+            # 强推后旧 head 可能已不存在
+            logger.warning(f"Compare {last_sha}...{head_sha} failed:{e}")
+            changed_lines = None
+        if changed_lines is None:
+            logger.info("Incremental diff unavailable, fall back to full review")
+            async for diff_file in self.iter_diff_file_structs():
+                yield diff_file
+            return
+        
+        logger.info(f"Incremental review from {last_sha} to {head_sha}, file count:{len(changed_lines)}")
+        # 与 PR 整体 diff 取交集：合入目标分支带来的改动不在 PR diff 中，无法评论
+        async for diff_file in self.iter_diff_file_structs():
+            lines = changed_lines.get(diff_file.file_name)
+            if not lines:
+                continue
+            diff_file.diff_position = [line for line in diff_file.diff_position if line in lines]
+            if diff_file.diff_position:
+                yield diff_file
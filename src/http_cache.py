@@ -0,0 +1,71 @@
+# GitHub GET 应答的条件请求缓存：保存应答体和 ETag / Last-Modified，再次请求时带上 If-None-Match / If-Modified-Since
+# 内容未变化时 GitHub 返回 304，不计入主限流额度，直接用缓存的应答体；复用评审缓存的落盘格式和淘汰策略
+# 缓存 key 不包含 token：是否可以复用由服务端按本次请求的身份校验，304 只在内容一致时返回
+import hashlib
+import httpx
+import review_cache
+from ai_code_reviewer_logger import logger
+from run_metrics import metrics
+
+
+class HttpCache(review_cache.ReviewCache):
+
+    cache_name = "GitHub http cache"
+
+    def __init__(self, cache_dir: str | None, max_bytes: int, max_age_seconds: float):
+        super().__init__(cache_dir, max_bytes, max_age_seconds)
+        self.not_modified = 0  # 服务端返回 304，使用缓存内容
+        self.refreshed = 0  # 服务端返回新内容并写入缓存
+
+
+    # 不同的 Accept 会返回不同格式的内容
+    @staticmethod
+    def make_key(url: str, headers: dict) -> str:
+        return hashlib.sha256(f"{headers.get('Accept', '')}\0{url}".encode("utf-8")).hexdigest()
+
+
+    async def load(self, key: str) -> dict | None:
+        entry = await self._load(key)
+        return entry if isinstance(entry, dict) else None
+
+
+    @staticmethod
+    def conditional_headers(entry: dict) -> dict:
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+
+    # 只缓存带有校验信息的成功应答，分页接口同时保存 Link 头
+    async def update(self, key: str, response: httpx.Response):
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status_code != 200 or not (etag or last_modified):
+            return
+        self.refreshed += 1
+        metrics.increment("github_http_cache_refreshed")
+        await self._store(key, {
+            "etag": etag,
+            "last_modified": last_modified,
+            "link": response.headers.get("Link"),
+            "body": response.text,
+        })
+
+
+    # 用缓存内容构造 200 应答，调用方无需区分应答来源
+    def from_entry(self, entry: dict, response: httpx.Response) -> httpx.Response:
+        self.not_modified += 1
+        metrics.increment("github_http_cache_not_modified")
+        headers = {"Content-Type": "application/json"}
+        if entry.get("link"):
+            headers["Link"] = entry["link"]
+        if entry.get("etag"):
+            headers["ETag"] = entry["etag"]
+        return httpx.Response(200, headers=headers, content=entry["body"].encode("utf-8"), request=response.request)
+
+
+    def report(self):
+        logger.info(f"GitHub http cache stats, not modified:{self.not_modified}, refreshed:{self.refreshed}")
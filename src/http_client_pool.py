@@ -0,0 +1,57 @@
+# 进程级共享的 httpx 连接池，所有实例复用同一组 keep-alive 连接，避免每次请求重新握手
+import httpx
+from ai_code_reviewer_logger import logger
+
+# 连接池名称 -> [client, 引用计数]
+_shared_clients = {}
+# 常驻服务中引用计数归零时也保留连接，供后续请求复用
+_keep_open = False
+# 所有连接池共用一个 SSL 上下文，加载 CA 证书的开销只需一次
+_ssl_context = None
+
+
+def set_keep_open(keep_open: bool):
+    global _keep_open
+    _keep_open = keep_open
+
+
+def acquire_client(name: str, max_connections: int, timeout: httpx.Timeout, **kwargs) -> httpx.AsyncClient:
+    entry = _shared_clients.get(name)
+    if entry is None or entry[0].is_closed:
+        limits = httpx.Limits(max_connections=max_connections,
+                              max_keepalive_connections=max_connections,
+                              keepalive_expiry=60)
+        global _ssl_context
+        try:
+            if _ssl_context is None:
+                _ssl_context = httpx.create_ssl_context()
+            client = httpx.AsyncClient(limits=limits, timeout=timeout, verify=_ssl_context, **kwargs)
+        except Exception as e:
+            logger.exception(f"Init shared http client error:{e}, name:{name}")
+            raise RuntimeError(f"Init shared http client error:{name}") from e
+        entry = [client, 0]
+        _shared_clients[name] = entry
+        logger.info(f"Create shared http client:{name}, pool size:{max_connections}")
+
+    entry[1] += 1
+    return entry[0]
+
+
+async def release_client(name: str):
+    entry = _shared_clients.get(name)
+    if entry is None:
+        return
+    entry[1] -= 1
+    # 最后一个使用者退出时才真正关闭连接池
+    if entry[1] <= 0 and not _keep_open:
+        _shared_clients.pop(name, None)
+        await entry[0].aclose()
+        logger.info(f"Close shared http client:{name}")
+
+
+# 关闭所有连接池，常驻服务退出时调用
+async def close_all():
+    while _shared_clients:
+        name, entry = _shared_clients.popitem()
+        await entry[0].aclose()
+        logger.info(f"Close shared http client:{name}")
@@ -0,0 +1,125 @@
+# 语言注册表：文件扩展名 -> 语言，语言 -> 语法模块和函数节点类型
+# 按扩展名查字典分发，不再逐个匹配正则；语法模块在第一次解析该语言的文件时才导入
+# 新语言通过 register 接入，或在 REVIEW_LANGUAGE_PLUGINS 中列出调用 register 的模块，无需修改分析器
+import importlib
+import os
+import threading
+from dataclasses import dataclass
+from tree_sitter import Language, Parser
+from ai_code_reviewer_logger import logger
+
+
+@dataclass(frozen=True)
+class LanguageSpec:
+    name: str
+    module: str  # tree-sitter 语法模块
+    extensions: tuple  # 包含点号，如 ".py"
+    function_node_types: tuple  # 作为评审单元的函数节点类型
+    loader: str = "language"  # 语法模块中返回语法的函数名
+    type_node_types: tuple = ()  # 符号索引收录的类型声明节点类型
+    declaration_node_types: tuple = ()  # 可能是函数声明（无函数体）的节点类型，如 C/C++ 头文件中的声明
+
+
+_specs = {}  # 语言名称 -> LanguageSpec
+_by_extension = {}  # 扩展名 -> LanguageSpec
+_grammars = {}  # 语言名称 -> Language，可在线程间共享
+_lock = threading.Lock()
+# 每个线程每种语言一个 Parser：Parser 不能被多个线程同时使用
+_thread_parsers = threading.local()
+_plugins_loaded = False
+
+
+def register(spec: LanguageSpec):
+    with _lock:
+        _specs[spec.name] = spec
+        for extension in spec.extensions:
+            _by_extension[extension] = spec
+
+
+# 导入 REVIEW_LANGUAGE_PLUGINS 中列出的模块（逗号分隔），模块在导入时调用 register
+def load_plugins():
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    _plugins_loaded = True
+    for module_name in os.environ.get("REVIEW_LANGUAGE_PLUGINS", "").split(","):
+        if module_name.strip():
+            importlib.import_module(module_name.strip())
+            logger.info(f"Load language plugin:{module_name.strip()}")
+
+
+def names() -> tuple:
+    return tuple(_specs)
+
+
+def get(name: str) -> LanguageSpec:
+    return _specs[name]
+
+
+# 根据文件扩展名查找语言，不支持的文件返回 None
+def find_by_file(file_name: str) -> LanguageSpec | None:
+    if not _plugins_loaded:
+        load_plugins()
+    return _by_extension.get(os.path.splitext(file_name)[1])
+
+
+def load_grammar(spec: LanguageSpec) -> Language:
+    grammar = _grammars.get(spec.name)
+    if grammar is None:
+        with _lock:
+            grammar = _grammars.get(spec.name)
+            if grammar is None:
+                loader = getattr(importlib.import_module(spec.module), spec.loader)
+                grammar = _grammars[spec.name] = Language(loader())
+    return grammar
+
+
+# 获取当前线程中该语言的解析器，第一次使用时创建
+def get_parser(name: str) -> Parser:
+    parser = getattr(_thread_parsers, name, None)
+    if parser is None:
+        spec = _specs[name]
+        try:
+            parser = Parser(load_grammar(spec))
+        except Exception as e:
+            raise RuntimeError(f"Failed to initialize {name} parser:{e}") from e
+        setattr(_thread_parsers, name, parser)
+    return parser
+
+
+# 内置语言
+for _spec in (
+    LanguageSpec("cpp", "tree_sitter_cpp", (".cpp", ".hpp", ".h", ".tpp", ".cxx"), ("function_definition",),
+                 type_node_types=("class_specifier", "struct_specifier", "enum_specifier", "union_specifier",
+                                  "type_definition", "alias_declaration"),
+                 declaration_node_types=("declaration", "field_declaration")),
+    LanguageSpec("c", "tree_sitter_c", (".c",), ("function_definition",),
+                 type_node_types=("struct_specifier", "enum_specifier", "union_specifier", "type_definition"),
+                 declaration_node_types=("declaration",)),
+    LanguageSpec("python", "tree_sitter_python", (".py",), ("function_definition",),
+                 type_node_types=("class_definition",)),
+    LanguageSpec("java", "tree_sitter_java", (".java",), ("method_declaration",),
+                 type_node_types=("class_declaration", "interface_declaration", "enum_declaration",
+                                  "record_declaration")),
+    LanguageSpec("go", "tree_sitter_go", (".go",), ("function_declaration", "method_declaration"),
+                 type_node_types=("type_spec",)),
+    LanguageSpec("rust", "tree_sitter_rust", (".rs",), ("function_item",),
+                 type_node_types=("struct_item", "enum_item", "trait_item", "type_item", "union_item")),
+    LanguageSpec("javascript", "tree_sitter_javascript", (".js", ".mjs", ".cjs", ".jsx"),
+                 ("function_declaration", "generator_function_declaration", "method_definition",
+                  "function_expression", "arrow_function"),
+                 type_node_types=("class_declaration",)),
+    LanguageSpec("typescript", "tree_sitter_typescript", (".ts", ".mts", ".cts"),
+                 ("function_declaration", "generator_function_declaration", "method_definition",
+                  "function_expression", "arrow_function"), "language_typescript",
+                 type_node_types=("class_declaration", "abstract_class_declaration", "interface_declaration",
+                                  "type_alias_declaration", "enum_declaration")),
+    LanguageSpec("tsx", "tree_sitter_typescript", (".tsx",),
+                 ("function_declaration", "generator_function_declaration", "method_definition",
+                  "function_expression", "arrow_function"), "language_tsx",
+                 type_node_types=("class_declaration", "abstract_class_declaration", "interface_declaration",
+                                  "type_alias_declaration", "enum_declaration")),
+    LanguageSpec("kotlin", "tree_sitter_kotlin", (".kt", ".kts"), ("function_declaration",),
+                 type_node_types=("class_declaration", "object_declaration")),
+):
+    register(_spec)
@@ -0,0 +1,297 @@
+# 多服务商 LLM 路由：多个 OpenAI 兼容的接口和模型，各自独立的并发限制、健康状态和延迟统计
+# 按 prompt 大小和当前负载选择服务商；调用超过该服务商的延迟分位数仍未返回时，向另一个服务商发送对冲请求，
+# 先返回的结果生效，另一个请求取消
+import asyncio
+import collections
+import json
+import os
+import re
+import time
+import common_function
+import rate_limiter
+from ai_code_reviewer_logger import logger
+from dataclasses import dataclass, field
+from run_metrics import metrics
+
+# 服务商名称用于指标名和限流器的环境变量前缀，只保留字母、数字和下划线
+_NAME_RE = re.compile(r"[^a-z0-9_]")
+
+# (名称, 接口地址, 模型) -> LLMProvider，同一进程内共享，常驻服务中延迟统计跨 PR 累积
+_providers = {}
+
+
+class LLMProvider:
+
+    def __init__(self, name: str, url: str, model: str, api_key_env: str | None, max_prompt_tokens: int,
+                 limiter: rate_limiter.AdaptiveLimiter, failure_threshold: int, cooldown: float):
+        self.name = name
+        self.chat_url = f"{url.strip().rstrip('/')}/chat/completions"
+        self.model = model
+        # 密钥只记录环境变量名，请求时读取；为 None 时使用 DeepSeek 构造时传入的密钥
+        self.api_key_env = api_key_env
+        self.max_prompt_tokens = max_prompt_tokens  # 0 表示不限制
+        self.limiter = limiter
+
+        # 连续失败达到阈值后暂停路由，冷却时间随连续失败次数翻倍
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self._unhealthy_until = 0.0
+
+        # 最近成功调用的完整耗时，用于计算对冲时机和路由时的预期延迟
+        self.latencies = collections.deque(maxlen=200)
+
+        self.requests = 0
+        self.failures = 0
+        self.hedges = 0  # 作为对冲请求发出的次数
+        self.hedge_wins = 0  # 作为对冲请求先于原请求返回的次数
+
+
+    @property
+    def metric_name(self) -> str:
+        return f"llm_provider_{self.name}"
+
+
+    def healthy(self) -> bool:
+        return time.monotonic() >= self._unhealthy_until
+
+
+    def fits(self, prompt_tokens: int) -> bool:
+        return not self.max_prompt_tokens or prompt_tokens <= self.max_prompt_tokens
+
+
+    # 当前负载：进行中的请求数占并发上限的比例
+    def load(self) -> float:
+        return self.limiter.in_flight / max(self.limiter.limit, 1)
+
+
+    def percentile(self, percent: float) -> float | None:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+
+    def on_success(self, duration: float):
+        self.consecutive_failures = 0
+        self.observe_latency(duration)
+
+
+    def observe_latency(self, duration: float):
+        self.latencies.append(duration)
+        metrics.observe(self.metric_name, duration)
+
+
+    def on_failure(self):
+        self.failures += 1
+        self.consecutive_failures += 1
+        metrics.increment(f"{self.metric_name}_failures")
+        if self.consecutive_failures >= self.failure_threshold:
+            cooldown = self.cooldown * 2 ** (self.consecutive_failures - self.failure_threshold)
+            self._unhealthy_until = time.monotonic() + min(cooldown, 600)
+            logger.warning(f"LLM provider {self.name} marked unhealthy for {min(cooldown, 600):.0f}s, "
+                           f"consecutive failures:{self.consecutive_failures}")
+
+
+    def report(self):
+        p50 = self.percentile(50) or 0.0
+        p95 = self.percentile(95) or 0.0
+        logger.info(f"LLM provider {self.name} stats, model:{self.model}, requests:{self.requests}, "
+                    f"failures:{self.failures}, p50:{p50:.2f}s, p95:{p95:.2f}s, "
+                    f"hedges:{self.hedges}, hedge wins:{self.hedge_wins}")
+
+
+# 发往某个服务商的一次请求。call 在真正发出请求（已获得并发名额）时调用 mark_sent，
+# 耗时从此刻开始计算，不包含在限流器中排队和重试等待的时间；未调用时从创建请求时开始计算
+@dataclass
+class Attempt:
+    provider: LLMProvider
+    hedge: bool  # 是否为对冲请求
+    created: float = field(default_factory=time.perf_counter)
+    sent: float | None = None
+
+    def mark_sent(self):
+        self.sent = time.perf_counter()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - (self.created if self.sent is None else self.sent)
+
+
+def get_provider(name: str, url: str, model: str, api_key_env: str | None = None, max_prompt_tokens: int = 0,
+                 concurrency: int = 32) -> LLMProvider:
+    name = _NAME_RE.sub("_", name.lower())
+    key = (name, url, model)
+    provider = _providers.get(key)
+    if provider is None:
+        # 第一个服务商沿用原有的限流器名称和环境变量前缀（llm / LLM_*），其余按名称区分
+        limiter_name, prefix = ("llm", "LLM") if name == "default" else (f"llm_{name}", f"LLM_{name.upper()}")
+        provider = LLMProvider(
+            name, url, model, api_key_env, max_prompt_tokens,
+            rate_limiter.get_limiter(limiter_name, prefix, concurrency, 4, 900, latency_aware=False),
+            common_function.get_env_int("LLM_PROVIDER_FAILURE_THRESHOLD", 3),
+            common_function.get_env_float("LLM_PROVIDER_COOLDOWN", 30))
+        _providers[key] = provider
+    return provider
+
+
+# 解析 LLM_PROVIDERS：JSON 数组，每项为 {"name", "url", "model", "api_key_env", "max_prompt_tokens", "concurrency"}
+# 未设置时只有一个服务商，即 LLM_API_URL / LLM_MODEL 对应的 default
+def load_providers(default_url: str, default_model: str, default_concurrency: int) -> list:
+    value = os.environ.get("LLM_PROVIDERS")
+    if not value or not value.strip():
+        return [get_provider("default", default_url, default_model, concurrency=default_concurrency)]
+    try:
+        configs = json.loads(value)
+    except ValueError as e:
+        raise ValueError(f"LLM_PROVIDERS must be a JSON array:{e}") from e
+    if not isinstance(configs, list) or not configs:
+        raise ValueError("LLM_PROVIDERS must be a non-empty JSON array")
+    providers = []
+    for config in configs:
+        if not isinstance(config, dict) or not config.get("name"):
+            raise ValueError(f"Invalid LLM provider config:{config}")
+        providers.append(get_provider(
+            config["name"],
+            config.get("url") or default_url,
+            config.get("model") or default_model,
+            config.get("api_key_env"),
+            int(config.get("max_prompt_tokens", 0)),
+            int(config.get("concurrency", default_concurrency))))
+    return providers
+
+
+class ProviderRouter:
+
+    def __init__(self, providers: list, hedge_percentile: float, hedge_min_samples: int,
+                 hedge_initial_delay: float, hedge_min_delay: float, hedge_max_ratio: float):
+        self.providers = providers
+        # 对冲时机：服务商最近延迟的分位数，样本不足时使用初始延迟；分位数为 0 时关闭对冲
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_initial_delay = hedge_initial_delay
+        self.hedge_min_delay = hedge_min_delay
+        # 对冲请求数不超过总请求数的比例，避免服务整体变慢时请求量翻倍
+        self.hedge_max_ratio = hedge_max_ratio
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+
+    @classmethod
+    def from_env(cls, default_url: str, default_model: str, default_concurrency: int):
+        return cls(
+            load_providers(default_url, default_model, default_concurrency),
+            common_function.get_env_float("LLM_HEDGE_PERCENTILE", 95),
+            common_function.get_env_int("LLM_HEDGE_MIN_SAMPLES", 20),
+            common_function.get_env_float("LLM_HEDGE_INITIAL_DELAY", 30),
+            common_function.get_env_float("LLM_HEDGE_MIN_DELAY", 1),
+            common_function.get_env_float("LLM_HEDGE_MAX_RATIO", 0.1))
+
+
+    # 选择服务商：优先考虑能容纳该 prompt 的服务商（都容纳不下时不限制），健康且未满载的优先，
+    # 其次按预期延迟（中位延迟按负载放大）排序，相同时按配置顺序
+    def select(self, prompt_tokens: int, exclude=()) -> LLMProvider | None:
+        candidates = [provider for provider in self.providers if provider not in exclude]
+        candidates = [provider for provider in candidates if provider.fits(prompt_tokens)] or candidates
+        if not candidates:
+            return None
+
+        def cost(item):
+            index, provider = item
+            load = provider.load()
+            return not provider.healthy(), load >= 1, (provider.percentile(50) or 0.0) * (1 + load), index
+
+        return min(enumerate(candidates), key=cost)[1]
+
+
+    # 主请求发出后多久发送对冲请求，不需要对冲时返回 None
+    def hedge_delay(self, provider: LLMProvider) -> float | None:
+        if self.hedge_percentile <= 0 or len(self.providers) < 2:
+            return None
+        if self.hedged >= self.hedge_max_ratio * self.requests + 1:
+            return None
+        if len(provider.latencies) < self.hedge_min_samples:
+            return self.hedge_initial_delay
+        return max(provider.percentile(self.hedge_percentile), self.hedge_min_delay)
+
+
+    # 通过 call(provider, attempt) 发送一次请求：超过对冲时机时向另一个服务商发送对冲请求，先成功返回的结果生效；
+    # 请求失败时换一个尚未尝试的服务商，每个服务商最多尝试一次
+    async def request(self, prompt_tokens: int, call):
+        self.requests += 1
+        tried = []
+        tasks = {}  # task -> Attempt
+        hedged = False
+        last_error = None
+
+        def start(provider: LLMProvider, hedge: bool):
+            tried.append(provider)
+            provider.requests += 1
+            metrics.increment(f"{provider.metric_name}_requests")
+            attempt = Attempt(provider, hedge)
+            tasks[asyncio.create_task(call(provider, attempt))] = attempt
+
+        primary = self.select(prompt_tokens)
+        start(primary, False)
+        hedge_delay = self.hedge_delay(primary)
+        try:
+            while tasks:
+                timeout = None
+                if hedge_delay is not None and len(tasks) == 1 and len(tried) == 1:
+                    timeout = max(hedge_delay - tasks[next(iter(tasks))].elapsed(), 0)
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # 主请求超过对冲时机仍未返回
+                    hedge_delay = None
+                    if (provider := self.select(prompt_tokens, tried)) is not None and provider.healthy():
+                        hedged = True
+                        self.hedged += 1
+                        provider.hedges += 1
+                        metrics.increment("llm_hedged_requests")
+                        start(provider, True)
+                    continue
+
+                for task in done:
+                    attempt = tasks.pop(task)
+                    provider = attempt.provider
+                    if task.exception() is None:
+                        provider.on_success(attempt.elapsed())
+                        if hedged:
+                            self.record_hedge_result(provider, attempt.hedge)
+                        return task.result()
+                    provider.on_failure()
+                    last_error = task.exception()
+                    logger.warning(f"LLM provider {provider.name} request failed:{last_error!r}")
+                if not tasks:
+                    # 所有请求都失败，换一个尚未尝试的健康服务商
+                    provider = self.select(prompt_tokens, tried)
+                    if provider is None or not provider.healthy():
+                        break
+                    metrics.increment("llm_provider_failovers")
+                    start(provider, False)
+        finally:
+            for task, attempt in tasks.items():
+                # 对冲中落败的请求记录到取消时为止的耗时，否则慢服务商的长尾不会出现在延迟统计中
+                if attempt.sent is not None:
+                    attempt.provider.observe_latency(attempt.elapsed())
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        raise last_error
+
+
+    def record_hedge_result(self, winner: LLMProvider, hedge: bool):
+        if hedge:
+            self.hedge_wins += 1
+            winner.hedge_wins += 1
+            metrics.increment("llm_hedge_wins")
+        else:
+            metrics.increment("llm_hedge_losses")
+
+
+    def report(self):
+        for provider in self.providers:
+            provider.report()
+        if self.hedged:
+            logger.info(f"LLM hedge stats, requests:{self.requests}, hedged:{self.hedged}, "
+                        f"hedge wins:{self.hedge_wins}, win rate:{self.hedge_wins / self.hedged:.2%}")
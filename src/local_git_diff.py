@@ -0,0 +1,95 @@
+# 从本地仓库的 git diff 中获取变更行，不依赖 GitHub files 接口（大文件的 patch 字段会被 GitHub 省略）
+import asyncio
+import os
+import re
+from ai_code_reviewer_logger import logger
+from github_assistant import DiffFileStruct
+
+
+class LocalGitDiff:
+
+    # --unified=0 时每个 hunk 头直接给出新文件中的起始行和行数
+    hunk_header_re = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@')
+    # 单行长度上限，避免超长行（如压缩后的代码）触发 StreamReader 的默认 64KB 限制
+    max_line_bytes = 16 * 1024 * 1024
+
+    def __init__(self, repo_path: str, base: str, head: str = "HEAD"):
+        if not os.path.isdir(repo_path):
+            raise ValueError(f"Repository path not found:{repo_path}")
+        self.repo_path = repo_path
+        self.base = base
+        self.head = head
+
+
+    @staticmethod
+    def parse_new_file_name(line: str) -> str | None:
+        # 文件名含空格时 git 会在末尾追加一个制表符
+        name = line[4:].rstrip("\n").rstrip("\t")
+        if name.startswith('"') and name.endswith('"'):
+            name = name[1:-1]
+        if name == "/dev/null":
+            return None  # 文件被删除
+        return name[2:] if name.startswith("b/") else name
+
+
+    # 流式解析 git diff 输出，每解析完一个文件就产出一个 DiffFileStruct
+    async def iter_diff_file_structs(self):
+        logger.info(f"Start get local diff:{self.base}...{self.head}, repo:{self.repo_path}")
+        try:
+            process = await asyncio.create_subprocess_exec(
+                "git", "-C", self.repo_path, "-c", "core.quotePath=false",
+                "diff", "--unified=0", "--no-color", "--no-ext-diff",
+                f"{self.base}...{self.head}",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                limit=self.max_line_bytes)
+        except OSError as e:
+            logger.exception(f"Run git diff failed:{e}")
+            raise
+
+        # stderr 与 stdout 同时读取，git 写满 stderr 管道时不会阻塞在 stdout 上造成死锁
+        stderr_task = asyncio.create_task(process.stderr.read())
+        file_name = None
+        positions = []
+        in_file_header = False
+        file_count = 0
+
+        try:
+            async for raw_line in process.stdout:
+                line = raw_line.decode("utf-8", errors="replace")
+                if line.startswith("diff --git "):
+                    if file_name is not None:
+                        file_count += 1
+                        yield DiffFileStruct(file_name, os.path.join(self.repo_path, file_name), positions)
+                    file_name = None
+                    positions = []
+                    in_file_header = True
+                elif in_file_header and line.startswith("+++ "):
+                    file_name = self.parse_new_file_name(line)
+                elif line.startswith("@@"):
+                    in_file_header = False
+                    match = self.hunk_header_re.match(line)
+                    if match is None:
+                        logger.error(f"Hunk header analyze failed:{line}")
+                        continue
+                    start = int(match.group(1))
+                    count = int(match.group(2)) if match.group(2) is not None else 1
+                    positions.extend(range(start, start + count))  # count 为 0 表示纯删除
+
+            if file_name is not None:
+                file_count += 1
+                yield DiffFileStruct(file_name, os.path.join(self.repo_path, file_name), positions)
+
+            stderr = await stderr_task
+            if await process.wait() != 0:
+                message = stderr.decode("utf-8", errors="replace").strip()
+                logger.error(f"git diff failed:{message}")
+                raise RuntimeError(f"git diff failed:{message}")
+        finally:
+            # 调用方提前结束迭代时终止 git 进程
+            stderr_task.cancel()
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+        logger.info(f"Get local diff finished, file count:{file_count}")
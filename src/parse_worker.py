@@ -0,0 +1,91 @@
+# 进程池解析：在子进程中读取文件、解析语法树并提取有变更的函数，只把紧凑的函数记录传回主进程
+# 每个子进程按语言缓存 Parser（见 language_registry），多个文件复用同一个解析器；语法树节点不跨进程传递
+import file_filter
+import function_extractor
+import function_trimmer
+import language_registry
+import symbol_index
+from dataclasses import dataclass
+
+# 子进程内的文件过滤配置，子进程启动时继承主进程的环境变量
+_file_filter = None
+
+# 进程内共享的解析进程池及其进程数，常驻服务中多次评审复用，不在每次评审时重新创建子进程
+_pool = None
+_pool_processes = 0
+
+
+@dataclass
+class FunctionSnippet:
+    start_line: int
+    end_line: int
+    start_byte: int
+    end_byte: int
+    changed_lines: list  # 函数内的变更行
+    body: str
+    saved_tokens: int = 0  # 裁剪节省的 token 数，记在函数的第一个评审单元上
+    name: str = ""  # 函数名
+
+
+# 进程池的 initializer，提前创建解析器，避免第一批文件承担初始化开销；未安装语法模块的语言跳过
+def warm_up(languages=None):
+    for language in languages or language_registry.names():
+        try:
+            language_registry.get_parser(language)
+        except RuntimeError:
+            continue
+
+
+# 返回共享的解析进程池，进程数变化或子进程异常退出（池已损坏）时重新创建
+# 子进程由 forkserver（不支持时用 spawn）启动：主进程已有事件循环、日志线程和工作线程，直接 fork 不安全
+def get_pool(processes: int):
+    global _pool, _pool_processes
+    # _broken 是 ProcessPoolExecutor 记录子进程异常退出的内部状态，损坏后所有提交都会失败
+    if _pool is None or _pool_processes != processes or getattr(_pool, "_broken", False):
+        shutdown_pool()
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _pool = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context(method), initializer=warm_up)
+        _pool_processes = processes
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+# 在子进程中执行：读取并解析文件，返回与变更行有交集的函数，超长函数在子进程中完成裁剪和拆分
+# 文件头检查未通过时抛出 file_filter.SkipFile
+def extract_changed_functions(file_path: str, language: str, changed_lines: list,
+                              max_tokens: int = 0, context_lines: int = 0) -> list:
+    global _file_filter
+    if _file_filter is None:
+        _file_filter = file_filter.FileFilter.from_env()
+    code = _file_filter.load_source(file_path)
+    try:
+        return _extract(code, language, changed_lines, max_tokens, context_lines)
+    finally:
+        file_filter.release_source(code)
+
+
+def _extract(code, language: str, changed_lines: list, max_tokens: int, context_lines: int) -> list:
+    tree = language_registry.get_parser(language).parse(code)
+    functions = function_extractor.extract_functions(tree.root_node,
+                                                     language_registry.get(language).function_node_types)
+    snippets = []
+    for function, lines in function_extractor.map_changed_lines(functions, sorted(changed_lines)):
+        body = function_extractor.function_body(function.node)
+        units = function_trimmer.split_function(
+            body, function.node.text.decode("utf-8", errors="replace"), function.start_line, lines,
+            max_tokens, context_lines)
+        saved_tokens = function_trimmer.tokens_saved(body, units)
+        name = symbol_index.declaration_name(function.node) or ""
+        for unit in units:
+            snippets.append(FunctionSnippet(function.start_line, function.end_line, function.start_byte,
+                                            function.end_byte, unit.changed_lines, unit.body, saved_tokens, name))
+            saved_tokens = 0
+    return snippets
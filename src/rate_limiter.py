@@ -0,0 +1,232 @@
+# 自适应并发限制与限流感知的重试，LLM 和 GitHub 请求共用
+# 并发上限按 AIMD 调整：请求成功时缓慢增加，遇到 429 时减半（同一轮限流只减半一次）；
+# latency_aware 的限流器（GitHub）在延迟明显变高时减一，LLM 调用的耗时随 prompt 和输出长度变化，不按延迟调整
+import asyncio
+import email.utils
+import random
+import time
+import httpx
+import common_function
+from ai_code_reviewer_logger import logger
+from run_metrics import metrics
+
+# 可以重试的状态码，429 表示被限流，5xx 通常是服务端临时故障
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# 限流器名称 -> AdaptiveLimiter，同一进程内共享
+_limiters = {}
+
+
+class AdaptiveLimiter:
+
+    def __init__(self, name: str, min_limit: int, max_limit: int, initial_limit: int,
+                 max_attempts: int, deadline: float, base_delay: float = 1.0, max_delay: float = 60.0,
+                 latency_aware: bool = True):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = min(max(initial_limit, self.min_limit), self.max_limit)
+        self.max_attempts = max(1, max_attempts)
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.latency_aware = latency_aware
+
+        self.in_flight = 0
+        self._condition = None
+        self._condition_loop = None
+        self._blocked_until = 0.0  # 被限流后所有请求暂停到此时刻
+        self._successes = 0
+        self._latency_ewma = None
+        self._latency_baseline = None
+
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+
+
+    @classmethod
+    def from_env(cls, name: str, prefix: str, max_limit: int, max_attempts: int, deadline: float,
+                 latency_aware: bool = True):
+        max_limit = common_function.get_env_int(f"{prefix}_CONCURRENCY_MAX", max_limit)
+        return cls(
+            name,
+            common_function.get_env_int(f"{prefix}_CONCURRENCY_MIN", 1),
+            max_limit,
+            common_function.get_env_int(f"{prefix}_CONCURRENCY_INITIAL", min(8, max_limit)),
+            common_function.get_env_int(f"{prefix}_RETRY_ATTEMPTS", max_attempts),
+            common_function.get_env_float(f"{prefix}_RETRY_DEADLINE", deadline),
+            latency_aware=latency_aware)
+
+
+    # Condition 按事件循环创建，限流器在进程内共享，可能跨多次 asyncio.run 使用
+    def _get_condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._condition_loop is not loop:
+            self._condition = asyncio.Condition()
+            self._condition_loop = loop
+            self.in_flight = 0
+        return self._condition
+
+
+    # 被限流时先等待冷却结束再占用名额，等待期间被取消不会占着名额
+    # 占用名额之后没有挂起点，调用方紧接着用 try/finally 保证 release
+    async def acquire(self):
+        while (delay := self._blocked_until - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+
+    # 名额同步归还，唤醒等待者的部分不受调用方取消的影响
+    async def release(self):
+        self.in_flight -= 1
+        await asyncio.shield(self._notify())
+
+
+    async def _notify(self):
+        condition = self._get_condition()
+        async with condition:
+            condition.notify_all()
+
+
+    def _set_limit(self, limit: int, reason: str):
+        limit = min(max(limit, self.min_limit), self.max_limit)
+        if limit != self.limit:
+            logger.info(f"Limiter {self.name} concurrency {self.limit} -> {limit}, reason:{reason}")
+            self.limit = limit
+
+
+    def on_success(self, latency: float):
+        if not self.latency_aware:
+            self._increase()
+            return
+        if self._latency_ewma is None:
+            self._latency_ewma = latency
+        else:
+            self._latency_ewma = 0.8 * self._latency_ewma + 0.2 * latency
+        if self._latency_baseline is None or self._latency_ewma < self._latency_baseline:
+            self._latency_baseline = self._latency_ewma
+
+        # 延迟超过基线两倍说明服务端开始排队，不再增加并发
+        if self._latency_ewma > 2 * self._latency_baseline and self.limit > self.min_limit:
+            self._successes = 0
+            self._set_limit(self.limit - 1, f"latency {self._latency_ewma:.2f}s")
+            # 基线缓慢上移，避免一次偶然的快速请求让限流器一直降并发
+            self._latency_baseline *= 1.1
+            return
+
+        self._increase()
+
+
+    # 每成功 limit 次增加 1，即每个"往返周期"加一
+    def _increase(self):
+        self._successes += 1
+        if self._successes >= self.limit:
+            self._successes = 0
+            self._set_limit(self.limit + 1, "success")
+
+
+    def on_throttled(self, delay: float):
+        self.throttled += 1
+        metrics.increment(f"{self.name}_throttled")
+        self._successes = 0
+        now = time.monotonic()
+        # 同一轮限流中并发请求陆续收到的 429 只减半一次
+        if now >= self._blocked_until:
+            self._set_limit(self.limit // 2, "throttled")
+        self._blocked_until = max(self._blocked_until, now + delay)
+
+
+    # 从 Retry-After / X-RateLimit-* 头中解析需要等待的秒数
+    @staticmethod
+    def get_retry_after(response: httpx.Response) -> float | None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return max(float(retry_after), 0.0)
+            except ValueError:
+                # 也可能是 HTTP 日期格式
+                try:
+                    retry_date = email.utils.parsedate_to_datetime(retry_after)
+                    return max(retry_date.timestamp() - time.time(), 0.0)
+                except (TypeError, ValueError):
+                    return None
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            reset = response.headers.get("X-RateLimit-Reset")
+            if reset and reset.isdigit():
+                return max(int(reset) - time.time(), 0.0)
+        return None
+
+
+    @staticmethod
+    def is_throttled(response: httpx.Response) -> bool:
+        if response.status_code == 429:
+            return True
+        # GitHub 的主/二级限流返回 403，并带有限流相关的头
+        return response.status_code == 403 and (
+            response.headers.get("X-RateLimit-Remaining") == "0" or "Retry-After" in response.headers)
+
+
+    def _backoff(self, attempt: int) -> float:
+        # full jitter 指数退避
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+    # 在并发限制内发送请求，遇到限流、5xx 或网络错误时在截止时间内重试
+    # idempotent 为 False 时（如创建评论）只在请求确定未被处理的情况下重试：限流和连接失败
+    async def request(self, send, idempotent: bool = True) -> httpx.Response:
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            await self.acquire()
+            start = time.monotonic()
+            self.requests += 1
+            try:
+                response = await send()
+            except httpx.TransportError as e:
+                retryable = idempotent or isinstance(e, httpx.ConnectError)
+                delay = self._backoff(attempt)
+                if not retryable or attempt + 1 >= self.max_attempts or time.monotonic() + delay > deadline:
+                    raise
+                logger.warning(f"Limiter {self.name} network error, retry in {delay:.1f}s:{e}")
+            else:
+                if self.is_throttled(response):
+                    delay = self.get_retry_after(response)
+                    delay = self._backoff(attempt) if delay is None else delay + random.uniform(0, 1)
+                    self.on_throttled(delay)
+                elif response.status_code in RETRY_STATUS_CODES and idempotent:
+                    delay = self.get_retry_after(response) or self._backoff(attempt)
+                else:
+                    if response.status_code < 500:
+                        self.on_success(time.monotonic() - start)
+                    return response
+                if attempt + 1 >= self.max_attempts or time.monotonic() + delay > deadline:
+                    logger.error(f"Limiter {self.name} give up after {attempt + 1} attempts, status:{response.status_code}")
+                    return response
+                logger.warning(f"Limiter {self.name} status {response.status_code}, retry in {delay:.1f}s, "
+                               f"concurrency:{self.limit}")
+                await response.aclose()
+            finally:
+                await self.release()
+
+            self.retries += 1
+            metrics.increment(f"{self.name}_retries")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+    def report(self):
+        logger.info(f"Limiter {self.name} stats, concurrency:{self.limit}, requests:{self.requests}, "
+                    f"retries:{self.retries}, throttled:{self.throttled}")
+
+
+def get_limiter(name: str, prefix: str, max_limit: int, max_attempts: int, deadline: float,
+                latency_aware: bool = True) -> AdaptiveLimiter:
+    limiter = _limiters.get(name)
+    if limiter is None:
+        limiter = AdaptiveLimiter.from_env(name, prefix, max_limit, max_attempts, deadline, latency_aware)
+        _limiters[name] = limiter
+    return limiter
@@ -0,0 +1,197 @@
+# 基于函数体内容哈希的评审结果缓存
+# 相同的 (模型, 提示词, 函数体) 在多次运行之间只调用一次 LLM，同一次运行内的重复函数体也只调用一次
+import asyncio
+import hashlib
+import json
+import os
+import time
+from ai_code_reviewer_logger import logger
+from dataclasses import dataclass
+from run_metrics import metrics
+
+# 缓存格式变化时修改此版本号，使旧缓存全部失效
+CACHE_VERSION = "1"
+
+
+# 规范化函数体：统一换行、去掉行尾空白和空行，避免无意义的格式差异导致缓存失效
+def normalize_code(code: str) -> str:
+    return "\n".join(line.rstrip() for line in code.splitlines() if line.strip())
+
+
+def make_cache_key(model: str, prompt: str, code: str) -> str:
+    code_hash = hashlib.sha256(normalize_code(code).encode("utf-8")).hexdigest()
+    key_source = "\0".join((CACHE_VERSION, model, prompt, code_hash))
+    return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+
+# 本次可以使用但不应写入缓存的结果，如因长度或截止时间截断的应答
+@dataclass
+class Uncacheable:
+    value: str
+
+
+class ReviewCache:
+
+    # 日志中的缓存名称，子类可以覆盖
+    cache_name = "Review cache"
+
+    def __init__(self, cache_dir: str | None, max_bytes: int, max_age_seconds: float):
+        # cache_dir 为空时只做运行内去重，不落盘
+        self.cache_dir = os.path.expanduser(cache_dir) if cache_dir else None
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+
+        # 正在进行中的调用，相同 key 的并发请求共享同一个结果
+        self._in_flight = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+
+        if self.cache_dir:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+            except OSError as e:
+                logger.warning(f"{self.cache_name} dir unavailable, disable disk cache:{e}")
+                self.cache_dir = None
+
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+
+    async def _load(self, key: str) -> str | None:
+        if not self.cache_dir:
+            return None
+        import aiofiles  # 只在启用磁盘缓存时导入
+        path = self._entry_path(key)
+        try:
+            async with aiofiles.open(path, "r", encoding="utf-8") as f:
+                entry = json.loads(await f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"{self.cache_name} entry broken, ignore it:{path}, error:{e}")
+            return None
+
+        if time.time() - entry.get("created", 0) > self.max_age_seconds:
+            # 过期条目立即删除：读取会刷新 mtime，不删除的话 prune 会把它当作最近使用过的条目一直保留
+            self._remove(path)
+            return None
+        # 以 mtime 作为最近使用时间，供 LRU 淘汰使用；未读取过的条目 mtime 即写入时间
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry.get("response")
+
+
+    async def _store(self, key: str, response: str):
+        if not self.cache_dir:
+            return
+        import aiofiles
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            async with aiofiles.open(tmp_path, "w", encoding="utf-8") as f:
+                await f.write(json.dumps({"created": time.time(), "response": response}, ensure_ascii=False))
+            os.replace(tmp_path, path)  # 原子替换，避免并发读到半个文件
+        except OSError as e:
+            logger.warning(f"Write {self.cache_name.lower()} failed:{path}, error:{e}")
+
+
+    # 命中缓存直接返回，否则执行 call；call 返回 None 或 Uncacheable 表示结果不可缓存
+    async def get_or_call(self, key: str, call):
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.deduplicated += 1
+            metrics.increment("review_cache_deduplicated")
+            return await asyncio.shield(in_flight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            response = await self._load(key)
+            if response is not None:
+                self.hits += 1
+                metrics.increment("review_cache_hits")
+            else:
+                self.misses += 1
+                metrics.increment("review_cache_misses")
+                response = await call()
+                if isinstance(response, Uncacheable):
+                    response = response.value
+                elif response is not None:
+                    await self._store(key, response)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+
+    # 批量评审时逐个函数查询缓存，未命中的函数再合并到一次请求中
+    async def lookup(self, key: str) -> str | None:
+        response = await self._load(key)
+        if response is not None:
+            self.hits += 1
+            metrics.increment("review_cache_hits")
+        else:
+            self.misses += 1
+            metrics.increment("review_cache_misses")
+        return response
+
+
+    async def store(self, key: str, response: str):
+        await self._store(key, response)
+
+
+    # 按过期时间和总大小淘汰缓存，最久未使用的条目优先删除
+    # 只按 mtime 判断过期，不读取文件内容：读取过的条目已由 _load 按写入时间检查过期
+    def prune(self):
+        if not self.cache_dir:
+            return
+
+        now = time.time()
+        entries = []
+        removed = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if name.endswith(".tmp") or now - stat.st_mtime > self.max_age_seconds:
+                    removed += self._remove(path)
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            removed += self._remove(path)
+            total_size -= size
+
+        logger.info(f"{self.cache_name} pruned, removed:{removed}, size:{total_size}")
+
+
+    @staticmethod
+    def _remove(path: str) -> int:
+        try:
+            os.remove(path)
+            return 1
+        except OSError:
+            return 0
+
+
+    def report(self):
+        logger.info(f"Review cache stats, hits:{self.hits}, misses:{self.misses}, "
+                    f"deduplicated:{self.deduplicated}")
@@ -0,0 +1,404 @@
+# 常驻评审服务：接收 GitHub pull_request webhook（或本地 enqueue 请求），在同一进程内评审多个 PR
+# 解析器、提示词配置、LLM/GitHub 连接池和限流器在多次评审之间保持可用，省去每次启动进程的开销
+# 不同仓库之间轮转调度保证公平；同一个 PR 短时间内的多次推送合并为一次对最新 head 的评审
+# 用法: python review_daemon.py serve
+#       python review_daemon.py enqueue owner/repo 12
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import shutil
+import signal
+import time
+import urllib.request
+import common_function
+import http_client_pool
+import parse_worker
+from ai_code_reviewer import CppCodeAnalyzer, ReviewOptions, review_pull_request
+from ai_code_reviewer_logger import logger
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from run_metrics import metrics
+
+# 触发评审的 pull_request 事件类型
+REVIEW_ACTIONS = ("opened", "synchronize", "reopened", "ready_for_review")
+# webhook 请求体大小上限
+MAX_BODY_BYTES = 25 * 1024 * 1024
+
+
+@dataclass
+class ReviewJob:
+    owner: str
+    repo: str
+    pull_request_id: int
+    head_sha: str | None
+    ready_at: float  # 合并窗口结束的时间，之前到达的推送都合并到这一次评审
+    enqueued_at: float = field(default_factory=time.monotonic)
+    pushes: int = 1  # 合并的推送次数
+
+    @property
+    def key(self):
+        return self.owner, self.repo, self.pull_request_id
+
+    @property
+    def repository(self):
+        return f"{self.owner}/{self.repo}"
+
+
+# 待评审 PR 队列：按仓库轮转出队，同一个 PR 只保留一个待评审任务
+class FairReviewQueue:
+
+    def __init__(self, coalesce_seconds: float, per_repo_limit: int):
+        self.coalesce_seconds = coalesce_seconds
+        self.per_repo_limit = max(1, per_repo_limit)
+        self._jobs = {}  # PR -> 待评审任务
+        self._repos = OrderedDict()  # 仓库 -> 待评审 PR，顺序即轮转顺序
+        self._running = {}  # 仓库 -> 正在评审的 PR 数
+        self._running_keys = set()
+        self._closed = set()  # 评审过程中被关闭的 PR，评审结束后再删除工作区
+        self._changed = asyncio.Condition()
+
+    @property
+    def pending(self) -> int:
+        return len(self._jobs)
+
+    @property
+    def running(self) -> int:
+        return len(self._running_keys)
+
+    # 同一个 PR 已在队列中时只更新 head 并顺延合并窗口；正在评审时会在结束后再评审一次最新 head
+    async def put(self, owner: str, repo: str, pull_request_id: int, head_sha: str | None = None):
+        now = time.monotonic()
+        key = (owner, repo, pull_request_id)
+        async with self._changed:
+            # 关闭后又重新打开的 PR 保留工作区
+            self._closed.discard(key)
+            job = self._jobs.get(key)
+            if job is not None:
+                job.head_sha = head_sha or job.head_sha
+                job.ready_at = now + self.coalesce_seconds
+                job.pushes += 1
+                metrics.increment("daemon_coalesced")
+            else:
+                job = self._jobs[key] = ReviewJob(owner, repo, pull_request_id, head_sha, now + self.coalesce_seconds)
+                self._repos.setdefault(job.repository, deque()).append(key)
+                metrics.increment("daemon_enqueued")
+            self._changed.notify_all()
+        logger.info(f"Enqueue review {job.repository}#{pull_request_id}, head:{head_sha}, pushes:{job.pushes}")
+
+    # PR 关闭后丢弃尚未开始的评审；返回 True 表示该 PR 正在评审，工作区要等评审结束（done 返回 True）后再删除
+    async def discard(self, owner: str, repo: str, pull_request_id: int) -> bool:
+        key = (owner, repo, pull_request_id)
+        async with self._changed:
+            job = self._jobs.pop(key, None)
+            if job is not None:
+                self._remove_key(job.repository, job.key)
+            if key in self._running_keys:
+                self._closed.add(key)
+                return True
+            return False
+
+    def _remove_key(self, repository, key):
+        keys = self._repos[repository]
+        keys.remove(key)
+        if not keys:
+            del self._repos[repository]
+
+    # 从轮转顺序中第一个有空闲名额的仓库里取出合并窗口已结束的任务，返回 (任务, 最早的就绪时间)
+    def _pick(self, now: float):
+        next_ready = None
+        for repository, keys in self._repos.items():
+            if self._running.get(repository, 0) >= self.per_repo_limit:
+                continue
+            for key in keys:
+                if key in self._running_keys:
+                    continue
+                job = self._jobs[key]
+                if job.ready_at <= now:
+                    del self._jobs[key]
+                    self._remove_key(repository, key)
+                    if repository in self._repos:
+                        self._repos.move_to_end(repository)
+                    return job, None
+                next_ready = job.ready_at if next_ready is None else min(next_ready, job.ready_at)
+        return None, next_ready
+
+    async def get(self) -> ReviewJob:
+        async with self._changed:
+            while True:
+                now = time.monotonic()
+                job, next_ready = self._pick(now)
+                if job is not None:
+                    self._running[job.repository] = self._running.get(job.repository, 0) + 1
+                    self._running_keys.add(job.key)
+                    metrics.observe("daemon_queue_wait", now - job.enqueued_at)
+                    return job
+                try:
+                    await asyncio.wait_for(self._changed.wait(),
+                                           None if next_ready is None else max(0.0, next_ready - now))
+                except asyncio.TimeoutError:
+                    pass
+
+    # 评审结束，返回该 PR 是否在评审过程中被关闭
+    async def done(self, job: ReviewJob) -> bool:
+        async with self._changed:
+            self._running[job.repository] -= 1
+            if not self._running[job.repository]:
+                del self._running[job.repository]
+            self._running_keys.discard(job.key)
+            closed = job.key in self._closed
+            self._closed.discard(job.key)
+            self._changed.notify_all()
+        return closed
+
+
+# 为每个 PR 维护一份浅克隆的检出，评审时读取 head 版本的文件
+class RepoWorkspace:
+
+    def __init__(self, root: str, token: str, server_url: str):
+        self.root = os.path.expanduser(root)
+        self.server_url = server_url.rstrip("/")
+        # 通过环境变量传递认证头，避免 token 出现在进程参数中
+        credential = base64.b64encode(f"x-access-token:{token}".encode()).decode()
+        self.env = dict(os.environ, GIT_TERMINAL_PROMPT="0", GIT_CONFIG_COUNT="1",
+                        GIT_CONFIG_KEY_0="http.extraHeader",
+                        GIT_CONFIG_VALUE_0=f"Authorization: Basic {credential}")
+
+    def path(self, owner: str, repo: str, pull_request_id: int) -> str:
+        return os.path.join(self.root, owner, repo, f"pull-{pull_request_id}")
+
+    async def git(self, *args):
+        process = await asyncio.create_subprocess_exec(
+            "git", *args, env=self.env, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+        _, stderr = await process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f"git command failed:{stderr.decode('utf-8', errors='replace').strip()}")
+
+    # 拉取 PR 最新的 head 并检出，返回检出目录
+    async def checkout(self, job: ReviewJob) -> str:
+        path = self.path(job.owner, job.repo, job.pull_request_id)
+        with metrics.stage("daemon_checkout"):
+            if not os.path.isdir(os.path.join(path, ".git")):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                await self.git("clone", "--quiet", "--no-checkout", "--depth", "1", "--filter=blob:none",
+                               f"{self.server_url}/{job.owner}/{job.repo}.git", path)
+            await self.git("-C", path, "fetch", "--quiet", "--force", "--depth", "1", "origin",
+                           f"pull/{job.pull_request_id}/head")
+            await self.git("-C", path, "checkout", "--quiet", "--force", "--detach", "FETCH_HEAD")
+        return path
+
+    async def remove(self, owner: str, repo: str, pull_request_id: int):
+        await asyncio.to_thread(shutil.rmtree, self.path(owner, repo, pull_request_id), True)
+
+
+# 校验 X-Hub-Signature-256
+def verify_signature(secret: str, body: bytes, signature: str | None) -> bool:
+    if not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature[len("sha256="):])
+
+
+def sign(secret: str, body: bytes) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+class ReviewDaemon:
+
+    def __init__(self, host: str, port: int, concurrency: int, queue: FairReviewQueue,
+                 workspace: RepoWorkspace | None, secret: str | None, incremental: bool):
+        self.host = host
+        self.port = port
+        self.concurrency = max(1, concurrency)
+        self.queue = queue
+        self.workspace = workspace
+        self.secret = secret
+        self.incremental = incremental
+        self._stop = None
+
+
+    @classmethod
+    def from_env(cls):
+        workspace_root = os.environ.get("REVIEW_DAEMON_WORKSPACE", "~/.cache/llm_mr_reviewer/workspace")
+        workspace = None
+        if workspace_root:
+            workspace = RepoWorkspace(workspace_root, os.environ.get("GITHUB_TOKEN", ""),
+                                      os.environ.get("GITHUB_SERVER_URL", "https://github.com"))
+        return cls(
+            os.environ.get("REVIEW_DAEMON_HOST", "127.0.0.1"),
+            common_function.get_env_int("REVIEW_DAEMON_PORT", 8080),
+            common_function.get_env_int("REVIEW_DAEMON_CONCURRENCY", 4),
+            FairReviewQueue(common_function.get_env_float("REVIEW_COALESCE_SECONDS", 5),
+                            common_function.get_env_int("REVIEW_DAEMON_PER_REPO", 1)),
+            workspace,
+            os.environ.get("GITHUB_WEBHOOK_SECRET") or None,
+            os.environ.get("REVIEW_DAEMON_INCREMENTAL", "1") != "0")
+
+
+    async def run(self):
+        self._stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stop.set)
+
+        # 评审结束后保留连接池，后续 PR 复用已建立的连接
+        http_client_pool.set_keep_open(True)
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        workers = [asyncio.create_task(self.worker()) for _ in range(self.concurrency)]
+        logger.info(f"Review daemon listening on {self.host}:{self.port}, concurrency:{self.concurrency}")
+        try:
+            await self._stop.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await http_client_pool.close_all()
+            await asyncio.to_thread(parse_worker.shutdown_pool)
+            metrics.write_report(os.environ.get("RUN_REPORT_DIR", "."))
+            logger.info("Review daemon stopped")
+
+
+    async def worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self.review(job)
+                metrics.increment("daemon_reviews")
+            except Exception as e:
+                metrics.increment("daemon_review_failures")
+                logger.exception(f"Review {job.repository}#{job.pull_request_id} failed:{e}")
+            finally:
+                # PR 在评审过程中被关闭时，评审结束后再删除工作区
+                if await self.queue.done(job) and self.workspace is not None:
+                    await self.workspace.remove(job.owner, job.repo, job.pull_request_id)
+
+
+    async def review(self, job: ReviewJob):
+        logger.info(f"Start review {job.repository}#{job.pull_request_id}, head:{job.head_sha}, "
+                    f"coalesced pushes:{job.pushes}")
+        repo_path = await self.workspace.checkout(job) if self.workspace is not None else None
+        analyzer = CppCodeAnalyzer(job.pull_request_id, job.owner, job.repo, repo_path)
+        try:
+            with metrics.stage("daemon_review"):
+                await review_pull_request(analyzer, ReviewOptions(incremental=self.incremental))
+        finally:
+            await analyzer.close()
+
+
+    # 处理 webhook 事件，返回 (状态码, 应答)
+    async def handle_webhook(self, headers: dict, body: bytes):
+        event = headers.get("x-github-event")
+        if event == "ping":
+            return HTTPStatus.OK, {"status": "pong"}
+        if event != "pull_request":
+            return HTTPStatus.OK, {"status": "ignored"}
+
+        payload = json.loads(body)
+        action = payload.get("action")
+        pull_request = payload["pull_request"]
+        owner = payload["repository"]["owner"]["login"]
+        repo = payload["repository"]["name"]
+        number = int(pull_request["number"])
+        if action in REVIEW_ACTIONS:
+            await self.queue.put(owner, repo, number, pull_request.get("head", {}).get("sha"))
+            return HTTPStatus.ACCEPTED, {"status": "queued"}
+        if action == "closed":
+            # 正在评审的 PR 不能立即删除工作区，由 worker 在评审结束后删除
+            if not await self.queue.discard(owner, repo, number) and self.workspace is not None:
+                await self.workspace.remove(owner, repo, number)
+        return HTTPStatus.OK, {"status": "ignored"}
+
+
+    async def handle_enqueue(self, body: bytes):
+        payload = json.loads(body)
+        owner, _, repo = payload["repository"].partition("/")
+        if not owner or not repo:
+            raise ValueError(f"Invalid repository:{payload['repository']}")
+        await self.queue.put(owner, repo, int(payload["pull_request_id"]), payload.get("head_sha"))
+        return HTTPStatus.ACCEPTED, {"status": "queued"}
+
+
+    async def route(self, method: str, path: str, headers: dict, body: bytes):
+        if method == "GET" and path == "/healthz":
+            return HTTPStatus.OK, {"status": "ok", "pending": self.queue.pending, "running": self.queue.running}
+        if method == "GET" and path == "/metrics":
+            return HTTPStatus.OK, metrics.to_prometheus(metrics.summary())
+        if method == "POST" and path in ("/webhook", "/enqueue"):
+            if self.secret and not verify_signature(self.secret, body, headers.get("x-hub-signature-256")):
+                return HTTPStatus.UNAUTHORIZED, {"message": "Invalid signature"}
+            if path == "/webhook":
+                return await self.handle_webhook(headers, body)
+            return await self.handle_enqueue(body)
+        return HTTPStatus.NOT_FOUND, {"message": "Not Found"}
+
+
+    # 最小化的 HTTP/1.1 处理，每个连接只处理一个请求
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                method, target, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    status, result = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"message": "Body too large"}
+                else:
+                    body = await reader.readexactly(length)
+                    status, result = await self.route(method, target.split("?", 1)[0], headers, body)
+            except (ValueError, KeyError, TypeError, asyncio.IncompleteReadError) as e:
+                status, result = HTTPStatus.BAD_REQUEST, {"message": f"Bad request:{e}"}
+
+            if isinstance(result, str):
+                content, content_type = result.encode("utf-8"), "text/plain; version=0.0.4"
+            else:
+                content, content_type = json.dumps(result).encode("utf-8"), "application/json"
+            writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: {content_type}\r\n"
+                         f"Content-Length: {len(content)}\r\nConnection: close\r\n\r\n".encode("latin-1") + content)
+            await writer.drain()
+        except Exception as e:
+            logger.exception(f"Handle daemon request failed:{e}")
+        finally:
+            writer.close()
+
+
+# 向本地运行的服务提交评审请求
+def enqueue(url: str, repository: str, pull_request_id: int, head_sha: str | None):
+    body = json.dumps({"repository": repository, "pull_request_id": pull_request_id,
+                       "head_sha": head_sha}).encode("utf-8")
+    request = urllib.request.Request(f"{url.rstrip('/')}/enqueue", data=body, method="POST",
+                                     headers={"Content-Type": "application/json"})
+    secret = os.environ.get("GITHUB_WEBHOOK_SECRET")
+    if secret:
+        request.add_header("X-Hub-Signature-256", sign(secret, body))
+    with urllib.request.urlopen(request, timeout=10) as response:
+        print(response.read().decode("utf-8"))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("serve", help="run the review daemon")
+    enqueue_parser = commands.add_parser("enqueue", help="queue a pull request on a running daemon")
+    enqueue_parser.add_argument("repository", help="owner/name")
+    enqueue_parser.add_argument("pull_request_id", type=int)
+    enqueue_parser.add_argument("--head", help="head sha of the pull request")
+    enqueue_parser.add_argument("--url", default=f"http://127.0.0.1:{os.environ.get('REVIEW_DAEMON_PORT', '8080')}")
+    args = parser.parse_args()
+
+    if args.command == "enqueue":
+        enqueue(args.url, args.repository, args.pull_request_id, args.head)
+        return
+    asyncio.run(ReviewDaemon.from_env().run())
+
+
+# 程序入口
+if __name__ == "__main__":
+    main()
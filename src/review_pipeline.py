@@ -0,0 +1,196 @@
+# 分阶段评审流水线：拉取 -> 读取 -> 解析/提取 -> AI 评审 -> 发布评论
+# 各阶段之间用有界队列连接，每个阶段有独立的并发数；下游处理不过来时上游自动等待（背压）
+# 解析阶段是 CPU 密集的，放到线程池执行，不阻塞事件循环；也可以改用进程池绕开 GIL，是否有收益取决于主机核数
+# 评审阶段的数据单位是同一文件的一批候选函数，未开启批量评审时每批只有一个函数
+import asyncio
+import os
+import common_function
+import file_filter
+import parse_worker
+from ai_code_reviewer_logger import logger
+from run_metrics import metrics
+
+# 通知下游阶段不会再有新数据
+_DONE = object()
+
+
+class ReviewPipeline:
+
+    def __init__(self, analyzer, queue_size: int, read_workers: int, parse_workers: int,
+                 review_workers: int, dispatch_mode: str, parse_processes: int = 0):
+        if dispatch_mode not in ("priority", "stream"):
+            raise ValueError(f"Unknown dispatch mode:{dispatch_mode}")
+        self.analyzer = analyzer
+        self.queue_size = max(1, queue_size)
+        self.read_workers = max(1, read_workers)
+        self.parse_workers = max(1, parse_workers)
+        self.review_workers = max(1, review_workers)
+        # priority: 收集完整个 PR 的候选后按优先级评审；stream: 候选到达即评审，评审与解析重叠
+        self.dispatch_mode = dispatch_mode
+        # 大于 0 时在进程池中读取和解析文件，线程内解析受 GIL 限制，Python 层的遍历无法用满多核
+        self.parse_processes = max(0, parse_processes)
+        self.file_count = 0
+        # 读取、解析或评审失败的文件/函数数，大于 0 时不记录已评审的 head，下次增量评审重新覆盖这些改动
+        self.failures = 0
+
+
+    @classmethod
+    def from_env(cls, analyzer):
+        return cls(
+            analyzer,
+            common_function.get_env_int("REVIEW_FILE_WINDOW", 64),
+            common_function.get_env_int("REVIEW_READ_CONCURRENCY", 8),
+            common_function.get_env_int("REVIEW_PARSE_CONCURRENCY", os.cpu_count() or 1),
+            analyzer.scheduler.concurrency,
+            os.environ.get("REVIEW_DISPATCH_MODE", "priority"),
+            common_function.get_env_int("REVIEW_PARSE_PROCESSES", 0))
+
+
+    def record_failure(self):
+        self.failures += 1
+        metrics.increment("pipeline_failures")
+
+
+    # 运行一个阶段：worker_count 个协程从 queue 中取数据处理，全部结束后通知下游
+    async def run_stage(self, name, queue, worker_count, handle, next_queue=None, next_workers=0, on_finish=None):
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    return
+                try:
+                    await handle(item)
+                except Exception as e:
+                    # 单个文件或函数失败不影响其他数据
+                    logger.exception(f"Pipeline stage {name} failed:{e}")
+                    self.record_failure()
+
+        try:
+            await asyncio.gather(*[worker() for _ in range(worker_count)])
+            if on_finish is not None:
+                await on_finish()
+        finally:
+            for _ in range(next_workers):
+                await next_queue.put(_DONE)
+
+
+    async def run(self, diff_file_structs) -> int:
+        analyzer = self.analyzer
+        scheduler = analyzer.scheduler
+        stream = self.dispatch_mode == "stream"
+        pool = None
+        parse_workers = self.parse_workers
+        if self.parse_processes:
+            # 进程池在多次评审之间共享，子进程启动时即创建好各语言的解析器；
+            # 每个进程保持两个在途文件，减少进程间通信造成的空闲
+            pool = parse_worker.get_pool(self.parse_processes)
+            parse_workers = self.parse_processes * 2
+        loop = asyncio.get_running_loop()
+
+        read_queue = asyncio.Queue(self.queue_size)
+        parse_queue = asyncio.Queue(self.queue_size)
+        review_queue = asyncio.Queue(self.queue_size)
+        publish_queue = asyncio.Queue(self.queue_size)
+
+        # 拉取变更文件，不支持的文件类型在读取前过滤
+        async def fetch():
+            try:
+                async for diff_file_struct in common_function.as_async_iter(diff_file_structs):
+                    self.file_count += 1
+                    if not analyzer.is_supported(diff_file_struct.file_name):
+                        continue
+                    # 只根据路径和文件大小过滤，不读取内容
+                    if (reason := analyzer.file_filter.check(diff_file_struct)) is not None:
+                        file_filter.record_skip(diff_file_struct.file_name, reason)
+                        continue
+                    await read_queue.put(diff_file_struct)
+            finally:
+                for _ in range(self.read_workers):
+                    await read_queue.put(_DONE)
+
+        async def read(diff_file_struct):
+            logger.info(f"Start review file:{diff_file_struct.file_name}")
+            if pool is not None:
+                # 进程池模式下由子进程读取文件，只传递路径，避免文件内容在进程间复制两次
+                await parse_queue.put((diff_file_struct, None))
+                return
+            try:
+                code = await analyzer.read_file(diff_file_struct)
+            except file_filter.SkipFile as e:
+                file_filter.record_skip(diff_file_struct.file_name, e.reason)
+                return
+            except IOError as e:
+                # 记录文件读取异常
+                logger.exception(f"File read error:{diff_file_struct.file_name}, error: {e}")
+                self.record_failure()
+                return
+            await parse_queue.put((diff_file_struct, code))
+
+        async def parse(item):
+            diff_file_struct, code = item
+            try:
+                if pool is None:
+                    try:
+                        candidates = await asyncio.to_thread(analyzer.parse_and_extract, diff_file_struct, code)
+                    finally:
+                        file_filter.release_source(code)
+                else:
+                    language = analyzer.detect_language(diff_file_struct.file_name)
+                    with metrics.stage("parse"):
+                        snippets = await loop.run_in_executor(
+                            pool, parse_worker.extract_changed_functions,
+                            diff_file_struct.file_path, language, list(diff_file_struct.diff_position),
+                            analyzer.function_max_tokens, analyzer.context_lines)
+                    candidates = analyzer.snippets_to_candidates(diff_file_struct, language, snippets)
+            except file_filter.SkipFile as e:
+                file_filter.record_skip(diff_file_struct.file_name, e.reason)
+                return
+            except IOError as e:
+                # 记录文件读取异常
+                logger.exception(f"File read error:{diff_file_struct.file_name}, error: {e}")
+                self.record_failure()
+                return
+            except ValueError as e:
+                # 记录解析异常
+                logger.exception(f"Parsing error{diff_file_struct.file_name}, error: {e}")
+                self.record_failure()
+                return
+            if stream:
+                for batch in scheduler.make_batches(candidates):
+                    await review_queue.put(batch)
+            else:
+                for candidate in candidates:
+                    scheduler.add(candidate)
+
+        # priority 模式下，解析全部完成后才把选中的候选送入评审阶段
+        async def dispatch_selected():
+            if not stream:
+                for batch in scheduler.make_batches(scheduler.select()):
+                    await review_queue.put(batch)
+
+        async def review(batch):
+            if stream:
+                batch = [candidate for candidate in batch if scheduler.try_reserve(candidate)]
+                if not batch:
+                    return
+            await analyzer.attach_symbol_context(batch)
+            for item in await analyzer.review_batch(batch):
+                await publish_queue.put(item)
+
+        async def publish(item):
+            analyzer.publish_comment(*item)
+
+        results = await asyncio.gather(
+            fetch(),
+            self.run_stage("read", read_queue, self.read_workers, read, parse_queue, parse_workers),
+            self.run_stage("parse", parse_queue, parse_workers, parse, review_queue, self.review_workers,
+                           dispatch_selected),
+            self.run_stage("review", review_queue, self.review_workers, review, publish_queue, 1),
+            self.run_stage("publish", publish_queue, 1, publish),
+            return_exceptions=True)
+
+        # 拉取变更文件失败等错误需要让调用方感知
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return self.file_count
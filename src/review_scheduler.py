@@ -0,0 +1,161 @@
+# PR 级别的 LLM 调用调度：先收集整个 PR 的候选函数，打分后在全局调用次数和 token 预算内择优评审
+import fnmatch
+import math
+import os
+import common_function
+from ai_code_reviewer_logger import logger
+from dataclasses import dataclass
+from function_trimmer import estimate_tokens
+
+# 默认的路径权重，测试、示例和第三方代码优先级较低
+DEFAULT_PATH_WEIGHTS = {
+    "*third_party/*": 0.1,
+    "*vendor/*": 0.1,
+    "*test*": 0.5,
+    "*example*": 0.5,
+    "*docs/*": 0.5,
+}
+
+
+@dataclass
+class ReviewCandidate:
+    file_name: str
+    language: str
+    changed_lines: list  # 函数内的变更行，评论落在第一行
+    function_body: str
+    function_lines: int  # 函数总行数
+    score: float = 0.0
+    function_name: str = ""  # 函数名，用于在符号索引中排除函数自身
+    context: str = ""  # 评审前附上的相关声明签名
+
+
+# 解析 "key=value,key=value" 形式的权重配置
+def parse_weights(value: str | None, default: dict) -> dict:
+    if not value:
+        return dict(default)
+    weights = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        key, _, weight = item.partition("=")
+        try:
+            weights[key.strip()] = float(weight)
+        except ValueError as e:
+            raise ValueError(f"Invalid weight config:{item}") from e
+    return weights
+
+
+class ReviewScheduler:
+
+    def __init__(self, max_calls: int, max_tokens: int, concurrency: int, max_calls_per_file: int,
+                 path_weights: dict, language_weights: dict, batch_max_tokens: int = 0,
+                 batch_max_functions: int = 8):
+        self.max_calls = max_calls
+        self.max_tokens = max_tokens
+        self.concurrency = concurrency
+        self.max_calls_per_file = max_calls_per_file
+        self.path_weights = path_weights
+        self.language_weights = language_weights
+        # 批量评审：同一文件的多个函数合并为一次请求，batch_max_tokens 为 0 时关闭
+        self.batch_max_tokens = batch_max_tokens
+        self.batch_max_functions = max(1, batch_max_functions)
+        self.candidates = []
+        
+        # 流式调度模式下已占用的预算
+        self._reserved_calls = 0
+        self._reserved_tokens = 0
+        self._file_calls = {}
+
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            common_function.get_env_int("REVIEW_MAX_CALLS", 30),
+            common_function.get_env_int("REVIEW_MAX_TOKENS", 200000),
+            common_function.get_env_int("REVIEW_LLM_CONCURRENCY", 8),
+            common_function.get_env_int("REVIEW_MAX_CALLS_PER_FILE", 3),
+            parse_weights(os.environ.get("REVIEW_PATH_WEIGHTS"), DEFAULT_PATH_WEIGHTS),
+            parse_weights(os.environ.get("REVIEW_LANGUAGE_WEIGHTS"), {}),
+            common_function.get_env_int("REVIEW_BATCH_MAX_TOKENS", 0),
+            common_function.get_env_int("REVIEW_BATCH_MAX_FUNCTIONS", 8))
+
+
+    # 变更行越多、变更占函数的比例越高，优先级越高；再按语言和路径加权
+    def score(self, candidate: ReviewCandidate) -> float:
+        changed = len(candidate.changed_lines)
+        changed_ratio = changed / max(candidate.function_lines, 1)
+        score = changed * (1 + changed_ratio) + math.log2(candidate.function_lines + 1)
+        score *= self.language_weights.get(candidate.language, 1.0)
+        for pattern, weight in self.path_weights.items():
+            if fnmatch.fnmatch(candidate.file_name, pattern):
+                score *= weight
+        return score
+
+
+    def add(self, candidate: ReviewCandidate):
+        candidate.score = self.score(candidate)
+        self.candidates.append(candidate)
+
+
+    # 按得分从高到低，在调用次数、单文件次数和 token 预算内贪心选择
+    def select(self) -> list:
+        selected = []
+        used_tokens = 0
+        file_calls = {}
+        for candidate in sorted(self.candidates, key=lambda c: c.score, reverse=True):
+            if len(selected) >= self.max_calls:
+                break
+            if file_calls.get(candidate.file_name, 0) >= self.max_calls_per_file:
+                continue
+            tokens = estimate_tokens(candidate.function_body)
+            if used_tokens + tokens > self.max_tokens:
+                continue  # 放不下时尝试更小的候选
+            used_tokens += tokens
+            file_calls[candidate.file_name] = file_calls.get(candidate.file_name, 0) + 1
+            selected.append(candidate)
+
+        logger.info(f"Review scheduler selected {len(selected)}/{len(self.candidates)} functions, "
+                    f"estimated tokens:{used_tokens}")
+        self.candidates = []
+        return selected
+
+
+    # 流式调度时按到达顺序逐个占用预算，预算用尽后的候选直接跳过
+    def try_reserve(self, candidate: ReviewCandidate) -> bool:
+        if self._reserved_calls >= self.max_calls:
+            return False
+        if self._file_calls.get(candidate.file_name, 0) >= self.max_calls_per_file:
+            return False
+        tokens = estimate_tokens(candidate.function_body)
+        if self._reserved_tokens + tokens > self.max_tokens:
+            return False
+        self._reserved_calls += 1
+        self._reserved_tokens += tokens
+        self._file_calls[candidate.file_name] = self._file_calls.get(candidate.file_name, 0) + 1
+        return True
+
+
+    # 将候选按文件分组打包，每批不超过 token 预算和函数个数；文件按其中首个候选的顺序排列
+    def make_batches(self, candidates: list) -> list:
+        if self.batch_max_tokens <= 0:
+            return [[candidate] for candidate in candidates]
+
+        by_file = {}
+        for candidate in candidates:
+            by_file.setdefault(candidate.file_name, []).append(candidate)
+
+        batches = []
+        for file_candidates in by_file.values():
+            batch = []
+            batch_tokens = 0
+            for candidate in file_candidates:
+                tokens = estimate_tokens(candidate.function_body)
+                if batch and (batch_tokens + tokens > self.batch_max_tokens or len(batch) >= self.batch_max_functions):
+                    batches.append(batch)
+                    batch = []
+                    batch_tokens = 0
+                batch.append(candidate)
+                batch_tokens += tokens
+            if batch:
+                batches.append(batch)
+        return batches
@@ -0,0 +1,111 @@
+# 运行指标：各阶段耗时、token 和缓存/重试计数，运行结束时输出 JSON 摘要和 Prometheus 文本格式文件
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from ai_code_reviewer_logger import logger
+
+METRIC_PREFIX = "llm_mr_reviewer"
+
+
+class StageStats:
+
+    def __init__(self):
+        self.durations = []
+
+    def add(self, duration: float):
+        self.durations.append(duration)
+
+    def percentile(self, percent: float) -> float:
+        if not self.durations:
+            return 0.0
+        ordered = sorted(self.durations)
+        index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self) -> dict:
+        return {
+            "count": len(self.durations),
+            "total_seconds": round(sum(self.durations), 6),
+            "max_seconds": round(max(self.durations, default=0.0), 6),
+            "p50_seconds": round(self.percentile(50), 6),
+            "p95_seconds": round(self.percentile(95), 6),
+        }
+
+
+class RunMetrics:
+
+    def __init__(self):
+        # 解析阶段在工作线程中执行，记录时需要加锁
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+
+    # 记录一个阶段的耗时，可在同步和异步代码中使用；并发执行的同名阶段耗时会累加
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name: str, duration: float):
+        with self._lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = StageStats()
+            stats.add(duration)
+
+    def increment(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self) -> dict:
+        return {
+            "wall_seconds": round(time.perf_counter() - self.started, 6),
+            "stages": {name: stats.summary() for name, stats in sorted(self.stages.items())},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def to_prometheus(self, summary: dict) -> str:
+        lines = [
+            f"# TYPE {METRIC_PREFIX}_wall_seconds gauge",
+            f"{METRIC_PREFIX}_wall_seconds {summary['wall_seconds']}",
+            f"# TYPE {METRIC_PREFIX}_stage_seconds summary",
+        ]
+        for name, stats in summary["stages"].items():
+            lines.append(f'{METRIC_PREFIX}_stage_seconds{{stage="{name}",quantile="0.5"}} {stats["p50_seconds"]}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds{{stage="{name}",quantile="0.95"}} {stats["p95_seconds"]}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{name}"}} {stats["total_seconds"]}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+        lines.append(f"# TYPE {METRIC_PREFIX}_stage_max_seconds gauge")
+        for name, stats in summary["stages"].items():
+            lines.append(f'{METRIC_PREFIX}_stage_max_seconds{{stage="{name}"}} {stats["max_seconds"]}')
+        for name, value in summary["counters"].items():
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name}_total counter")
+            lines.append(f"{METRIC_PREFIX}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    # 写出 run_report.json 和 run_metrics.prom，可以和 app.log 一起作为工作流产物上传
+    def write_report(self, report_dir: str):
+        summary = self.summary()
+        try:
+            os.makedirs(report_dir, exist_ok=True)
+            with open(os.path.join(report_dir, "run_report.json"), "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+            with open(os.path.join(report_dir, "run_metrics.prom"), "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus(summary))
+        except OSError as e:
+            logger.warning(f"Write run report failed:{e}")
+            return
+        logger.info(f"Run report written to {report_dir}, wall seconds:{summary['wall_seconds']}")
+
+
+# 全局指标对象
+metrics = RunMetrics()
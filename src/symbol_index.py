@@ -0,0 +1,251 @@
+# 仓库符号索引：用已有的 tree-sitter 解析器提取函数和类型的名称与签名，持久化为紧凑的磁盘索引
+# 以 git 索引中每个文件的 blob 哈希判断文件是否变化，只重新解析新增或修改的文件，浅克隆下同样可用
+# 评审时按函数体中出现的标识符查表，附上被调用函数和相关类型的签名，总量不超过 token 上限
+import hashlib
+import json
+import os
+import re
+import subprocess
+import file_filter
+import language_registry
+from ai_code_reviewer_logger import logger
+from function_trimmer import estimate_tokens
+from run_metrics import metrics
+
+# 索引格式变化时修改此版本号，旧索引整体重建
+INDEX_VERSION = "1"
+
+_IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+# 名称节点的类型，各语言的语法不完全一致
+_NAME_NODE_TYPES = ("identifier", "type_identifier", "field_identifier", "property_identifier",
+                    "simple_identifier", "qualified_identifier", "scoped_identifier", "destructor_name",
+                    "operator_name", "constant")
+
+# 同一名称最多附上的定义数；同名定义过多且都不在同一目录时视为无法判断，不附上
+MAX_DEFINITIONS_PER_NAME = 2
+MAX_AMBIGUOUS_DEFINITIONS = 8
+
+# 单条签名的最大长度
+MAX_SIGNATURE_CHARS = 160
+
+
+# 声明节点的名称：优先使用 name 字段，其次沿 declarator 字段找到最内层的声明符（C/C++），
+# 最后取第一个标识符子节点（如 Kotlin）；限定名只保留最后一段
+def declaration_name(node) -> str | None:
+    name = node.child_by_field_name("name")
+    if name is None:
+        declarator = node
+        while (inner := declarator.child_by_field_name("declarator")) is not None:
+            declarator = inner
+        if declarator is not node:
+            name = declarator if declarator.type in _NAME_NODE_TYPES else next(
+                (child for child in declarator.children if child.type in _NAME_NODE_TYPES), None)
+    if name is None:
+        # 不属于任何字段的标识符才是名称，排除箭头函数的参数等
+        name = next((child for index, child in enumerate(node.children)
+                     if child.type in _NAME_NODE_TYPES and node.field_name_for_child(index) is None), None)
+    if name is None:
+        return None
+    text = re.split(r"::|\.", name.text.decode("utf-8", errors="replace"))[-1].strip()
+    return text if _IDENTIFIER_RE.fullmatch(text) else None
+
+
+# 声明的签名：函数体或类型体之前的文本，没有函数体的声明取全文，压缩空白后截断
+def declaration_signature(node) -> str:
+    body = node.child_by_field_name("body")
+    if body is None:
+        body = next((child for child in reversed(node.children)
+                     if child.type.endswith(("body", "block", "declaration_list"))), None)
+    text = node.text
+    if body is not None:
+        text = text[:body.start_byte - node.start_byte]
+    signature = " ".join(text.decode("utf-8", errors="replace").split()).rstrip(" {:;=")
+    if len(signature) > MAX_SIGNATURE_CHARS:
+        signature = f"{signature[:MAX_SIGNATURE_CHARS]}..."
+    return signature
+
+
+# C/C++ 的 declaration 节点只有声明符链中含有 function_declarator 时才是函数声明
+def _is_function_declaration(node) -> bool:
+    declarator = node.child_by_field_name("declarator")
+    while declarator is not None:
+        if declarator.type == "function_declarator":
+            return True
+        declarator = declarator.child_by_field_name("declarator")
+    return False
+
+
+# 迭代遍历语法树，提取顶层和类型内部的函数与类型声明，不进入函数体；返回 [[名称, 种类, 行号, 签名]]
+def extract_symbols(root_node, spec) -> list:
+    symbols = []
+    cursor = root_node.walk()
+    while True:
+        node = cursor.node
+        kind = None
+        if node.type in spec.function_node_types:
+            kind = "function"
+        elif node.type in spec.type_node_types:
+            # C/C++ 中不带定义体的 struct/enum 只是对类型的引用
+            if not (node.type.endswith("_specifier") and node.child_by_field_name("body") is None):
+                kind = "type"
+        elif node.type in spec.declaration_node_types and _is_function_declaration(node):
+            kind = "function"
+        if kind is not None and (name := declaration_name(node)) is not None:
+            symbols.append([name, kind, node.start_point[0] + 1, declaration_signature(node)])
+        if kind != "function" and cursor.goto_first_child():
+            continue
+        while not cursor.goto_next_sibling():
+            if not cursor.goto_parent():
+                return symbols
+
+
+class SymbolIndex:
+
+    def __init__(self, repo_path: str, index_dir: str | None, filter_: file_filter.FileFilter):
+        self.repo_path = os.path.abspath(repo_path)
+        # index_dir 为空时每次运行都全量解析，不落盘
+        self.index_dir = os.path.expanduser(index_dir) if index_dir else None
+        self.file_filter = filter_
+        self.files = {}  # 相对路径 -> [blob 哈希, 符号列表]
+        self.names = {}  # 名称 -> [(相对路径, 种类, 行号, 签名)]
+
+
+    def _index_path(self) -> str:
+        digest = hashlib.sha256(self.repo_path.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.index_dir, f"{digest}.json")
+
+
+    def _load(self) -> dict:
+        if not self.index_dir:
+            return {}
+        path = self._index_path()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Symbol index broken, rebuild it:{path}, error:{e}")
+            return {}
+        if index.get("version") != INDEX_VERSION or index.get("repo") != self.repo_path:
+            return {}
+        return index.get("files", {})
+
+
+    def _save(self):
+        if not self.index_dir:
+            return
+        path = self._index_path()
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "repo": self.repo_path, "files": self.files}, f,
+                          ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, path)  # 原子替换，避免并发读到半个文件
+        except OSError as e:
+            logger.warning(f"Write symbol index failed:{path}, error:{e}")
+
+
+    # git 索引中的文件及其 blob 哈希；工作区中有未提交修改的文件哈希记为空，每次都重新解析
+    def _tracked_files(self) -> dict:
+        def git(*args) -> list:
+            output = subprocess.run(["git", "-C", self.repo_path, *args], check=True, capture_output=True).stdout
+            return [item.decode("utf-8", errors="replace") for item in output.split(b"\0") if item]
+
+        files = {}
+        for entry in git("ls-files", "-s", "-z"):
+            info, _, path = entry.partition("\t")
+            mode, blob, _ = info.split(" ", 2)
+            if mode != "160000":  # 跳过子模块
+                files[path] = blob
+        for path in git("ls-files", "-m", "-z"):
+            if path in files:
+                files[path] = ""
+        return files
+
+
+    def _parse_file(self, path: str, spec) -> list | None:
+        full_path = os.path.join(self.repo_path, path)
+        if self.file_filter.check_path(path, full_path) is not None:
+            return None
+        try:
+            source = self.file_filter.load_source(full_path)
+        except file_filter.SkipFile:
+            return []  # 二进制或生成代码，按 blob 哈希记住结果，不再重复读取
+        except OSError:
+            return None
+        try:
+            tree = language_registry.get_parser(spec.name).parse(source)
+            return extract_symbols(tree.root_node, spec)
+        finally:
+            file_filter.release_source(source)
+
+
+    # 同步执行，由调用方放到工作线程中：对比 blob 哈希，只解析变化的文件，然后重建名称表
+    def update(self):
+        with metrics.stage("symbol_index_update"):
+            previous = self._load()
+            tracked = self._tracked_files()
+            unavailable = set()  # 未安装语法模块的语言
+            files = {}
+            parsed = 0
+            for path, blob in tracked.items():
+                spec = language_registry.find_by_file(path)
+                if spec is None or spec.name in unavailable:
+                    continue
+                cached = previous.get(path)
+                if blob and cached is not None and cached[0] == blob:
+                    files[path] = cached
+                    continue
+                try:
+                    symbols = self._parse_file(path, spec)
+                except RuntimeError:
+                    unavailable.add(spec.name)
+                    continue
+                if symbols is not None:
+                    files[path] = [blob, symbols]
+                    parsed += 1
+            self.files = files
+            if parsed or len(files) != len(previous):
+                self._save()
+
+            names = {}
+            for path, (_, symbols) in files.items():
+                for name, kind, line, signature in symbols:
+                    names.setdefault(name, []).append((path, kind, line, signature))
+            self.names = names
+        metrics.increment("symbol_index_parsed_files", parsed)
+        logger.info(f"Symbol index updated, files:{len(files)}, parsed:{parsed}, names:{len(names)}")
+
+
+    # 按标识符在函数体中首次出现的顺序，列出相关声明的签名；同一文件、同一目录中的定义优先
+    # 函数自身的定义不列出，总量不超过 max_tokens
+    def context_for(self, body: str, file_name: str, function_name: str, max_tokens: int) -> str:
+        directory = os.path.dirname(file_name)
+        lines = []
+        used_tokens = 0
+        seen = set()
+        for name in _IDENTIFIER_RE.findall(body):
+            if name in seen:
+                continue
+            seen.add(name)
+            definitions = self.names.get(name)
+            if not definitions:
+                continue
+            definitions = [definition for definition in definitions
+                           if not (name == function_name and definition[0] == file_name)]
+            definitions.sort(key=lambda definition: (definition[0] != file_name,
+                                                     os.path.dirname(definition[0]) != directory))
+            if (len(definitions) > MAX_AMBIGUOUS_DEFINITIONS
+                    and os.path.dirname(definitions[0][0]) != directory):
+                continue
+            for path, _, line, signature in definitions[:MAX_DEFINITIONS_PER_NAME]:
+                text = f"- {signature}（{path}:{line}）"
+                tokens = estimate_tokens(text)
+                if used_tokens + tokens > max_tokens:
+                    return "\n".join(lines)
+                lines.append(text)
+                used_tokens += tokens
+        return "\n".join(lines)
@@ -0,0 +1,5 @@
+# 源码按 src 目录内的扁平模块互相导入，测试时把 src 加入模块搜索路径
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
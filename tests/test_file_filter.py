@@ -0,0 +1,66 @@
+import os
+import pytest
+from file_filter import FileFilter, SkipFile, generated_marker
+
+
+@pytest.mark.parametrize("head", [
+    b"// Code generated by protoc-gen-go. DO NOT EDIT.\npackage foo\n",
+    b"// Generated by the protocol buffer compiler.  DO NOT EDIT!\n// source: foo.proto\n#pragma once\n",
+    b"# -*- coding: utf-8 -*-\n# Generated by the protocol buffer compiler.  DO NOT EDIT!\nimport sys\n",
+    b"/**\n * Copyright (c) Example\n *\n * @generated SignedSource<<abc>>\n */\n",
+    b"/*\n  Licensed under MIT\n  @generated\n*/\nint x;\n",
+    b"\n\n// @generated by codegen\n",
+])
+def test_generated_headers(head):
+    assert generated_marker(head) is not None
+
+
+@pytest.mark.parametrize("head", [
+    # 普通注释中的 auto-generated 字样不是生成代码标记
+    b"// IDs are auto-generated by the server\nint next_id();\n",
+    b"# This file was automatically generated once, then edited by hand\nimport os\n",
+    # 标记出现在第一行代码之后
+    b"#include <stdio.h>\n// @generated\n",
+    b"const char *kBanner = \"Code generated by tool. DO NOT EDIT.\";\n",
+    b"/* header */\nint x; // DO NOT EDIT\n",
+])
+def test_ordinary_code_is_not_generated(head):
+    assert generated_marker(head) is None
+
+
+def make_filter(**kwargs):
+    options = dict(exclude_globs=("vendor/*",), max_file_bytes=100, mmap_threshold=0, sniff_bytes=4096)
+    options.update(kwargs)
+    return FileFilter(**options)
+
+
+def test_check_path(tmp_path):
+    (tmp_path / ".gitattributes").write_text("gen/* linguist-generated\ngen/keep.c -linguist-generated\n")
+    (tmp_path / "gen").mkdir()
+    for name, size in (("gen/a.c", 10), ("gen/keep.c", 10), ("big.c", 200), ("small.c", 10)):
+        (tmp_path / name).write_bytes(b"x" * size)
+    file_filter = make_filter()
+
+    def check(name):
+        return file_filter.check_path(name, os.path.join(str(tmp_path), name))
+
+    assert check("vendor/lib.c") == "excluded"
+    assert check("gen/a.c") == "generated"
+    assert check("gen/keep.c") is None
+    assert check("big.c") == "oversized"
+    assert check("small.c") is None
+
+
+def test_load_source_skips_binary_and_generated(tmp_path):
+    file_filter = make_filter()
+    (tmp_path / "bin.c").write_bytes(b"abc\0def")
+    (tmp_path / "gen.go").write_bytes(b"// Code generated by mockgen. DO NOT EDIT.\npackage foo\n")
+    (tmp_path / "ids.c").write_bytes(b"// IDs are auto-generated by the server\nint next_id();\n")
+
+    with pytest.raises(SkipFile) as error:
+        file_filter.load_source(str(tmp_path / "bin.c"))
+    assert error.value.reason == "binary"
+    with pytest.raises(SkipFile) as error:
+        file_filter.load_source(str(tmp_path / "gen.go"))
+    assert error.value.reason == "generated"
+    assert bytes(file_filter.load_source(str(tmp_path / "ids.c"))).startswith(b"// IDs")
@@ -0,0 +1,54 @@
+from function_trimmer import estimate_tokens, split_function, tokens_saved
+
+
+# 起始行为 start_line 的函数：首行为签名，其余每行一条语句
+def make_function(line_count, start_line=10):
+    lines = ["int handler(int a, int b) {"] + [f"    value_{index} = compute(a, b, {index});"
+                                                for index in range(1, line_count - 1)] + ["}"]
+    return "\n".join(lines)
+
+
+def test_short_function_is_unchanged():
+    source = make_function(5)
+    units = split_function(source, source, 10, [12], 1000, 2)
+    assert len(units) == 1 and units[0].body is source and units[0].changed_lines == [12]
+    assert tokens_saved(source, units) == 0
+
+
+def test_long_function_is_trimmed_around_changes():
+    source = make_function(200)
+    units = split_function(source, source, 10, [110], 200, 2)
+    assert len(units) == 1
+    body = units[0].body
+    assert body.startswith("int handler(int a, int b) {")
+    assert "value_100 " in body and "value_98 " in body and "value_102 " in body
+    assert "value_97 " not in body and "value_103 " not in body
+    assert "... 省略第 11-107 行，共 97 行未改动 ..." in body
+    assert estimate_tokens(body) <= 200
+    assert tokens_saved(source, units) > 0
+
+
+def test_distant_changes_are_split_into_units():
+    source = make_function(400)
+    units = split_function(source, source, 1, [20, 21, 200, 380], 120, 1)
+    assert [unit.changed_lines for unit in units] == [[20, 21], [200], [380]]
+    for unit in units:
+        assert unit.body.startswith("int handler(int a, int b) {")
+        assert estimate_tokens(unit.body) <= 120
+
+
+def test_changed_lines_outside_function_are_ignored():
+    source = make_function(200)
+    units = split_function(source, source, 10, [5, 500], 50, 2)
+    assert units[0].body is source
+    assert units[0].changed_lines == []
+
+
+def test_oversized_region_is_split_by_lines():
+    source = make_function(200)
+    changed = list(range(50, 90))
+    units = split_function(source, source, 1, changed, 120, 0)
+    assert len(units) > 1
+    assert [line for unit in units for line in unit.changed_lines] == changed
+    for unit in units:
+        assert estimate_tokens(unit.body) <= 120
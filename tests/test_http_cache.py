@@ -0,0 +1,78 @@
+import asyncio
+import httpx
+from github_assistant import GithubAssistant
+
+URL = "https://api.github.com/repos/owner/repo/pulls/1/files?page=1"
+
+
+# 模拟 GitHub：带 ETag 返回内容，请求携带相同的 If-None-Match 时返回 304
+def make_transport(requests, etag='"v1"', body='[{"filename": "a.c"}]'):
+    def handler(request):
+        requests.append(request)
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        return httpx.Response(200, headers={"ETag": etag, "Link": '<https://next>; rel="next"'}, text=body)
+    return httpx.MockTransport(handler)
+
+
+def make_assistant(tmp_path, monkeypatch, transport):
+    monkeypatch.setenv("GITHUB_HTTP_CACHE_DIR", str(tmp_path / "github"))
+    monkeypatch.setenv("REVIEW_STATE_DIR", "")
+    assistant = GithubAssistant("token-0123456789", "owner", "repo", 1)
+    assistant.client = httpx.AsyncClient(transport=transport)
+    return assistant
+
+
+def test_not_modified_response_replays_cached_body(tmp_path, monkeypatch):
+    requests = []
+
+    async def run():
+        first = make_assistant(tmp_path, monkeypatch, make_transport(requests))
+        response = await first.get_with_cache(URL)
+        assert response.status_code == 200 and "If-None-Match" not in requests[0].headers
+
+        # 新的运行从磁盘缓存中读取 ETag，304 时用缓存内容构造 200 应答
+        second = make_assistant(tmp_path, monkeypatch, make_transport(requests))
+        replay = await second.get_with_cache(URL)
+        assert requests[1].headers["If-None-Match"] == '"v1"'
+        assert replay.status_code == 200
+        assert replay.json() == [{"filename": "a.c"}]
+        assert replay.headers["Link"] == '<https://next>; rel="next"'
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert (first.http_cache.refreshed, first.http_cache.not_modified) == (1, 0)
+    assert (second.http_cache.refreshed, second.http_cache.not_modified) == (0, 1)
+
+
+def test_changed_content_refreshes_cache(tmp_path, monkeypatch):
+    requests = []
+
+    async def run():
+        await make_assistant(tmp_path, monkeypatch, make_transport(requests)).get_with_cache(URL)
+        changed = make_assistant(tmp_path, monkeypatch, make_transport(requests, '"v2"', "[]"))
+        assert (await changed.get_with_cache(URL)).json() == []
+        # 内容变化后缓存更新为新的 ETag
+        latest = make_assistant(tmp_path, monkeypatch, make_transport(requests, '"v2"', "[]"))
+        assert (await latest.get_with_cache(URL)).json() == []
+        return latest
+
+    latest = asyncio.run(run())
+    assert requests[2].headers["If-None-Match"] == '"v2"'
+    assert latest.http_cache.not_modified == 1
+
+
+def test_response_without_validator_is_not_cached(tmp_path, monkeypatch):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, text="{}")
+
+    async def run():
+        for _ in range(2):
+            assistant = make_assistant(tmp_path, monkeypatch, httpx.MockTransport(handler))
+            await assistant.get_with_cache(URL)
+
+    asyncio.run(run())
+    assert all("If-None-Match" not in request.headers for request in requests)
@@ -0,0 +1,201 @@
+import asyncio
+import httpx
+from github_assistant import GithubAssistant
+from review_pipeline import ReviewPipeline, _DONE
+
+
+# reject_reviews 为 True 时批量 review 返回 422，模拟个别评论行号不在 diff 中
+def make_assistant(tmp_path, monkeypatch, reject_reviews=False):
+    monkeypatch.setenv("REVIEW_STATE_DIR", str(tmp_path / "state"))
+    monkeypatch.setenv("GITHUB_HTTP_CACHE_DIR", str(tmp_path / "github"))
+    assistant = GithubAssistant("token-0123456789", "owner", "repo", 1)
+    posted = []
+
+    async def get_commit_sha():
+        return "a" * 40
+
+    async def call_github_api(request_method, url, payload=None):
+        if reject_reviews and payload.get("comments"):
+            request = httpx.Request(request_method, url)
+            raise httpx.HTTPStatusError("rejected", request=request, response=httpx.Response(422, request=request))
+        posted.append(payload)
+
+    monkeypatch.setattr(assistant, "get_commit_sha", get_commit_sha)
+    monkeypatch.setattr(assistant, "call_github_api", call_github_api)
+    return assistant, posted
+
+
+def test_incomplete_review_keeps_reviewed_head(tmp_path, monkeypatch):
+    assistant, posted = make_assistant(tmp_path, monkeypatch)
+    assistant.save_reviewed_sha("b" * 40)
+    assistant.add_comment("a.py", 3, "comment")
+
+    asyncio.run(assistant.submit_review(complete=False))
+
+    # 已有评论照常提交，但不带 head 标记，也不推进本地记录的 head
+    assert len(posted) == 1
+    assert "llm_mr_reviewer:head" not in posted[0]["body"]
+    assert assistant.load_reviewed_sha() == "b" * 40
+
+
+def test_complete_review_records_head(tmp_path, monkeypatch):
+    assistant, posted = make_assistant(tmp_path, monkeypatch)
+    assistant.save_reviewed_sha("b" * 40)
+
+    asyncio.run(assistant.submit_review(complete=False))
+    assert assistant.load_reviewed_sha() == "b" * 40
+
+    asyncio.run(assistant.submit_review())
+    assert assistant.load_reviewed_sha() == "a" * 40
+    # 没有评论时提交只有正文的 review，没有本地状态的运行也能从 PR 中找到已评审的 head
+    assert len(posted) == 1
+    assert "comments" not in posted[0]
+    assert f"llm_mr_reviewer:head={'a' * 40}" in posted[0]["body"]
+
+
+def test_rejected_review_still_posts_head_marker(tmp_path, monkeypatch):
+    assistant, posted = make_assistant(tmp_path, monkeypatch, reject_reviews=True)
+    assistant.add_comment("a.py", 3, "comment")
+
+    asyncio.run(assistant.submit_review())
+
+    # 逐条提交评论后，另外提交带 head 标记的 review
+    assert [payload.get("body") for payload in posted[:1]] == ["comment"]
+    assert f"llm_mr_reviewer:head={'a' * 40}" in posted[1]["body"]
+    assert "comments" not in posted[1]
+
+
+def test_pipeline_counts_stage_failures():
+    pipeline = ReviewPipeline(None, 4, 1, 1, 1, "priority")
+
+    async def handle(item):
+        if item % 2:
+            raise RuntimeError("review failed")
+
+    async def run():
+        queue = asyncio.Queue()
+        for item in range(5):
+            queue.put_nowait(item)
+        queue.put_nowait(_DONE)
+        await pipeline.run_stage("review", queue, 1, handle)
+
+    asyncio.run(run())
+    assert pipeline.failures == 2
+
+
+def test_response_error_is_counted_but_not_published():
+    from ai_code_reviewer import CppCodeAnalyzer
+    from ai_module import DeepSeek
+    from review_scheduler import ReviewCandidate
+
+    class FakeModel:
+        RESPONSE_ERROR = DeepSeek.RESPONSE_ERROR
+
+        async def call_ai_model(self, code_content, file_name=None, language=None, symbols=""):
+            return self.RESPONSE_ERROR if "broken" in code_content else "use a guard"
+
+        async def call_ai_model_batch(self, functions, file_name=None, language=None):
+            return [None] * len(functions)  # 批量应答无法解析，退回逐个评审
+
+    analyzer = CppCodeAnalyzer.__new__(CppCodeAnalyzer)
+    analyzer.ai_module = FakeModel()
+    analyzer.review_failures = 0
+    broken = ReviewCandidate("a.c", "c", [3], "int broken();", 1)
+    good = ReviewCandidate("a.c", "c", [9], "int good();", 1)
+
+    async def run():
+        return await analyzer.review_batch([broken]), await analyzer.review_batch([broken, good])
+
+    single, batch = asyncio.run(run())
+    assert single == []
+    assert batch == [(good, "use a guard", 9)]
+    assert analyzer.review_failures == 2
+
+
+HEAD = "c" * 40
+LAST = "b" * 40
+
+
+def patch(*lines):
+    return "\n".join(f"@@ -{line},0 +{line},1 @@\n+changed" for line in lines)
+
+
+# 模拟 GitHub：PR 信息、分页的 review 列表、PR 文件列表和 compare 接口
+def make_github(pr_files, reviews_pages, compare):
+    def handler(request):
+        path = request.url.path
+        if path.endswith("/pulls/1"):
+            return httpx.Response(200, json={"head": {"sha": HEAD}})
+        if path.endswith("/pulls/1/files"):
+            return httpx.Response(200, json=[{"filename": name, "patch": patch(*lines)}
+                                             for name, lines in pr_files.items()])
+        if path.endswith("/pulls/1/reviews"):
+            page = int(request.url.params.get("page", 1))
+            headers = {}
+            if page < len(reviews_pages):
+                headers["Link"] = f'<{request.url.copy_merge_params({"page": page + 1})}>; rel="next"'
+            return httpx.Response(200, headers=headers, json=[{"body": body} for body in reviews_pages[page - 1]])
+        if "/compare/" in path:
+            if compare is None:
+                return httpx.Response(404, json={"message": "Not Found"})
+            return httpx.Response(200, json={"files": [{"filename": name, "patch": patch(*lines)}
+                                                       for name, lines in compare.items()]})
+        return httpx.Response(404)
+    return httpx.MockTransport(handler)
+
+
+def make_incremental(tmp_path, monkeypatch, pr_files, reviews_pages, compare=None):
+    monkeypatch.setenv("REVIEW_STATE_DIR", str(tmp_path / "state"))
+    monkeypatch.setenv("GITHUB_HTTP_CACHE_DIR", "")
+    assistant = GithubAssistant("token-0123456789", "owner", "repo", 1)
+    assistant.client = httpx.AsyncClient(transport=make_github(pr_files, reviews_pages, compare))
+    return assistant
+
+
+def collect(assistant):
+    async def run():
+        return {item.file_name: item.diff_position async for item in assistant.iter_incremental_diff_file_structs()}
+    return asyncio.run(run())
+
+
+def test_last_reviewed_sha_from_review_markers(tmp_path, monkeypatch):
+    marker = GithubAssistant.review_marker
+    pages = [[f"AI code review\n{marker.format(sha='a' * 40)}", "LGTM from a human"],
+             [f"AI code review\n{marker.format(sha='1234abc')}", "<!-- llm_mr_reviewer:head=not-a-sha -->"]]
+    assistant = make_incremental(tmp_path, monkeypatch, {}, pages)
+
+    # 跨页查找，最后一个有效标记生效
+    assert asyncio.run(assistant.get_last_reviewed_sha()) == "1234abc"
+    # 本地状态文件优先
+    assistant.save_reviewed_sha(LAST)
+    assert asyncio.run(assistant.get_last_reviewed_sha()) == LAST
+
+
+def test_incremental_diff_intersects_pr_diff(tmp_path, monkeypatch):
+    assistant = make_incremental(
+        tmp_path, monkeypatch, {"a.c": [1, 3, 5], "b.c": [2]},
+        [[GithubAssistant.review_marker.format(sha=LAST)]],
+        # base.c 是合入目标分支带来的改动，不在 PR diff 中
+        {"a.c": [3, 5, 9], "base.c": [1]})
+
+    assert collect(assistant) == {"a.c": [3, 5]}
+
+
+def test_incremental_diff_falls_back_to_full_review(tmp_path, monkeypatch):
+    pr_files = {"a.c": [1, 3], "b.c": [2]}
+    marker_pages = [[GithubAssistant.review_marker.format(sha=LAST)]]
+
+    # 没有评审记录
+    assert collect(make_incremental(tmp_path, monkeypatch, pr_files, [[]])) == pr_files
+    # 强推后旧 head 不存在，compare 返回 404
+    assert collect(make_incremental(tmp_path, monkeypatch, pr_files, marker_pages, None)) == pr_files
+    # compare 结果被截断
+    assistant = make_incremental(tmp_path, monkeypatch, pr_files, marker_pages, {"a.c": [1], "b.c": [2]})
+    assistant.max_compare_files = 2
+    assert collect(assistant) == pr_files
+
+
+def test_reviewed_head_yields_nothing(tmp_path, monkeypatch):
+    assistant = make_incremental(tmp_path, monkeypatch, {"a.c": [1]},
+                                 [[GithubAssistant.review_marker.format(sha=HEAD[:7])]])
+    assert collect(assistant) == {}
@@ -0,0 +1,118 @@
+import asyncio
+import time
+import httpx
+from llm_provider import LLMProvider, ProviderRouter
+from rate_limiter import AdaptiveLimiter
+
+
+def make_provider(name, max_prompt_tokens=0, latency=0.05):
+    limiter = AdaptiveLimiter(f"llm_{name}", 1, 8, 8, 1, 60, latency_aware=False)
+    provider = LLMProvider(name, f"http://{name}", "model", None, max_prompt_tokens, limiter, 1, 30)
+    provider.latencies.extend([latency] * 5)
+    return provider
+
+
+def make_router(providers):
+    return ProviderRouter(providers, 95, 3, 1.0, 0.05, 1.0)
+
+
+# 每个服务商的请求都经过自己的限流器，durations 为服务商名 -> 耗时，"fail" 表示请求失败
+def call_with(durations, cancelled=None):
+    async def call(provider, attempt):
+        async def send():
+            attempt.mark_sent()
+            duration = durations[provider.name]
+            if duration == "fail":
+                raise httpx.ConnectError("boom")
+            try:
+                await asyncio.sleep(duration)
+            except asyncio.CancelledError:
+                if cancelled is not None:
+                    cancelled.append(provider.name)
+                raise
+            return httpx.Response(200, json={"provider": provider.name})
+
+        response = await provider.limiter.request(send)
+        return response.json()["provider"]
+
+    return call
+
+
+def test_hedge_wins_and_loser_releases_limiter_slot():
+    primary, secondary = make_provider("a"), make_provider("b")
+    router = make_router([primary, secondary])
+    cancelled = []
+    result = asyncio.run(router.request(10, call_with({"a": 10, "b": 0.01}, cancelled)))
+    assert result == "b"
+    assert cancelled == ["a"]
+    assert router.hedged == 1 and router.hedge_wins == 1
+    assert primary.limiter.in_flight == 0
+    assert secondary.limiter.in_flight == 0
+
+
+def test_cancelled_hedged_call_releases_all_slots():
+    primary, secondary = make_provider("a"), make_provider("b")
+    router = make_router([primary, secondary])
+
+    async def main():
+        task = asyncio.create_task(router.request(10, call_with({"a": 10, "b": 10})))
+        await asyncio.sleep(0.2)  # 超过对冲时机，两个请求都在进行
+        assert primary.limiter.in_flight == 1 and secondary.limiter.in_flight == 1
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(main())
+    assert primary.limiter.in_flight == 0
+    assert secondary.limiter.in_flight == 0
+
+
+def test_failover_and_unhealthy_provider():
+    primary, secondary = make_provider("a"), make_provider("b")
+    router = make_router([primary, secondary])
+    assert asyncio.run(router.request(10, call_with({"a": "fail", "b": 0.01}))) == "b"
+    # 失败阈值为 1，失败后暂停路由
+    assert not primary.healthy()
+    assert router.select(10) is secondary
+
+
+def test_select_respects_prompt_size():
+    small, large = make_provider("small", max_prompt_tokens=100), make_provider("large", latency=1.0)
+    router = make_router([small, large])
+    assert router.select(50) is small
+    assert router.select(5000) is large
+
+
+def test_hedge_loser_cancelled_during_throttle_cooldown_releases_slot():
+    primary, secondary = make_provider("a"), make_provider("b")
+    router = make_router([primary, secondary])
+
+    async def main():
+        primary.limiter._get_condition()
+        primary.limiter._blocked_until = time.monotonic() + 10  # 主请求在限流冷却中等待
+        return await router.request(10, call_with({"a": 0.01, "b": 0.01}))
+
+    assert asyncio.run(main()) == "b"
+    assert primary.limiter.in_flight == 0
+
+
+def test_latency_excludes_limiter_queue_time():
+    provider = make_provider("queued")
+    provider.latencies.clear()
+    router = make_router([provider])
+
+    async def main():
+        provider.limiter._get_condition()
+        provider.limiter._blocked_until = time.monotonic() + 0.3  # 请求先在限流冷却中排队
+        return await router.request(10, call_with({"queued": 0.01}))
+
+    assert asyncio.run(main()) == "queued"
+    assert len(provider.latencies) == 1 and provider.latencies[0] < 0.2
+
+
+def test_hedge_loser_latency_recorded_until_cancelled():
+    primary, secondary = make_provider("a"), make_provider("b")
+    primary.latencies.clear()
+    router = make_router([primary, secondary])
+    assert asyncio.run(router.request(10, call_with({"a": 10, "b": 0.2}))) == "b"
+    # 输掉的主请求记录到被取消为止的耗时，慢服务商的延迟统计随之变高
+    assert len(primary.latencies) == 1 and primary.latencies[0] >= 0.2
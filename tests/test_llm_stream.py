@@ -0,0 +1,74 @@
+import asyncio
+import json
+import os
+import httpx
+from ai_module import DeepSeek
+
+
+# 模拟流式 LLM：first_token_delay 秒后开始按 8 个字符一个分片返回 content
+def make_transport(requests, content, first_token_delay=0.0):
+    async def handler(request):
+        requests.append(request)
+
+        async def body():
+            await asyncio.sleep(first_token_delay)
+            for index in range(0, len(content), 8):
+                chunk = {"choices": [{"index": 0, "delta": {"content": content[index:index + 8]}}]}
+                yield f"data: {json.dumps(chunk)}\n\n".encode()
+            yield b'data: {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}\n\n'
+            yield b"data: [DONE]\n\n"
+
+        return httpx.Response(200, headers={"Content-Type": "text/event-stream"}, content=body())
+    return httpx.MockTransport(handler)
+
+
+def make_model(tmp_path, monkeypatch, url, transport, **settings):
+    monkeypatch.setenv("REVIEW_CACHE_DIR", str(tmp_path / "reviews"))
+    # 提示词配置按 src 目录下的相对路径读取
+    monkeypatch.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+    model = DeepSeek(url, "key")
+    model._client = httpx.AsyncClient(transport=transport)
+    for name, value in settings.items():
+        setattr(model, name, value)
+    return model
+
+
+def test_deadline_before_first_token_is_not_cached(tmp_path, monkeypatch):
+    requests = []
+    model = make_model(tmp_path, monkeypatch, "http://deadline", make_transport(requests, "bug here\n", 0.5),
+                       stream_deadline=0.2)
+
+    async def run():
+        return [await model.call_ai_model("int f() { return 0; }") for _ in range(2)]
+
+    # 截止时间内没有收到内容不是“没有问题”，按应答异常处理且不写入缓存
+    assert asyncio.run(run()) == [DeepSeek.RESPONSE_ERROR] * 2
+    assert len(requests) == 2
+    assert model.review_cache.hits == 0
+
+
+def test_truncated_answer_is_used_but_not_cached(tmp_path, monkeypatch):
+    requests = []
+    model = make_model(tmp_path, monkeypatch, "http://length", make_transport(requests, "x" * 200),
+                       stream_max_chars=40)
+
+    async def run():
+        return [await model.call_ai_model("int g() { return 1; }") for _ in range(2)]
+
+    for response in asyncio.run(run()):
+        assert response.startswith("x" * 40) and response.endswith("（应答过长，已截断）")
+    assert len(requests) == 2
+
+
+def test_limiter_wait_does_not_count_against_deadline(tmp_path, monkeypatch):
+    requests = []
+    model = make_model(tmp_path, monkeypatch, "http://queued", make_transport(requests, "bug here\n", 0.15),
+                       stream_deadline=0.3)
+    model.router.providers[0].limiter.limit = 1
+
+    async def run():
+        return await asyncio.gather(*[model.call_ai_model(f"int h{index}() {{ return {index}; }}")
+                                      for index in range(3)])
+
+    # 第三个请求在限流器中排队约 0.3 秒，截止时间从发出请求时开始计算
+    assert asyncio.run(run()) == ["bug here\n"] * 3
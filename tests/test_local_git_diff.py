@@ -0,0 +1,37 @@
+import asyncio
+import subprocess
+import pytest
+from local_git_diff import LocalGitDiff
+
+
+def git(repo, *args):
+    subprocess.run(["git", "-C", str(repo), "-c", "user.name=t", "-c", "user.email=t@t", *args],
+                   check=True, capture_output=True)
+
+
+def collect(diff):
+    async def run():
+        return [(item.file_name, item.diff_position) async for item in diff.iter_diff_file_structs()]
+    return asyncio.run(run())
+
+
+def test_changed_lines_from_local_diff(tmp_path):
+    git(tmp_path, "init", "-q")
+    (tmp_path / "a.c").write_text("int a;\nint b;\nint c;\n")
+    (tmp_path / "b.c").write_text("int x;\n")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-q", "-m", "base")
+    git(tmp_path, "branch", "base")
+    (tmp_path / "a.c").write_text("int a;\nint b2;\nint c;\nint d;\n")
+    (tmp_path / "b.c").unlink()
+    (tmp_path / "new file.c").write_text("int n;\n")
+    git(tmp_path, "add", "-A")
+    git(tmp_path, "commit", "-q", "-m", "head")
+
+    assert collect(LocalGitDiff(str(tmp_path), "base")) == [("a.c", [2, 4]), ("new file.c", [1])]
+
+
+def test_git_error_is_reported(tmp_path):
+    git(tmp_path, "init", "-q")
+    with pytest.raises(RuntimeError, match="git diff failed"):
+        collect(LocalGitDiff(str(tmp_path), "missing-base"))
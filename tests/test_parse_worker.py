@@ -0,0 +1,16 @@
+import parse_worker
+
+
+def test_process_pool_is_shared_and_not_forked(tmp_path):
+    source = tmp_path / "a.py"
+    source.write_text("def f():\n    return 1\n\n\ndef g():\n    return 2\n")
+    try:
+        pool = parse_worker.get_pool(1)
+        # 多次评审复用同一个进程池，子进程不从已有线程的主进程直接 fork
+        assert parse_worker.get_pool(1) is pool
+        assert pool._mp_context.get_start_method() in ("forkserver", "spawn")
+        snippets = pool.submit(parse_worker.extract_changed_functions, str(source), "python", [5]).result()
+        assert [(snippet.name, snippet.changed_lines) for snippet in snippets] == [("g", [5])]
+    finally:
+        parse_worker.shutdown_pool()
+    assert parse_worker._pool is None
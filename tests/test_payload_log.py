@@ -0,0 +1,23 @@
+import collections
+import itertools
+import ai_code_reviewer_logger
+
+
+def test_payload_sampled_per_kind(monkeypatch):
+    logged = []
+
+    class FakeLogger:
+        def debug(self, message):
+            logged.append(message.split(" ", 1)[0])
+
+    monkeypatch.setattr(ai_code_reviewer_logger, "logger", FakeLogger())
+    monkeypatch.setattr(ai_code_reviewer_logger, "_payload_sample_rate", 2)
+    monkeypatch.setattr(ai_code_reviewer_logger, "_payload_counters", collections.defaultdict(itertools.count))
+
+    # 请求和应答交替出现，共用计数时应答永远不会被采样
+    for _ in range(4):
+        ai_code_reviewer_logger.log_payload("llm_request", {"prompt": "p"})
+        ai_code_reviewer_logger.log_payload("llm_response", "r")
+
+    assert logged.count("llm_request") == 2
+    assert logged.count("llm_response") == 2
@@ -0,0 +1,71 @@
+import asyncio
+import time
+import httpx
+from rate_limiter import AdaptiveLimiter
+
+
+def make_limiter(limit=8, max_attempts=1, latency_aware=True):
+    return AdaptiveLimiter("test", 1, 64, limit, max_attempts, 60, latency_aware=latency_aware)
+
+
+def test_cancel_during_throttle_cooldown_releases_slot():
+    limiter = make_limiter()
+
+    async def main():
+        limiter._get_condition()
+        limiter._blocked_until = time.monotonic() + 10
+        task = asyncio.create_task(limiter.request(lambda: asyncio.sleep(0)))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(main())
+    assert limiter.in_flight == 0
+
+
+def test_cancel_during_send_releases_slot():
+    limiter = make_limiter()
+
+    async def main():
+        sending = asyncio.Event()
+
+        async def send():
+            sending.set()
+            await asyncio.sleep(10)
+
+        task = asyncio.create_task(limiter.request(send))
+        await sending.wait()
+        assert limiter.in_flight == 1
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(main())
+    assert limiter.in_flight == 0
+
+
+def test_concurrent_429_burst_halves_once():
+    limiter = make_limiter(limit=8)
+
+    async def send():
+        await asyncio.sleep(0.01)
+        return httpx.Response(429, headers={"Retry-After": "5"})
+
+    async def main():
+        return await asyncio.gather(*[limiter.request(send) for _ in range(8)])
+
+    responses = asyncio.run(main())
+    assert all(response.status_code == 429 for response in responses)
+    assert limiter.limit == 4
+    assert limiter.throttled == 8
+    assert limiter.in_flight == 0
+
+
+def test_latency_rule_only_for_latency_aware_limiter():
+    github = make_limiter(limit=8)
+    llm = make_limiter(limit=8, latency_aware=False)
+    for limiter in (github, llm):
+        limiter.on_success(1.0)
+        for _ in range(5):
+            limiter.on_success(30.0)  # 长函数的调用耗时明显变长
+    assert github.limit < 8
+    assert llm.limit >= 8
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import os
+import time
+from review_cache import ReviewCache, make_cache_key
+
+
+def test_cache_key_ignores_formatting():
+    assert make_cache_key("m", "p", "int f() {  \r\n\n  return 1;\n}") == \
+        make_cache_key("m", "p", "int f() {\n  return 1;\n}\n")
+    assert make_cache_key("m", "p", "a") != make_cache_key("other", "p", "a")
+
+
+def test_hit_across_instances_and_uncacheable_result(tmp_path):
+    calls = []
+
+    async def call():
+        calls.append(1)
+        return "review"
+
+    async def no_result():
+        return None
+
+    async def run():
+        cache = ReviewCache(str(tmp_path), 1024 * 1024, 3600)
+        assert await cache.get_or_call("k1", call) == "review"
+        # None 表示应答异常，不写入缓存
+        assert await cache.get_or_call("k2", no_result) is None
+        other = ReviewCache(str(tmp_path), 1024 * 1024, 3600)
+        assert await other.get_or_call("k1", call) == "review"
+        assert await other.lookup("k2") is None
+        return other
+
+    other = asyncio.run(run())
+    assert len(calls) == 1
+    assert (other.hits, other.misses) == (1, 1)
+
+
+def test_concurrent_calls_share_one_request():
+    started = []
+
+    async def call():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        return "review"
+
+    async def run():
+        cache = ReviewCache(None, 0, 0)
+        results = await asyncio.gather(*[cache.get_or_call("k", call) for _ in range(5)])
+        return cache, results
+
+    cache, results = asyncio.run(run())
+    assert results == ["review"] * 5
+    assert len(started) == 1
+    assert cache.deduplicated == 4
+
+
+def test_expired_entry_is_removed_on_load(tmp_path):
+    cache = ReviewCache(str(tmp_path), 1024 * 1024, 60)
+    path = cache._entry_path("k")
+    os.makedirs(os.path.dirname(path))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"created": time.time() - 120, "response": "old"}, f)
+
+    assert asyncio.run(cache.lookup("k")) is None
+    # 读取刷新 mtime 后 prune 无法判断过期，因此过期条目在读取时直接删除
+    assert not os.path.exists(path)
+
+
+def test_prune_removes_least_recently_used_first(tmp_path):
+    cache = ReviewCache(str(tmp_path), 0, 3600)
+
+    async def store():
+        for key in ("aa1", "aa2", "aa3"):
+            await cache.store(key, "x" * 100)
+
+    asyncio.run(store())
+    now = time.time()
+    os.utime(cache._entry_path("aa1"), (now - 30, now - 30))
+    os.utime(cache._entry_path("aa2"), (now - 20, now - 20))
+    os.utime(cache._entry_path("aa3"), (now - 10, now - 10))
+    # aa1 最近被读取过
+    assert asyncio.run(cache.lookup("aa1")) == "x" * 100
+    # 过期的条目和临时文件直接删除
+    stale = cache._entry_path("aa0")
+    with open(stale, "w", encoding="utf-8") as f:
+        f.write("{}")
+    os.utime(stale, (now - 7200, now - 7200))
+    open(cache._entry_path("aa4") + ".1.tmp", "w").close()
+
+    # 条目大小随 created 时间戳的长度变化，按实际大小设置上限，正好容纳 aa1 和 aa3
+    cache.max_bytes = os.path.getsize(cache._entry_path("aa1")) + os.path.getsize(cache._entry_path("aa3"))
+    cache.prune()
+    assert sorted(name for _, _, files in os.walk(str(tmp_path)) for name in files) == ["aa1.json", "aa3.json"]
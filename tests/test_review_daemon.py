@@ -0,0 +1,80 @@
+import asyncio
+import json
+from review_daemon import FairReviewQueue, ReviewDaemon
+
+
+class FakeWorkspace:
+
+    def __init__(self):
+        self.removed = []
+
+    async def remove(self, owner, repo, pull_request_id):
+        self.removed.append((owner, repo, pull_request_id))
+
+
+def closed_event(number):
+    return json.dumps({"action": "closed", "pull_request": {"number": number},
+                       "repository": {"name": "repo", "owner": {"login": "owner"}}}).encode()
+
+
+def make_daemon():
+    workspace = FakeWorkspace()
+    daemon = ReviewDaemon("127.0.0.1", 0, 1, FairReviewQueue(0, 1), workspace, None, False)
+    return daemon, workspace
+
+
+def test_close_during_review_defers_workspace_removal():
+    daemon, workspace = make_daemon()
+    started = asyncio.Event()
+    finish = asyncio.Event()
+
+    async def review(job):
+        started.set()
+        await finish.wait()
+        # 评审过程中工作区必须保留
+        assert not workspace.removed
+
+    daemon.review = review
+
+    async def run():
+        worker = asyncio.create_task(daemon.worker())
+        await daemon.queue.put("owner", "repo", 1)
+        await started.wait()
+        # 评审期间再次推送的任务也随关闭丢弃
+        await daemon.queue.put("owner", "repo", 1)
+        await daemon.handle_webhook({"x-github-event": "pull_request"}, closed_event(1))
+        assert daemon.queue.pending == 0
+        assert not workspace.removed
+        finish.set()
+        while daemon.queue.running:
+            await asyncio.sleep(0.01)
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+
+    asyncio.run(run())
+    assert workspace.removed == [("owner", "repo", 1)]
+
+
+def test_close_idle_pull_request_removes_workspace():
+    daemon, workspace = make_daemon()
+
+    async def run():
+        await daemon.queue.put("owner", "repo", 2)
+        await daemon.handle_webhook({"x-github-event": "pull_request"}, closed_event(2))
+
+    asyncio.run(run())
+    assert daemon.queue.pending == 0
+    assert workspace.removed == [("owner", "repo", 2)]
+
+
+def test_reopen_during_review_keeps_workspace():
+    queue = FairReviewQueue(0, 1)
+
+    async def run():
+        await queue.put("owner", "repo", 3)
+        job = await queue.get()
+        assert await queue.discard("owner", "repo", 3)
+        await queue.put("owner", "repo", 3)
+        return await queue.done(job)
+
+    assert not asyncio.run(run())
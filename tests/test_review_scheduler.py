@@ -0,0 +1,57 @@
+import pytest
+from review_scheduler import ReviewCandidate, ReviewScheduler, parse_weights
+
+
+def candidate(file_name, changed, lines=10, body="x" * 40, language="cpp"):
+    return ReviewCandidate(file_name, language, list(range(1, changed + 1)), body, lines)
+
+
+def make_scheduler(max_calls=10, max_tokens=100000, per_file=3, batch_max_tokens=0, batch_max_functions=8):
+    return ReviewScheduler(max_calls, max_tokens, 4, per_file, {"*test*": 0.5}, {"python": 2.0},
+                           batch_max_tokens, batch_max_functions)
+
+
+def test_parse_weights():
+    assert parse_weights("*gen/*=0.1, python=2", {}) == {"*gen/*": 0.1, "python": 2.0}
+    assert parse_weights("", {"a": 1.0}) == {"a": 1.0}
+    with pytest.raises(ValueError):
+        parse_weights("a=high", {})
+
+
+def test_score_prefers_larger_changes_and_applies_weights():
+    scheduler = make_scheduler()
+    assert scheduler.score(candidate("a.cc", 5)) > scheduler.score(candidate("a.cc", 1))
+    assert scheduler.score(candidate("a_test.cc", 5)) == pytest.approx(scheduler.score(candidate("a.cc", 5)) * 0.5)
+    assert scheduler.score(candidate("a.py", 5, language="python")) == \
+        pytest.approx(scheduler.score(candidate("a.cc", 5)) * 2)
+
+
+def test_select_respects_call_file_and_token_budgets():
+    scheduler = make_scheduler(max_calls=3, max_tokens=100, per_file=2)
+    big = candidate("big.cc", 20, body="x" * 1000)  # 得分最高但超出 token 预算
+    for item in (candidate("a.cc", 9), candidate("a.cc", 8), candidate("a.cc", 7),
+                 candidate("b.cc", 1), candidate("c.cc", 2), big):
+        scheduler.add(item)
+
+    selected = scheduler.select()
+    assert [(item.file_name, len(item.changed_lines)) for item in selected] == [("a.cc", 9), ("a.cc", 8), ("c.cc", 2)]
+    assert scheduler.candidates == []
+
+
+def test_try_reserve_in_arrival_order():
+    scheduler = make_scheduler(max_calls=2, per_file=1)
+    assert scheduler.try_reserve(candidate("a.cc", 1))
+    assert not scheduler.try_reserve(candidate("a.cc", 9))
+    assert scheduler.try_reserve(candidate("b.cc", 1))
+    assert not scheduler.try_reserve(candidate("c.cc", 1))
+
+
+def test_make_batches_groups_by_file_within_limits():
+    scheduler = make_scheduler(batch_max_tokens=25, batch_max_functions=2)
+    items = [candidate("a.cc", 1), candidate("b.cc", 1), candidate("a.cc", 2), candidate("a.cc", 3),
+             candidate("b.cc", 2, body="x" * 200)]
+    batches = scheduler.make_batches(items)
+    assert [[(item.file_name, len(item.changed_lines)) for item in batch] for batch in batches] == [
+        [("a.cc", 1), ("a.cc", 2)], [("a.cc", 3)], [("b.cc", 1)], [("b.cc", 2)]]
+
+    assert make_scheduler().make_batches(items) == [[item] for item in items]
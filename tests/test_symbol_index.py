@@ -0,0 +1,67 @@
+import subprocess
+from file_filter import FileFilter
+from symbol_index import SymbolIndex
+
+
+def git(repo, *args):
+    subprocess.run(["git", "-C", str(repo), *args], check=True, capture_output=True)
+
+
+def make_repo(tmp_path):
+    repo = tmp_path / "repo"
+    (repo / "lib").mkdir(parents=True)
+    (repo / "lib" / "util.py").write_text("def parse_header(data: bytes, strict: bool = False) -> dict:\n"
+                                          "    return {}\n")
+    (repo / "lib" / "model.py").write_text("class Request:\n    pass\n")
+    (repo / "main.py").write_text("def main():\n    return parse_header(b'')\n")
+    git(repo, "init", "-q")
+    git(repo, "add", ".")
+    git(repo, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-q", "-m", "init")
+    return repo
+
+
+def make_index(repo, index_dir, parsed):
+    index = SymbolIndex(str(repo), str(index_dir), FileFilter((), 0, 0, 4096))
+    parse_file = index._parse_file
+
+    def counting_parse(path, spec):
+        parsed.append(path)
+        return parse_file(path, spec)
+
+    index._parse_file = counting_parse
+    return index
+
+
+def test_incremental_update_parses_only_changed_files(tmp_path):
+    repo = make_repo(tmp_path)
+    parsed = []
+    make_index(repo, tmp_path / "index", parsed).update()
+    assert sorted(parsed) == ["lib/model.py", "lib/util.py", "main.py"]
+
+    # 未变化时全部复用落盘的索引
+    parsed.clear()
+    make_index(repo, tmp_path / "index", parsed).update()
+    assert parsed == []
+
+    # 工作区中修改的文件每次都重新解析，新增的文件提交后解析一次
+    (repo / "lib" / "model.py").write_text("class Request:\n    pass\n\nclass Response:\n    pass\n")
+    (repo / "lib" / "extra.py").write_text("def helper():\n    pass\n")
+    git(repo, "add", "lib/extra.py")
+    parsed.clear()
+    index = make_index(repo, tmp_path / "index", parsed)
+    index.update()
+    assert sorted(parsed) == ["lib/extra.py", "lib/model.py"]
+    assert "Response" in index.names
+
+
+def test_context_for_lists_called_declarations(tmp_path):
+    repo = make_repo(tmp_path)
+    index = SymbolIndex(str(repo), None, FileFilter((), 0, 0, 4096))
+    index.update()
+
+    context = index.context_for("def main():\n    return parse_header(b'')\n", "main.py", "main", 300)
+    assert "def parse_header(data: bytes, strict: bool = False) -> dict" in context
+    assert "lib/util.py:1" in context
+    # 函数自身的定义不列出，token 上限为 0 时不附加
+    assert "main()" not in context
+    assert index.context_for("parse_header()", "main.py", "main", 0) == ""